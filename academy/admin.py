@@ -7,9 +7,11 @@ from .models import (
     Choice,
     ModuleProgress,
     LessonProgress,
+    CourseProgress,
     FinalTestSubmission,
     ManagerDocument,
     CourseAssignment,
+    EffectiveAssignment,
 )
 
 # =============================
@@ -123,6 +125,27 @@ class LessonProgressAdmin(admin.ModelAdmin):
     ordering = ("lesson__module__order", "lesson__order")
 
 
+# =============================
+# COURSE PROGRESS ROLLUP ADMIN
+# =============================
+
+@admin.register(CourseProgress)
+class CourseProgressAdmin(admin.ModelAdmin):
+    list_display = ("user", "course", "modules_passed", "modules_total", "percent", "last_activity_at")
+    list_filter = ("course",)
+    search_fields = ("user__username", "course__title")
+    ordering = ("user__username", "course__order")
+    readonly_fields = (
+        "modules_passed",
+        "modules_total",
+        "lessons_completed",
+        "lessons_total",
+        "percent",
+        "last_activity_at",
+        "updated_at",
+    )
+
+
 # =============================
 # FINAL TEST SUBMISSION ADMIN
 # =============================
@@ -156,3 +179,18 @@ class CourseAssignmentAdmin(admin.ModelAdmin):
     list_filter = ("course", "group")
     search_fields = ("user__username", "group__name", "course__title")
     ordering = ("-assigned_at",)
+
+
+@admin.register(EffectiveAssignment)
+class EffectiveAssignmentAdmin(admin.ModelAdmin):
+    # Derived from CourseAssignment and group membership; read-only
+    list_display = ("user", "course")
+    list_filter = ("course",)
+    search_fields = ("user__username", "course__title")
+    ordering = ("user__username", "course__order")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
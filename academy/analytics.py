@@ -0,0 +1,258 @@
+# academy/analytics.py
+#
+# Final test analytics. Each new FinalTestSubmission adds its answers to
+# three running-total tables with F() increments:
+#
+#   QuestionStats     attempts / correct / unanswered per question
+#   ChoiceStats       picks per choice
+#   DailyModuleStats  submissions / passed / score total per module per day
+#
+# so the manager analytics page reads small indexed tables instead of every
+# answers blob. rebuild_question_stats() recomputes all three from the
+# submissions (e.g. after submissions have been deleted).
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import (
+    Choice,
+    ChoiceStats,
+    DailyModuleStats,
+    FinalTestSubmission,
+    Question,
+    QuestionStats,
+)
+
+HARDEST_QUESTIONS = 20
+TREND_DAYS = 30
+
+
+def _answer_ids(answers):
+    """
+    (asked, correct, unanswered, picked) id lists from an answers snapshot.
+    """
+    asked, correct, unanswered, picked = [], [], [], []
+    for answer in answers or []:
+        question_id = answer.get("question_id")
+        if not question_id:
+            continue
+        asked.append(question_id)
+        if answer.get("is_correct"):
+            correct.append(question_id)
+        if answer.get("selected_choice_id"):
+            picked.append(answer["selected_choice_id"])
+        else:
+            unanswered.append(question_id)
+    return asked, correct, unanswered, picked
+
+
+def record_submission(submission):
+    """
+    Add one new submission to the running totals.
+
+    Answers to questions or choices deleted since the test was taken are
+    skipped. Increments are applied with F() in the database, so
+    concurrent submissions don't lose counts.
+    """
+    asked, correct, unanswered, picked = _answer_ids(submission.answers)
+    module = submission.module
+
+    with transaction.atomic():
+        if asked:
+            question_modules = dict(
+                Question.objects.filter(pk__in=asked).values_list("pk", "module_id")
+            )
+            QuestionStats.objects.bulk_create(
+                [
+                    QuestionStats(question_id=pk, module_id=module_id)
+                    for pk, module_id in question_modules.items()
+                ],
+                ignore_conflicts=True,
+            )
+            QuestionStats.objects.filter(pk__in=asked).update(attempts=F("attempts") + 1)
+            if correct:
+                QuestionStats.objects.filter(pk__in=correct).update(correct=F("correct") + 1)
+            if unanswered:
+                QuestionStats.objects.filter(pk__in=unanswered).update(unanswered=F("unanswered") + 1)
+
+        if picked:
+            ChoiceStats.objects.bulk_create(
+                [
+                    ChoiceStats(choice_id=pk, question_id=question_id)
+                    for pk, question_id in (
+                        Choice.objects.filter(pk__in=picked).values_list("pk", "question_id")
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            ChoiceStats.objects.filter(pk__in=picked).update(picks=F("picks") + 1)
+
+        date = timezone.localdate(submission.submitted_at)
+        DailyModuleStats.objects.bulk_create(
+            [DailyModuleStats(module=module, date=date)], ignore_conflicts=True
+        )
+        DailyModuleStats.objects.filter(module=module, date=date).update(
+            submissions=F("submissions") + 1,
+            passed=F("passed") + int(submission.score_percent >= module.min_score_to_pass),
+            score_total=F("score_total") + submission.score_percent,
+        )
+
+
+def rebuild_question_stats(chunk_size=500):
+    """
+    Recompute every stats table from the stored submissions. Passes are
+    judged against each module's current pass mark.
+
+    Returns {"submissions": n, "questions": n, "choices": n, "days": n}.
+    """
+    attempts, correct, unanswered, picks = Counter(), Counter(), Counter(), Counter()
+    daily = {}
+    count = 0
+
+    submissions = (
+        FinalTestSubmission.objects
+        .order_by("pk")
+        .values_list("module_id", "module__min_score_to_pass", "submitted_at", "score_percent", "answers")
+    )
+    for module_id, pass_mark, submitted_at, score_percent, answers in submissions.iterator(chunk_size=chunk_size):
+        count += 1
+        asked, right, blank, picked = _answer_ids(answers)
+        attempts.update(asked)
+        correct.update(right)
+        unanswered.update(blank)
+        picks.update(picked)
+
+        day = daily.setdefault(
+            (module_id, timezone.localdate(submitted_at)),
+            {"submissions": 0, "passed": 0, "score_total": 0},
+        )
+        day["submissions"] += 1
+        day["passed"] += int(score_percent >= pass_mark)
+        day["score_total"] += score_percent
+
+    question_modules = dict(
+        Question.objects.filter(pk__in=list(attempts)).values_list("pk", "module_id")
+    )
+    choice_questions = dict(
+        Choice.objects.filter(pk__in=list(picks)).values_list("pk", "question_id")
+    )
+
+    with transaction.atomic():
+        QuestionStats.objects.all().delete()
+        ChoiceStats.objects.all().delete()
+        DailyModuleStats.objects.all().delete()
+
+        QuestionStats.objects.bulk_create(
+            [
+                QuestionStats(
+                    question_id=pk,
+                    module_id=module_id,
+                    attempts=attempts[pk],
+                    correct=correct[pk],
+                    unanswered=unanswered[pk],
+                )
+                for pk, module_id in question_modules.items()
+            ],
+            batch_size=chunk_size,
+        )
+        ChoiceStats.objects.bulk_create(
+            [
+                ChoiceStats(choice_id=pk, question_id=question_id, picks=picks[pk])
+                for pk, question_id in choice_questions.items()
+            ],
+            batch_size=chunk_size,
+        )
+        DailyModuleStats.objects.bulk_create(
+            [
+                DailyModuleStats(module_id=module_id, date=date, **totals)
+                for (module_id, date), totals in daily.items()
+            ],
+            batch_size=chunk_size,
+        )
+
+    return {
+        "submissions": count,
+        "questions": len(question_modules),
+        "choices": len(choice_questions),
+        "days": len(daily),
+    }
+
+
+# =============================
+# REPORTS
+# =============================
+
+def hardest_questions(course=None, module=None, min_attempts=1, limit=HARDEST_QUESTIONS):
+    """
+    The questions answered correctly least often, each with .choice_rows:
+    its choices (in id order) with their pick counts.
+    """
+    stats = QuestionStats.objects.filter(attempts__gte=max(min_attempts, 1))
+    if module is not None:
+        stats = stats.filter(module=module)
+    elif course is not None:
+        stats = stats.filter(module__course=course)
+
+    stats = list(
+        stats
+        .select_related("question", "module__course")
+        .annotate(correct_rate=Cast("correct", FloatField()) / F("attempts"))
+        .order_by("correct_rate", "-attempts", "pk")[:limit]
+    )
+
+    choice_rows = {}
+    for choice_id, question_id, text, is_correct, choice_picks in (
+        Choice.objects
+        .filter(question_id__in=[row.pk for row in stats])
+        .order_by("id")
+        .values_list("id", "question_id", "text", "is_correct", "stats__picks")
+    ):
+        choice_rows.setdefault(question_id, []).append({
+            "id": choice_id,
+            "text": text,
+            "is_correct": is_correct,
+            "picks": choice_picks or 0,
+        })
+
+    for row in stats:
+        row.choice_rows = choice_rows.get(row.pk, [])
+        for choice in row.choice_rows:
+            choice["percent"] = round(choice["picks"] * 100 / row.attempts)
+    return stats
+
+
+def pass_rate_trend(course=None, module=None, days=TREND_DAYS):
+    """
+    Daily submissions, passes, pass rate and average score over the last
+    `days` days, oldest first. Days without submissions are left out.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = DailyModuleStats.objects.filter(date__gte=since)
+    if module is not None:
+        rows = rows.filter(module=module)
+    elif course is not None:
+        rows = rows.filter(module__course=course)
+
+    trend = []
+    for row in (
+        rows.values("date")
+        .annotate(
+            submissions=Sum("submissions"),
+            passed=Sum("passed"),
+            score_total=Sum("score_total"),
+        )
+        .order_by("date")
+    ):
+        trend.append({
+            "date": row["date"],
+            "submissions": row["submissions"],
+            "passed": row["passed"],
+            "pass_rate": round(row["passed"] * 100 / row["submissions"]),
+            "average_score": round(row["score_total"] / row["submissions"]),
+        })
+    return trend
@@ -0,0 +1,146 @@
+# academy/answer_keys.py
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Choice, Module, Question
+
+CACHE_KEY = "academy:answer-key:{module_id}:{version}"
+
+
+def _cache_key(module):
+    return CACHE_KEY.format(module_id=module.pk, version=module.answer_key_version)
+
+
+def build_answer_key(module):
+    """
+    Load a module's questions and choices into a plain dict for grading.
+
+    {
+        "questions": {
+            question_id: {
+                "text": "...",
+                "explanation": "...",
+                "choices": {choice_id: "choice text", ...},
+                "correct": frozenset({choice_id, ...}),
+            },
+            ...
+        },
+    }
+    """
+    questions = {
+        question_id: {
+            "text": text,
+            "explanation": explanation,
+            "choices": {},
+            "correct": set(),
+        }
+        for question_id, text, explanation in (
+            Question.objects.filter(module=module).values_list("id", "text", "explanation")
+        )
+    }
+
+    choices = (
+        Choice.objects
+        .filter(question__module=module)
+        .order_by("id")
+        .values_list("id", "question_id", "text", "is_correct")
+    )
+    for choice_id, question_id, text, is_correct in choices:
+        question = questions[question_id]
+        question["choices"][choice_id] = text
+        if is_correct:
+            question["correct"].add(choice_id)
+
+    for question in questions.values():
+        question["correct"] = frozenset(question["correct"])
+
+    return {"questions": questions}
+
+
+def get_answer_key(module):
+    """
+    Return the cached answer key for a module, building it on first use.
+
+    The cache key includes module.answer_key_version, so bumping the version
+    (see bump_answer_key_version) retires old keys in every process.
+    """
+    key = _cache_key(module)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(module)
+        cache.set(key, answer_key, timeout=None)
+    return answer_key
+
+
+def bump_answer_key_version(*module_ids):
+    """
+    Invalidate the answer keys of the given modules.
+    """
+    module_ids = {module_id for module_id in module_ids if module_id}
+    if module_ids:
+        Module.objects.filter(pk__in=module_ids).update(
+            answer_key_version=F("answer_key_version") + 1
+        )
+
+
+def mark_answer(answer_key, question_id, selected_choice_id):
+    """
+    Check one submitted answer against the key without touching the database.
+
+    selected_choice_id is the raw POST value (or None). Returns
+    (choice_id, is_correct), where choice_id is None if nothing valid was picked.
+    """
+    question = answer_key["questions"].get(question_id)
+    if question is None or not selected_choice_id:
+        return None, False
+
+    try:
+        choice_id = int(selected_choice_id)
+    except (TypeError, ValueError):
+        return None, False
+
+    if choice_id not in question["choices"]:
+        return None, False
+    return choice_id, choice_id in question["correct"]
+
+
+def mark_final_test(answer_key, data):
+    """
+    Mark a final test submission and build its FinalTestSubmission.answers
+    snapshot in one pass over the answer key, in question order.
+
+    data is the POST QueryDict (answers arrive as question_<id>=<choice id>).
+    Returns (answers, correct_count).
+    """
+    answers = []
+    correct_count = 0
+
+    for question_id, question in answer_key["questions"].items():
+        selected_choice_id, _ = mark_answer(
+            answer_key, question_id, data.get(f"question_{question_id}")
+        )
+
+        # The first correct choice is the one shown to reviewers
+        correct_choice_id = min(question["correct"]) if question["correct"] else None
+
+        is_correct = (
+            selected_choice_id is not None
+            and selected_choice_id == correct_choice_id
+        )
+        if is_correct:
+            correct_count += 1
+
+        answers.append(
+            {
+                "question_id": question_id,
+                "question_text": question["text"],
+                "selected_choice_id": selected_choice_id,
+                "selected_choice_text": question["choices"].get(selected_choice_id),
+                "correct_choice_text": question["choices"].get(correct_choice_id),
+                "is_correct": is_correct,
+                "explanation": question["explanation"],
+            }
+        )
+
+    return answers, correct_count
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AcademyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'academy'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,119 @@
+# academy/assignments.py
+#
+# The EffectiveAssignment table: one row per (user, course) a user is
+# assigned, directly (CourseAssignment.user) or through one of their groups
+# (CourseAssignment.group + User.groups). Every change to either source is
+# turned into "refresh these users", which recomputes their courses and
+# applies the difference, so the table only ever holds what the source
+# rows imply. The signals in academy/signals.py call in here.
+
+from django.contrib.auth import get_user_model
+
+from .models import CourseAssignment, EffectiveAssignment
+
+# Keeps the IN (...) lists well inside SQLite's parameter limit
+BATCH_SIZE = 500
+
+
+def _batches(ids, size=BATCH_SIZE):
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def group_member_ids(group_ids):
+    """
+    Ids of the users in any of the given groups.
+    """
+    group_ids = [pk for pk in group_ids if pk]
+    if not group_ids:
+        return set()
+    Membership = get_user_model().groups.through
+    return set(
+        Membership.objects.filter(group_id__in=group_ids).values_list("user_id", flat=True)
+    )
+
+
+def assigned_course_ids(user_ids):
+    """
+    {user_id: {course_id, ...}} from the CourseAssignment rows, resolving
+    group assignments through current group membership. Users with no
+    courses are left out.
+    """
+    courses = {}
+    direct = CourseAssignment.objects.filter(user_id__in=user_ids).values_list("user_id", "course_id")
+    via_group = (
+        CourseAssignment.objects
+        .filter(group__user__in=user_ids)
+        .values_list("group__user", "course_id")
+    )
+    for user_id, course_id in [*direct, *via_group]:
+        courses.setdefault(user_id, set()).add(course_id)
+    return courses
+
+
+def refresh_effective_assignments(user_ids):
+    """
+    Bring the given users' EffectiveAssignment rows in line with their
+    direct and group assignments. Returns (created, deleted).
+    """
+    created = deleted = 0
+    for batch in _batches({pk for pk in user_ids if pk}):
+        expected = assigned_course_ids(batch)
+
+        stale = []
+        present = set()
+        for pk, user_id, course_id in (
+            EffectiveAssignment.objects
+            .filter(user_id__in=batch)
+            .values_list("pk", "user_id", "course_id")
+        ):
+            if course_id in expected.get(user_id, ()):
+                present.add((user_id, course_id))
+            else:
+                stale.append(pk)
+
+        if stale:
+            deleted += EffectiveAssignment.objects.filter(pk__in=stale).delete()[0]
+
+        missing = [
+            EffectiveAssignment(user_id=user_id, course_id=course_id)
+            for user_id, course_ids in expected.items()
+            for course_id in course_ids
+            if (user_id, course_id) not in present
+        ]
+        # A concurrent refresh of the same user may have got there first
+        EffectiveAssignment.objects.bulk_create(missing, ignore_conflicts=True)
+        created += len(missing)
+
+    return created, deleted
+
+
+def rebuild_effective_assignments():
+    """
+    Refresh every user. Returns {"created": n, "deleted": n}.
+    """
+    user_ids = get_user_model().objects.values_list("pk", flat=True)
+    created, deleted = refresh_effective_assignments(user_ids)
+    return {"created": created, "deleted": deleted}
+
+
+def verify_effective_assignments():
+    """
+    (user_id, course_id) pairs that are missing from, or shouldn't be in,
+    the table. Empty when it's up to date.
+    """
+    mismatches = []
+    for batch in _batches(get_user_model().objects.values_list("pk", flat=True)):
+        expected = {
+            (user_id, course_id)
+            for user_id, course_ids in assigned_course_ids(batch).items()
+            for course_id in course_ids
+        }
+        actual = set(
+            EffectiveAssignment.objects
+            .filter(user_id__in=batch)
+            .values_list("user_id", "course_id")
+        )
+        mismatches.extend(sorted(expected ^ actual))
+    return mismatches
@@ -0,0 +1,133 @@
+# academy/certificate_layout.py
+#
+# Pure ReportLab layout for certificates. Nothing here touches the ORM, so
+# these functions can run in worker processes (see certificates.render_missing_pdfs).
+
+import functools
+import io
+import logging
+import os
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever draw_certificate changes so stored PDFs are re-rendered
+LAYOUT_VERSION = 1
+
+LOGO_PATH = os.path.join(settings.BASE_DIR, "static", "css", "media", "LOGO-Cozys.webp")
+
+BURGUNDY = colors.HexColor("#800020")
+GRAY = colors.HexColor("#444444")
+
+
+@functools.lru_cache(maxsize=1)
+def _logo():
+    """
+    Decode the logo once per process. Returns None if the file is missing,
+    in which case certificates are drawn without it.
+    """
+    if not os.path.exists(LOGO_PATH):
+        logger.warning("Certificate logo not found at %s", LOGO_PATH)
+        return None
+    return ImageReader(LOGO_PATH)
+
+
+def draw_certificate(p, data):
+    """
+    Draw one landscape certificate page with Cozy branding onto canvas `p`.
+    """
+    page_width, page_height = landscape(A4)
+    margin = 50
+
+    # Background border
+    p.setStrokeColor(BURGUNDY)
+    p.setLineWidth(4)
+    p.rect(margin / 2, margin / 2, page_width - margin, page_height - margin, stroke=1, fill=0)
+
+    # Logo (top-left)
+    logo = _logo()
+    if logo is not None:
+        p.drawImage(
+            logo,
+            x=margin,
+            y=page_height - 130,
+            width=180,
+            height=80,
+            mask="auto",
+            preserveAspectRatio=True,
+        )
+
+    # Title
+    p.setFont("Helvetica-Bold", 32)
+    p.setFillColor(BURGUNDY)
+    p.drawCentredString(page_width / 2, page_height - 200, "Certificate of Completion")
+
+    # Subtitle line
+    p.setStrokeColor(GRAY)
+    p.line(page_width / 4, page_height - 210, page_width * 3 / 4, page_height - 210)
+
+    # Recipient
+    p.setFillColor(GRAY)
+    p.setFont("Helvetica", 16)
+    p.drawCentredString(page_width / 2, page_height - 270, "This certifies that")
+
+    p.setFont("Helvetica-Bold", 26)
+    p.setFillColor(BURGUNDY)
+    p.drawCentredString(page_width / 2, page_height - 305, data["name"])
+
+    p.setFillColor(GRAY)
+    p.setFont("Helvetica", 15)
+    p.drawCentredString(page_width / 2, page_height - 335, "has successfully completed")
+
+    # Course + module info
+    p.setFont("Helvetica-Bold", 20)
+    p.setFillColor(BURGUNDY)
+    p.drawCentredString(page_width / 2, page_height - 370, data["course_title"])
+
+    p.setFont("Helvetica", 13)
+    p.setFillColor(GRAY)
+    p.drawCentredString(page_width / 2, page_height - 395, f"Module: {data['module_title']}")
+    p.drawCentredString(page_width / 2, page_height - 415, f"Score Achieved: {data['score']}%")
+
+    # Issue details
+    p.setFont("Helvetica-Oblique", 11)
+    p.setFillColor(GRAY)
+    p.drawCentredString(page_width / 2, margin + 80, f"Issued on {data['issued_on']}")
+    p.drawCentredString(page_width / 2, margin + 60, f"Certificate No: {data['certificate_number']}")
+
+    # Footer
+    p.setFont("Helvetica", 10)
+    p.setFillColor(BURGUNDY)
+    p.drawCentredString(page_width / 2, margin + 35, "Cozy Coaches – Driver Academy")
+    p.setFillColor(GRAY)
+    p.drawCentredString(page_width / 2, margin + 20, "© Cozy Coaches Ltd. All rights reserved")
+
+    p.showPage()
+
+
+def render_certificate_pdf(data):
+    """
+    Render a single certificate to PDF bytes.
+    """
+    buffer = io.BytesIO()
+    # invariant=1 keeps the output byte-identical for identical input,
+    # so the content hash only changes when the certificate does
+    p = canvas.Canvas(buffer, pagesize=landscape(A4), invariant=1)
+    draw_certificate(p, data)
+    p.save()
+    return buffer.getvalue()
+
+
+def render_merged_pdf(datas, fileobj):
+    """
+    Draw many certificates, one per page, into a single PDF written to fileobj.
+    """
+    p = canvas.Canvas(fileobj, pagesize=landscape(A4), invariant=1)
+    for data in datas:
+        draw_certificate(p, data)
+    p.save()
@@ -0,0 +1,230 @@
+# academy/certificates.py
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue
+
+from .certificate_layout import LAYOUT_VERSION, render_certificate_pdf, render_merged_pdf
+from .models import Certificate
+from .streaming import copy_to_tempfile, stream_zip
+
+
+def certificate_render_data(certificate):
+    """
+    Everything the layout needs, as plain values (safe to send to another process).
+    """
+    user = certificate.user
+    return {
+        "name": user.get_full_name() or user.username,
+        "course_title": certificate.course.title,
+        "module_title": certificate.module.title,
+        "score": certificate.score,
+        "issued_on": certificate.issued_at.strftime("%d %B %Y"),
+        "certificate_number": certificate.certificate_number,
+    }
+
+
+def store_certificate_pdf(certificate, pdf_bytes):
+    """
+    Save rendered PDF bytes to media under their content hash and record
+    them on the certificate.
+    """
+    sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+    name = f"certificates/{sha256}.pdf"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(pdf_bytes))
+
+    certificate.pdf_file.name = name
+    certificate.pdf_sha256 = sha256
+    certificate.pdf_layout_version = LAYOUT_VERSION
+    certificate.pdf_rendered_at = timezone.now()
+    certificate.save(update_fields=[
+        "pdf_file",
+        "pdf_sha256",
+        "pdf_layout_version",
+        "pdf_rendered_at",
+    ])
+
+
+def needs_render(certificate):
+    return (
+        not certificate.pdf_file
+        or certificate.pdf_layout_version != LAYOUT_VERSION
+        or not default_storage.exists(certificate.pdf_file.name)
+    )
+
+
+def ensure_certificate_pdf(certificate):
+    """
+    Render and store the certificate's PDF unless an up-to-date one exists.
+    """
+    if needs_render(certificate):
+        store_certificate_pdf(
+            certificate,
+            render_certificate_pdf(certificate_render_data(certificate)),
+        )
+    return certificate
+
+
+def issue_certificate(user, module, score):
+    """
+    Create the user's Certificate for a module if they don't have one yet.
+
+    Returns (certificate, created). New certificates have their PDF rendered
+    by the background worker once the transaction commits.
+    """
+    existing = Certificate.objects.filter(user=user, module=module).first()
+    if existing:
+        return existing, False
+
+    course = module.course
+
+    # Generate a simple unique certificate number
+    timestamp = int(timezone.now().timestamp())
+    cert_number = f"COZY-{course.id}-{module.id}-{user.id}-{timestamp}"
+
+    with transaction.atomic():
+        certificate = Certificate.objects.create(
+            user=user,
+            course=course,
+            module=module,
+            score=score,
+            certificate_number=cert_number,
+        )
+        enqueue("academy.render_certificate", {"certificate_id": certificate.id})
+
+    return certificate, True
+
+
+# =============================
+# BULK EXPORT
+# =============================
+
+# Below this many missing PDFs a process pool costs more than it saves
+PARALLEL_RENDER_THRESHOLD = 8
+
+# Certificates per background render job
+RENDER_JOB_SIZE = 100
+
+MERGED_EXPORT_DIR = "certificate-exports"
+
+
+def filter_certificates(course=None, module=None, date_from=None, date_to=None, group=None):
+    """
+    Certificates matching the export filters, oldest first.
+    date_from/date_to are inclusive dates; group matches the holder's groups.
+    """
+    certificates = (
+        Certificate.objects
+        .select_related("user", "course", "module")
+        .order_by("issued_at", "id")
+    )
+    if course:
+        certificates = certificates.filter(course=course)
+    if module:
+        certificates = certificates.filter(module=module)
+    if date_from:
+        certificates = certificates.filter(issued_at__date__gte=date_from)
+    if date_to:
+        certificates = certificates.filter(issued_at__date__lte=date_to)
+    if group:
+        certificates = certificates.filter(user__groups=group)
+    return certificates
+
+
+def render_missing_pdfs(certificates, workers=None, progress=None):
+    """
+    Render and store every certificate in `certificates` that has no
+    up-to-date PDF. With workers other than 1 the ReportLab work is spread
+    across a process pool, which is only meant for the export_certificates
+    command: web requests queue the work instead (see queue_missing_pdfs).
+
+    progress, if given, is called as progress(done, total) after each PDF.
+    Returns the number of PDFs rendered.
+    """
+    missing = [certificate for certificate in certificates if needs_render(certificate)]
+    total = len(missing)
+    if not total:
+        return 0
+
+    datas = [certificate_render_data(certificate) for certificate in missing]
+
+    def store_all(pdfs):
+        for done, (certificate, pdf_bytes) in enumerate(zip(missing, pdfs), start=1):
+            store_certificate_pdf(certificate, pdf_bytes)
+            if progress:
+                progress(done, total)
+
+    if total < PARALLEL_RENDER_THRESHOLD or workers == 1:
+        store_all(map(render_certificate_pdf, datas))
+    else:
+        # Don't let forked workers inherit open database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            store_all(pool.map(render_certificate_pdf, datas, chunksize=4))
+
+    return total
+
+
+def queue_missing_pdfs(certificates):
+    """
+    Queue background jobs to render the certificates that have no
+    up-to-date PDF, RENDER_JOB_SIZE to a job. Returns how many are missing.
+    """
+    missing_ids = [certificate.id for certificate in certificates if needs_render(certificate)]
+    for start in range(0, len(missing_ids), RENDER_JOB_SIZE):
+        enqueue("academy.render_certificates", {
+            "certificate_ids": missing_ids[start:start + RENDER_JOB_SIZE],
+        })
+    return len(missing_ids)
+
+
+def export_certificates_zip(certificates):
+    """
+    Yield a ZIP of the certificates' stored PDFs, opening one file at a time.
+    Call render_missing_pdfs (or wait for queue_missing_pdfs) first.
+    """
+    entries = (
+        (f"{certificate.certificate_number}.pdf", certificate.pdf_file.open("rb"))
+        for certificate in certificates
+    )
+    return stream_zip(entries)
+
+
+def export_certificates_merged_pdf(certificates):
+    """
+    Draw all the certificates into one PDF (one page each) in a temporary
+    file, and return that file rewound for streaming.
+    """
+    datas = (certificate_render_data(certificate) for certificate in certificates)
+    return copy_to_tempfile(lambda fileobj: render_merged_pdf(datas, fileobj))
+
+
+def merged_pdf_name(certificates):
+    """
+    Storage name of the merged PDF for these certificates. It follows their
+    content and the layout version, so any change gives a new file.
+    """
+    digest = hashlib.sha256(str(LAYOUT_VERSION).encode())
+    for certificate in certificates:
+        digest.update(repr(sorted(certificate_render_data(certificate).items())).encode())
+    return f"{MERGED_EXPORT_DIR}/{digest.hexdigest()}.pdf"
+
+
+def store_merged_pdf(certificates):
+    """
+    Render the merged PDF for these certificates into storage unless it's
+    already there. Returns its storage name.
+    """
+    certificates = list(certificates)
+    name = merged_pdf_name(certificates)
+    if not default_storage.exists(name):
+        with export_certificates_merged_pdf(certificates) as merged:
+            default_storage.save(name, File(merged))
+    return name
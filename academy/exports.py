@@ -0,0 +1,231 @@
+# academy/exports.py
+#
+# Streaming CSV / XLSX exports for compliance reports. Rows are pulled from
+# the database in chunks and written out as they arrive, so memory use stays
+# flat however many rows an export covers.
+
+import csv
+import re
+from itertools import chain
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .certificates import filter_certificates
+from .reports import driver_progress_rows, final_test_submissions
+from .streaming import stream_zip
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# =============================
+# REPORT SOURCES
+# =============================
+# Each returns (header, rows) where rows is a lazy iterable of tuples.
+
+def driver_progress_report(filters, sort="driver"):
+    header = ("Driver", "Course", "Module", "Status", "Score (%)", "Completed at")
+    rows = (
+        (
+            row["driver"],
+            row["course_title"],
+            row["module_title"],
+            row["status"],
+            row["score"],
+            row["completed_at"],
+        )
+        for row in driver_progress_rows(filters, sort=sort)
+    )
+    return header, rows
+
+
+def final_test_report(filters):
+    header = (
+        "Submitted at",
+        "Driver",
+        "Course",
+        "Module",
+        "Correct",
+        "Questions",
+        "Score (%)",
+        "Reviewed",
+        "Passed",
+        "Reviewed by",
+        "Reviewed at",
+    )
+    submissions = (
+        final_test_submissions(filters)
+        .order_by("-submitted_at", "-id")
+        .values_list(
+            "submitted_at",
+            "user__username",
+            "module__course__title",
+            "module__title",
+            "correct_count",
+            "total_questions",
+            "score_percent",
+            "reviewed",
+            "is_passed",
+            "reviewed_by__username",
+            "reviewed_at",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    def rows():
+        for (submitted_at, username, course_title, module_title, correct, total,
+             score_percent, reviewed, is_passed, reviewed_by, reviewed_at) in submissions:
+            yield (
+                submitted_at,
+                username,
+                course_title,
+                module_title,
+                correct,
+                total,
+                score_percent,
+                "Yes" if reviewed else "No",
+                "Yes" if is_passed else "No",
+                reviewed_by or "",
+                reviewed_at,
+            )
+
+    return header, rows()
+
+
+def certificate_report(filters):
+    header = ("Certificate #", "Driver", "Course", "Module", "Score (%)", "Issued at")
+    certificates = (
+        filter_certificates(**filters)
+        .values_list(
+            "certificate_number",
+            "user__username",
+            "course__title",
+            "module__title",
+            "score",
+            "issued_at",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, certificates
+
+
+# =============================
+# WRITERS
+# =============================
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_cell(value):
+    text = _cell_text(value)
+    # Don't let spreadsheet apps evaluate user-entered text as a formula
+    if isinstance(value, str) and text[:1] in ("=", "+", "-", "@"):
+        text = "'" + text
+    return text
+
+
+class _Echo:
+    """Pseudo-buffer: csv.writer hands back each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """
+    Yield the report as CSV, one encoded line at a time.
+    """
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens UTF-8 names correctly
+    yield "﻿".encode("utf-8")
+    yield writer.writerow(header).encode("utf-8")
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row]).encode("utf-8")
+
+
+# Characters that aren't allowed in XML 1.0 documents
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_CONTENT_TYPES = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_XLSX_ROOT_RELS = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_XLSX_WORKBOOK = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_XLSX_WORKBOOK_RELS = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", _cell_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_sheet(header, rows):
+    yield (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        b"<sheetData>"
+    )
+    batch = []
+    for values in chain([header], rows):
+        batch.append("<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>")
+        if len(batch) >= 500:
+            yield "".join(batch).encode("utf-8")
+            batch = []
+    if batch:
+        yield "".join(batch).encode("utf-8")
+    yield b"</sheetData></worksheet>"
+
+
+def stream_xlsx(header, rows):
+    """
+    Yield the report as a single-sheet XLSX workbook.
+
+    The worksheet XML is generated row by row and zipped on the fly, so
+    nothing is buffered beyond a few hundred rows.
+    """
+    return stream_zip([
+        ("[Content_Types].xml", [_XLSX_CONTENT_TYPES]),
+        ("_rels/.rels", [_XLSX_ROOT_RELS]),
+        ("xl/workbook.xml", [_XLSX_WORKBOOK]),
+        ("xl/_rels/workbook.xml.rels", [_XLSX_WORKBOOK_RELS]),
+        ("xl/worksheets/sheet1.xml", _xlsx_sheet(header, rows)),
+    ])
+
+
+WRITERS = {
+    "csv": stream_csv,
+    "xlsx": stream_xlsx,
+}
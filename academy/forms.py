@@ -1,6 +1,7 @@
 from django import forms
+from django.contrib.auth.models import Group
 from .models import Question, Choice
-from .models import Course
+from .models import Course, Module
 from django.utils.text import slugify
 
 
@@ -53,3 +54,65 @@ class CourseForm(forms.ModelForm):
     def clean_slug(self):
         slug = self.cleaned_data["slug"]
         return slugify(slug)
+
+
+# ======================
+# CERTIFICATE EXPORT FORM
+# ======================
+
+class CertificateExportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ("zip", "ZIP of PDFs"),
+        ("pdf", "Single merged PDF"),
+        ("csv", "CSV report"),
+        ("xlsx", "Excel report"),
+    )
+
+    course = forms.ModelChoiceField(
+        queryset=Course.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select bg-dark text-light border-secondary"}),
+    )
+    module = forms.ModelChoiceField(
+        queryset=Module.objects.select_related("course").order_by("course__order", "order"),
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select bg-dark text-light border-secondary"}),
+    )
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.order_by("name"),
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select bg-dark text-light border-secondary"}),
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control bg-dark text-light border-secondary"}),
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control bg-dark text-light border-secondary"}),
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        initial="zip",
+        widget=forms.Select(attrs={"class": "form-select bg-dark text-light border-secondary"}),
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        date_from = cleaned.get("date_from")
+        date_to = cleaned.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("The start date must be before the end date.")
+        return cleaned
+
+
+class DriverImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label="CSV file",
+        widget=forms.ClearableFileInput(attrs={"accept": ".csv", "class": "form-control bg-dark text-light border-secondary"}),
+    )
+    skip_invalid = forms.BooleanField(
+        required=False,
+        label="Import the valid rows even if some rows have errors",
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
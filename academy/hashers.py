@@ -0,0 +1,15 @@
+# academy/hashers.py
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ImportPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 at a lower iteration count, for passwords set by the bulk driver
+    import in a web request (see academy.onboarding).
+
+    It has its own algorithm name, so Django re-hashes the password with the
+    default hasher the first time the driver logs in.
+    """
+    algorithm = "pbkdf2_sha256_import"
+    iterations = 20_000
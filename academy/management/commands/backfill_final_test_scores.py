@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from academy.models import FinalTestSubmission
+
+
+class Command(BaseCommand):
+    help = "Fill the stored correct_count / total_questions / score_percent of final test submissions from their answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every submission, not just ones with no stored totals.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        submissions = FinalTestSubmission.objects.order_by("pk").only(
+            "pk", "answers", "correct_count", "total_questions", "score_percent"
+        )
+        if not options["all"]:
+            submissions = submissions.filter(total_questions=0)
+
+        fields = ["correct_count", "total_questions", "score_percent"]
+        batch = []
+        updated = 0
+
+        for submission in submissions.iterator(chunk_size=batch_size):
+            before = tuple(getattr(submission, field) for field in fields)
+            submission.set_scores()
+            if tuple(getattr(submission, field) for field in fields) == before:
+                continue
+            batch.append(submission)
+            if len(batch) >= batch_size:
+                FinalTestSubmission.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            FinalTestSubmission.objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated scores on {updated} final test submissions."))
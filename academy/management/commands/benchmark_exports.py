@@ -0,0 +1,64 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from academy.exports import (
+    WRITERS,
+    certificate_report,
+    driver_progress_report,
+    final_test_report,
+)
+
+REPORTS = {
+    "driver-progress": lambda: driver_progress_report({}),
+    "final-tests": lambda: final_test_report({}),
+    "certificates": lambda: certificate_report({}),
+}
+
+
+class Command(BaseCommand):
+    help = "Measure throughput and peak memory of the streaming report exports (output is discarded)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--report", choices=sorted(REPORTS), action="append",
+                            help="Report(s) to run (default: all).")
+        parser.add_argument("--format", choices=sorted(WRITERS), action="append",
+                            help="Format(s) to run (default: all).")
+
+    def handle(self, *args, **options):
+        reports = options["report"] or sorted(REPORTS)
+        formats = options["format"] or sorted(WRITERS)
+
+        for name in reports:
+            for export_format in formats:
+                self._run(name, export_format)
+
+    def _run(self, name, export_format):
+        rows = 0
+
+        def counted(iterable):
+            nonlocal rows
+            for row in iterable:
+                rows += 1
+                yield row
+
+        header, source = REPORTS[name]()
+        size = 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for chunk in WRITERS[export_format](header, counted(source)):
+                size += len(chunk)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{name:<16} {export_format:<5} {rows:>8} rows  {elapsed:7.2f}s  "
+            f"{rate:>10.0f} rows/s  {size / 1024:>9.0f} KiB  "
+            f"peak {peak / 1024 / 1024:6.1f} MiB  {len(queries)} queries"
+        )
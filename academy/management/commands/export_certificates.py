@@ -0,0 +1,72 @@
+import shutil
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from academy.certificates import (
+    export_certificates_merged_pdf,
+    export_certificates_zip,
+    filter_certificates,
+    render_missing_pdfs,
+)
+from academy.models import Course, Module
+
+
+class Command(BaseCommand):
+    help = "Export issued certificates as a ZIP of PDFs (or one merged PDF), rendering missing PDFs in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write the export to.")
+        parser.add_argument("--course", help="Course slug.")
+        parser.add_argument("--module", type=int, help="Module id.")
+        parser.add_argument("--group", help="Group name.")
+        parser.add_argument("--from", dest="date_from", help="Issued on or after (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="date_to", help="Issued on or before (YYYY-MM-DD).")
+        parser.add_argument("--format", choices=["zip", "pdf"], default="zip")
+        parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count).")
+
+    def handle(self, *args, **options):
+        filters = {}
+        try:
+            if options["course"]:
+                filters["course"] = Course.objects.get(slug=options["course"])
+            if options["module"]:
+                filters["module"] = Module.objects.get(pk=options["module"])
+            if options["group"]:
+                filters["group"] = Group.objects.get(name=options["group"])
+        except (Course.DoesNotExist, Module.DoesNotExist, Group.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+
+        for key in ("date_from", "date_to"):
+            if options[key]:
+                filters[key] = parse_date(options[key])
+                if filters[key] is None:
+                    raise CommandError(f"Invalid date: {options[key]}")
+
+        certificates = list(filter_certificates(**filters))
+        total = len(certificates)
+        self.stdout.write(f"{total} certificates match.")
+        if not total:
+            return
+
+        with open(options["output"], "wb") as out:
+            if options["format"] == "pdf":
+                with export_certificates_merged_pdf(certificates) as merged:
+                    shutil.copyfileobj(merged, out)
+            else:
+                rendered = render_missing_pdfs(
+                    certificates,
+                    workers=options["workers"],
+                    progress=self._progress,
+                )
+                if rendered:
+                    self.stdout.write("")
+                for chunk in export_certificates_zip(certificates):
+                    out.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} certificates to {options['output']}."))
+
+    def _progress(self, done, total):
+        self.stdout.write(f"\rRendered {done}/{total} PDFs", ending="")
+        self.stdout.flush()
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from academy.models import Course, Module
+from academy.question_export import question_bank_entries, questions_for, stream_question_bank
+
+
+class Command(BaseCommand):
+    help = "Export questions as JSON in the custom format import_questions accepts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write to ('-' for stdout).")
+        parser.add_argument("--course", help="Course slug.")
+        parser.add_argument("--module", help="Module slug (use with --course) or id.")
+
+    def handle(self, *args, **options):
+        course = module = None
+        try:
+            if options["course"]:
+                course = Course.objects.get(slug=options["course"])
+            if options["module"]:
+                if options["module"].isdigit():
+                    module = Module.objects.get(pk=int(options["module"]))
+                elif course is not None:
+                    module = Module.objects.get(course=course, slug=options["module"])
+                else:
+                    raise CommandError("Give --course with a module slug (or use the module id).")
+        except (Course.DoesNotExist, Module.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+
+        count = 0
+
+        def counted(entries):
+            nonlocal count
+            for entry in entries:
+                count += 1
+                yield entry
+
+        chunks = stream_question_bank(counted(question_bank_entries(questions_for(course=course, module=module))))
+        if options["output"] == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options["output"], "wb") as fileobj:
+            for chunk in chunks:
+                fileobj.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} questions to {options['output']}."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from academy.onboarding import import_drivers, read_driver_csv, validate_driver_rows
+
+
+class Command(BaseCommand):
+    help = "Create drivers from a CSV of username,email,password,group,courses (passwords hashed in parallel)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import.")
+        parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: CPU count).")
+        parser.add_argument("--skip-invalid", action="store_true", help="Import the valid rows even if some rows have errors.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; create nothing.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], "rb") as fileobj:
+                rows = read_driver_csv(fileobj)
+        except (OSError, ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(str(exc))
+
+        valid, errors = validate_driver_rows(rows)
+        for line, message in errors:
+            self.stderr.write(f"Line {line}: {message}")
+
+        if errors and not options["skip_invalid"]:
+            raise CommandError(f"{len(errors)} problem(s) found; nothing was imported.")
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(valid)} of {len(rows)} row(s) are valid. Dry run: nothing imported.")
+            return
+
+        created = import_drivers(valid, workers=options["workers"])
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} driver(s)."))
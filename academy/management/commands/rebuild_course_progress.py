@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from academy.progress import rebuild_course_progress, verify_course_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CourseProgress rollup table from lesson/module progress and verify it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course",
+            type=int,
+            action="append",
+            dest="course_ids",
+            help="Only rebuild this course id (can be repeated).",
+        )
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Report rows that are out of date without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        course_ids = options["course_ids"]
+
+        if not options["verify_only"]:
+            stats = rebuild_course_progress(course_ids=course_ids)
+            self.stdout.write(
+                f"Rebuilt course progress: {stats['created']} created, "
+                f"{stats['updated']} updated, {stats['deleted']} deleted."
+            )
+
+        mismatches = verify_course_progress(course_ids=course_ids)
+        if mismatches:
+            for user_id, course_id in mismatches[:20]:
+                self.stderr.write(f"Out of date: user {user_id}, course {course_id}")
+            raise CommandError(f"{len(mismatches)} course progress rows are out of date.")
+
+        self.stdout.write(self.style.SUCCESS("Course progress rollups verified."))
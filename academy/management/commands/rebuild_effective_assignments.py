@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from academy.assignments import rebuild_effective_assignments, verify_effective_assignments
+
+
+class Command(BaseCommand):
+    help = "Rebuild the EffectiveAssignment table from course assignments and group membership, and verify it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Report rows that are missing or stale without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            stats = rebuild_effective_assignments()
+            self.stdout.write(
+                f"Rebuilt effective assignments: {stats['created']} created, "
+                f"{stats['deleted']} deleted."
+            )
+
+        mismatches = verify_effective_assignments()
+        if mismatches:
+            for user_id, course_id in mismatches[:20]:
+                self.stderr.write(f"Out of date: user {user_id}, course {course_id}")
+            raise CommandError(f"{len(mismatches)} effective assignment rows are out of date.")
+
+        self.stdout.write(self.style.SUCCESS("Effective assignments verified."))
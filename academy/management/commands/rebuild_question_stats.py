@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from academy.analytics import rebuild_question_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the final test analytics tables (question, choice and daily module stats) from all submissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Submissions read per database round trip (default 500).",
+        )
+
+    def handle(self, *args, **options):
+        stats = rebuild_question_stats(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt final test analytics from {stats['submissions']} submissions: "
+            f"{stats['questions']} questions, {stats['choices']} choices, {stats['days']} module-days."
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from academy.search import fulltext_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the question/lesson full-text search index from scratch."
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} documents (backend: {fulltext_backend()})."
+        ))
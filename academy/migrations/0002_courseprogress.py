@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modules_passed', models.PositiveIntegerField(default=0)),
+                ('modules_total', models.PositiveIntegerField(default=0)),
+                ('lessons_completed', models.PositiveIntegerField(default=0)),
+                ('lessons_total', models.PositiveIntegerField(default=0)),
+                ('percent', models.PositiveIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='academy.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'percent'], name='academy_cou_course__c1d288_idx')],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+    ]
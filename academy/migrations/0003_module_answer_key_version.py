@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0002_courseprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='module',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0003_module_answer_key_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_file',
+            field=models.FileField(blank=True, upload_to='certificates/'),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_layout_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_rendered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0004_certificate_pdf_store'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finaltestsubmission',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='finaltestsubmission',
+            name='score_percent',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='finaltestsubmission',
+            name='total_questions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='finaltestsubmission',
+            index=models.Index(fields=['-submitted_at', '-id'], name='academy_fts_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='finaltestsubmission',
+            index=models.Index(fields=['reviewed', '-submitted_at', '-id'], name='academy_fts_reviewed_idx'),
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:21
+
+from html import unescape
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+FTS_TABLE = "academy_searchdocument_fts"
+
+SQLITE_INDEX_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body,
+        content='academy_searchdocument', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    # External-content FTS5 tables are kept in step with triggers
+    f"""
+    CREATE TRIGGER academy_searchdocument_ai AFTER INSERT ON academy_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER academy_searchdocument_ad AFTER DELETE ON academy_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER academy_searchdocument_au AFTER UPDATE ON academy_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS academy_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS academy_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS academy_searchdocument_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_INDEX_SQL = [
+    """
+    ALTER TABLE academy_searchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX academy_searchdocument_vector_idx ON academy_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_DROP_SQL = [
+    "DROP INDEX IF EXISTS academy_searchdocument_vector_idx",
+    "ALTER TABLE academy_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("FTS5" in row[0] for row in cursor.fetchall())
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite" and _sqlite_has_fts5(schema_editor.connection):
+        statements = SQLITE_INDEX_SQL
+    elif vendor == "postgresql":
+        statements = POSTGRES_INDEX_SQL
+    else:
+        # Other backends search with icontains (see academy/search.py)
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_DROP_SQL, "postgresql": POSTGRES_DROP_SQL}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def index_existing_content(apps, schema_editor):
+    SearchDocument = apps.get_model("academy", "SearchDocument")
+    Question = apps.get_model("academy", "Question")
+    Choice = apps.get_model("academy", "Choice")
+    Lesson = apps.get_model("academy", "Lesson")
+
+    choices = {}
+    for question_id, text in Choice.objects.order_by("id").values_list("question_id", "text"):
+        choices.setdefault(question_id, []).append(text)
+
+    documents = [
+        SearchDocument(
+            kind="question",
+            question_id=question.pk,
+            course_id=question.module.course_id,
+            module_id=question.module_id,
+            title=question.text,
+            body="\n".join([question.explanation, *choices.get(question.pk, [])]).strip(),
+        )
+        for question in Question.objects.select_related("module").iterator(chunk_size=500)
+    ]
+    documents += [
+        SearchDocument(
+            kind="lesson",
+            lesson_id=lesson.pk,
+            course_id=lesson.module.course_id,
+            module_id=lesson.module_id,
+            title=lesson.title,
+            body=unescape(strip_tags(lesson.content)),
+        )
+        for lesson in Lesson.objects.select_related("module").iterator(chunk_size=500)
+    ]
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0005_finaltestsubmission_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question', 'Question'), ('lesson', 'Lesson')], max_length=20)),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academy.course')),
+                ('lesson', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academy.lesson')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academy.module')),
+                ('question', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academy.question')),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(index_existing_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_effective_assignments(apps, schema_editor):
+    CourseAssignment = apps.get_model("academy", "CourseAssignment")
+    EffectiveAssignment = apps.get_model("academy", "EffectiveAssignment")
+    Membership = apps.get_model(settings.AUTH_USER_MODEL).groups.through
+
+    pairs = set(
+        CourseAssignment.objects
+        .filter(user__isnull=False)
+        .values_list("user_id", "course_id")
+    )
+
+    members = {}
+    for user_id, group_id in Membership.objects.values_list("user_id", "group_id"):
+        members.setdefault(group_id, []).append(user_id)
+    for group_id, course_id in (
+        CourseAssignment.objects
+        .filter(group__isnull=False)
+        .values_list("group_id", "course_id")
+    ):
+        pairs.update((user_id, course_id) for user_id in members.get(group_id, ()))
+
+    EffectiveAssignment.objects.bulk_create(
+        [EffectiveAssignment(user_id=user_id, course_id=course_id) for user_id, course_id in pairs],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0006_searchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_assignments', to='academy.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_assignments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'user'], name='academy_eff_course__a708aa_idx')],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(backfill_effective_assignments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academy', '0007_effectiveassignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceStats',
+            fields=[
+                ('choice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='academy.choice')),
+                ('picks', models.PositiveIntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_stats', to='academy.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyModuleStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('passed', models.PositiveIntegerField(default=0)),
+                ('score_total', models.PositiveIntegerField(default=0)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='academy.module')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'module'], name='academy_dai_date_a06dbd_idx')],
+                'unique_together': {('module', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='academy.question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('unanswered', models.PositiveIntegerField(default=0)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='academy.module')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['module', 'attempts'], name='academy_que_module__63ac9e_idx')],
+            },
+        ),
+    ]
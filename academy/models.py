@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -25,6 +25,8 @@ class Module(models.Model):
     order = models.PositiveIntegerField(default=1)
     min_score_to_pass = models.PositiveIntegerField(default=80)  # % required
     is_mandatory = models.BooleanField(default=True)
+    # Bumped whenever a question or choice in this module changes (see answer_keys)
+    answer_key_version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         unique_together = ("course", "slug")
@@ -113,6 +115,39 @@ class LessonProgress(models.Model):
         return f"{self.user} – {self.lesson} – {'Done' if self.completed else 'Pending'}"
 
 
+class CourseProgress(models.Model):
+    """
+    Denormalised per-user rollup of progress through a course.
+
+    Maintained by academy.progress whenever lesson or module progress changes,
+    so dashboards and reports can read one row per course instead of
+    aggregating LessonProgress / ModuleProgress on every request.
+    Rebuild with: python manage.py rebuild_course_progress
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="course_progress",
+    )
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="progress_rollups")
+    modules_passed = models.PositiveIntegerField(default=0)
+    modules_total = models.PositiveIntegerField(default=0)
+    lessons_completed = models.PositiveIntegerField(default=0)
+    lessons_total = models.PositiveIntegerField(default=0)
+    percent = models.PositiveIntegerField(default=0)  # % of modules passed
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "course")
+        indexes = [
+            models.Index(fields=["course", "percent"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} – {self.course} – {self.percent}%"
+
+
 class Certificate(models.Model):
     """
     Certificate issued when a user passes a specific module (e.g. final assessment).
@@ -124,6 +159,12 @@ class Certificate(models.Model):
     issued_at = models.DateTimeField(default=timezone.now)
     certificate_number = models.CharField(max_length=50, unique=True)
 
+    # Rendered once and stored under its content hash (see academy.certificates)
+    pdf_file = models.FileField(upload_to="certificates/", blank=True)
+    pdf_sha256 = models.CharField(max_length=64, blank=True)
+    pdf_layout_version = models.PositiveIntegerField(default=0)
+    pdf_rendered_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         unique_together = ("user", "module")
 
@@ -160,6 +201,12 @@ class FinalTestSubmission(models.Model):
     # ]
     answers = models.JSONField()
 
+    # Marking totals, stored at submission time so the manager list doesn't
+    # have to parse every answers blob
+    correct_count = models.PositiveIntegerField(default=0)
+    total_questions = models.PositiveIntegerField(default=0)
+    score_percent = models.PositiveSmallIntegerField(default=0)
+
     reviewed = models.BooleanField(default=False)
     is_passed = models.BooleanField(default=False)
     feedback = models.TextField(blank=True)
@@ -175,28 +222,121 @@ class FinalTestSubmission(models.Model):
 
     class Meta:
         ordering = ["-submitted_at"]
+        indexes = [
+            models.Index(fields=["-submitted_at", "-id"], name="academy_fts_submitted_idx"),
+            models.Index(fields=["reviewed", "-submitted_at", "-id"], name="academy_fts_reviewed_idx"),
+        ]
 
     def __str__(self):
         return f"Final test – {self.user} – {self.module}"
 
+    @property
+    def incorrect_count(self):
+        return self.total_questions - self.correct_count
+
+    def set_scores(self):
+        """
+        Fill correct_count / total_questions / score_percent from answers.
+        """
+        answers = self.answers or []
+        self.total_questions = len(answers)
+        self.correct_count = sum(1 for a in answers if a.get("is_correct"))
+        if self.total_questions:
+            self.score_percent = int((self.correct_count / self.total_questions) * 100)
+        else:
+            self.score_percent = 0
+
     def save(self, *args, **kwargs):
         from .models import ModuleProgress  # avoid circular import at top
+        from .progress import refresh_course_progress
+
+        if self._state.adding and not self.total_questions:
+            self.set_scores()
+
+        with transaction.atomic():
+            # If this submission is being marked as passed, make sure ModuleProgress reflects that
+            super().save(*args, **kwargs)
+
+            if self.reviewed and self.is_passed:
+                mp, _ = ModuleProgress.objects.get_or_create(
+                    user=self.user,
+                    module=self.module,
+                    defaults={"status": "completed"},
+                )
+                mp.status = "completed"
+                mp.score = max(mp.score, 100)  # or any score you want for "passed"
+                now = timezone.now()
+                mp.completed_at = mp.completed_at or now
+                mp.last_attempt_at = now
+                mp.save()
+                refresh_course_progress(self.user, self.module.course_id)
+
+
+class QuestionStats(models.Model):
+    """
+    Running final test totals for one question: how often it was asked,
+    answered correctly, or left unanswered.
+
+    Updated by academy.analytics as each FinalTestSubmission is created,
+    so the analytics page never reads the answers JSON.
+    Rebuild with: python manage.py rebuild_question_stats
+    """
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name="question_stats")
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    unanswered = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["module", "attempts"]),
+        ]
+
+    def __str__(self):
+        return f"{self.question} – {self.correct}/{self.attempts}"
+
+    @property
+    def correct_percent(self):
+        if not self.attempts:
+            return 0
+        return round(self.correct * 100 / self.attempts)
+
+
+class ChoiceStats(models.Model):
+    """
+    How many final test answers picked a choice (see QuestionStats).
+    """
+    choice = models.OneToOneField(
+        Choice, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="choice_stats")
+    picks = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.choice} – {self.picks}"
 
-        # If this submission is being marked as passed, make sure ModuleProgress reflects that
-        super().save(*args, **kwargs)
 
-        if self.reviewed and self.is_passed:
-            mp, _ = ModuleProgress.objects.get_or_create(
-                user=self.user,
-                module=self.module,
-                defaults={"status": "completed"},
-            )
-            mp.status = "completed"
-            mp.score = max(mp.score, 100)  # or any score you want for "passed"
-            now = timezone.now()
-            mp.completed_at = mp.completed_at or now
-            mp.last_attempt_at = now
-            mp.save()
+class DailyModuleStats(models.Model):
+    """
+    Final test submissions per module per day, with how many reached the
+    module's pass mark, for pass-rate trends (see QuestionStats).
+    """
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    submissions = models.PositiveIntegerField(default=0)
+    passed = models.PositiveIntegerField(default=0)
+    score_total = models.PositiveIntegerField(default=0)  # sum of score_percent
+
+    class Meta:
+        unique_together = ("module", "date")
+        indexes = [
+            models.Index(fields=["date", "module"]),
+        ]
+
+    def __str__(self):
+        return f"{self.module} – {self.date} – {self.passed}/{self.submissions}"
 
 
 class ManagerDocument(models.Model):
@@ -229,3 +369,68 @@ class CourseAssignment(models.Model):
     def __str__(self):
         owner = self.user or self.group
         return f"{owner} → {self.course}"
+
+
+class EffectiveAssignment(models.Model):
+    """
+    Materialised (user, course) pairs: every course a user is assigned,
+    directly or through one of their groups.
+
+    Maintained by academy.assignments from signals on CourseAssignment and
+    User.groups, so "what is this user assigned" and "who is assigned this
+    course" are single indexed reads instead of group joins.
+    Rebuild with: python manage.py rebuild_effective_assignments
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="effective_assignments",
+    )
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="effective_assignments")
+
+    class Meta:
+        unique_together = ("user", "course")
+        indexes = [
+            models.Index(fields=["course", "user"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} → {self.course}"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalised search text for a Question (with its choices) or a Lesson,
+    kept in sync by signals (see academy/search.py).
+
+    The full-text index itself is backend specific and lives outside the
+    ORM: an FTS5 table on SQLite, a generated tsvector column with a GIN
+    index on PostgreSQL (migration 0006).
+    """
+    KIND_QUESTION = "question"
+    KIND_LESSON = "lesson"
+    KIND_CHOICES = (
+        (KIND_QUESTION, "Question"),
+        (KIND_LESSON, "Lesson"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Exactly one of these is set; deleting it removes the document
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    lesson = models.OneToOneField(
+        Lesson, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="+")
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name="+")
+    title = models.TextField()
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}"
+
+    @property
+    def object_id(self):
+        return self.question_id or self.lesson_id
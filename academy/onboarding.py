@@ -0,0 +1,224 @@
+# academy/onboarding.py
+#
+# Bulk driver import from CSV. Every row is validated before anything is
+# written; then passwords are hashed (each hash is a full PBKDF2 run, so
+# this is where the time goes); then users, group memberships and course
+# assignments are inserted with bulk_create in one transaction, and the new
+# users' effective assignments filled in.
+#
+# The import_drivers command hashes across a process pool. A web request
+# must not fork, so the upload view hashes in-process with IMPORT_HASHER, a
+# cheaper PBKDF2 that is upgraded to the default hasher on first login.
+
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connections, transaction
+
+from .assignments import refresh_effective_assignments
+from .models import Course, CourseAssignment
+
+CSV_COLUMNS = ("username", "email", "password", "group", "courses")
+
+# Below this many rows the pool's start-up costs more than it saves
+PARALLEL_HASH_THRESHOLD = 8
+
+# See academy.hashers.ImportPBKDF2PasswordHasher
+IMPORT_HASHER = "pbkdf2_sha256_import"
+
+# "group" and "courses" cells may hold several values separated by this
+LIST_SEPARATOR = ";"
+
+
+def _split(cell):
+    return [value.strip() for value in (cell or "").split(LIST_SEPARATOR) if value.strip()]
+
+
+def read_driver_csv(fileobj):
+    """
+    Rows of a driver CSV as (line number, dict) pairs.
+
+    Accepts a text or binary file; a UTF-8 BOM (as Excel writes) is ignored.
+    Raises ValueError if required columns are missing.
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+    reader = csv.DictReader(fileobj)
+    header = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in ("username", "password") if name not in header]
+    if missing:
+        raise ValueError(f"The CSV is missing the column(s): {', '.join(missing)}.")
+    reader.fieldnames = header
+
+    rows = []
+    for row in reader:
+        if not any((value or "").strip() for value in row.values() if isinstance(value, str)):
+            continue  # blank line
+        rows.append((reader.line_num, {
+            name: (row.get(name) or "").strip() for name in CSV_COLUMNS
+        }))
+    return rows
+
+
+def validate_driver_rows(rows):
+    """
+    Check every row against the database and each other.
+
+    Groups must already exist (by name) and courses are matched by slug or
+    title. Returns (valid, errors): valid is a list of (line, row) with
+    "group_ids" and "course_ids" resolved, errors a list of (line, message).
+    """
+    User = get_user_model()
+
+    usernames = {row["username"] for _, row in rows if row["username"]}
+    taken = set(
+        User.objects.filter(username__in=usernames).values_list("username", flat=True)
+    )
+    groups = {
+        name: pk for pk, name in Group.objects.values_list("pk", "name")
+    }
+    courses = {}
+    for pk, slug, title in Course.objects.values_list("pk", "slug", "title"):
+        courses[slug.lower()] = pk
+        courses.setdefault(title.lower(), pk)
+
+    valid, errors = [], []
+    seen = set()
+
+    for line, row in rows:
+        problems = []
+        username = row["username"]
+
+        if not username:
+            problems.append("Username is required.")
+        elif username in taken:
+            problems.append(f"User '{username}' already exists.")
+        elif username in seen:
+            problems.append(f"User '{username}' appears more than once in the file.")
+        else:
+            try:
+                User.username_validator(username)
+            except ValidationError as exc:
+                problems.extend(exc.messages)
+        seen.add(username)
+
+        if row["email"]:
+            try:
+                validate_email(row["email"])
+            except ValidationError:
+                problems.append(f"'{row['email']}' is not a valid email address.")
+
+        if not row["password"]:
+            problems.append("Password is required.")
+        else:
+            try:
+                validate_password(
+                    row["password"],
+                    user=User(username=username, email=row["email"]),
+                )
+            except ValidationError as exc:
+                problems.extend(exc.messages)
+
+        group_ids = []
+        for name in _split(row["group"]):
+            if name in groups:
+                group_ids.append(groups[name])
+            else:
+                problems.append(f"Unknown group '{name}'.")
+
+        course_ids = []
+        for name in _split(row["courses"]):
+            if name.lower() in courses:
+                course_ids.append(courses[name.lower()])
+            else:
+                problems.append(f"Unknown course '{name}'.")
+
+        if problems:
+            errors.extend((line, problem) for problem in problems)
+        else:
+            valid.append((line, {
+                **row,
+                "group_ids": list(dict.fromkeys(group_ids)),
+                "course_ids": list(dict.fromkeys(course_ids)),
+            }))
+
+    return valid, errors
+
+
+def _init_hash_worker():
+    # Spawned (rather than forked) workers start without Django configured
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None, hasher="default"):
+    """
+    make_password() for each password, spread across a process pool unless
+    workers is 1. Only the import_drivers command should use the pool.
+    """
+    passwords = list(passwords)
+    if len(passwords) < PARALLEL_HASH_THRESHOLD or workers == 1:
+        return [make_password(password, hasher=hasher) for password in passwords]
+    if hasher != "default":
+        raise ValueError("The process pool only hashes with the default hasher.")
+
+    # Don't let forked workers inherit open database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_hash_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=16))
+
+
+def import_drivers(valid_rows, workers=None, hasher="default"):
+    """
+    Create the users from validate_driver_rows() output, with their group
+    memberships and course assignments, in one transaction.
+
+    workers and hasher are passed to hash_passwords(). Returns the number
+    of users created.
+    """
+    if not valid_rows:
+        return 0
+
+    User = get_user_model()
+    rows = [row for _, row in valid_rows]
+    hashes = hash_passwords((row["password"] for row in rows), workers=workers, hasher=hasher)
+
+    with transaction.atomic():
+        User.objects.bulk_create([
+            User(username=row["username"], email=row["email"], password=password_hash)
+            for row, password_hash in zip(rows, hashes)
+        ])
+        # Not every backend returns primary keys from bulk_create
+        user_ids = dict(
+            User.objects
+            .filter(username__in=[row["username"] for row in rows])
+            .values_list("username", "pk")
+        )
+
+        Membership = User.groups.through
+        Membership.objects.bulk_create([
+            Membership(user_id=user_ids[row["username"]], group_id=group_id)
+            for row in rows
+            for group_id in row["group_ids"]
+        ])
+        CourseAssignment.objects.bulk_create([
+            CourseAssignment(user_id=user_ids[row["username"]], course_id=course_id)
+            for row in rows
+            for course_id in row["course_ids"]
+        ])
+        # bulk_create sends no signals, so the effective assignments
+        # (direct and through the groups just joined) are built here
+        refresh_effective_assignments(user_ids.values())
+
+    return len(rows)
@@ -0,0 +1,441 @@
+# academy/progress.py
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CourseProgress, Lesson, LessonProgress, Module, ModuleProgress
+
+ROLLUP_FIELDS = (
+    "modules_passed",
+    "modules_total",
+    "lessons_completed",
+    "lessons_total",
+    "percent",
+    "last_activity_at",
+)
+
+
+def course_progress_map(user, course_ids):
+    """
+    Return passed/total module counts for each of the given courses.
+
+    Runs a single aggregate query however many courses and modules there are:
+    every module is grouped by course and counted, and a module counts as
+    passed when the user has a ModuleProgress row whose score reaches the
+    module's min_score_to_pass.
+
+    Result:
+        {course_id: {"completed_modules": int, "total_modules": int}}
+    Courses without modules are included with zero counts.
+    """
+    course_ids = list(course_ids)
+    progress = {
+        course_id: {"completed_modules": 0, "total_modules": 0}
+        for course_id in course_ids
+    }
+    if not course_ids:
+        return progress
+
+    passed = Exists(
+        ModuleProgress.objects.filter(
+            user=user,
+            module=OuterRef("pk"),
+            score__gte=OuterRef("min_score_to_pass"),
+        )
+    )
+
+    rows = (
+        Module.objects
+        .filter(course_id__in=course_ids)
+        .order_by()
+        .values("course_id")
+        .annotate(
+            total_modules=Count("id"),
+            completed_modules=Count("id", filter=passed),
+        )
+    )
+
+    for row in rows:
+        progress[row["course_id"]] = {
+            "completed_modules": row["completed_modules"],
+            "total_modules": row["total_modules"],
+        }
+    return progress
+
+
+def build_course_rows(user, courses):
+    """
+    Pair each course with the user's progress, in the shape the dashboard uses.
+
+    Reads the CourseProgress rollup (one row per course); courses the user
+    hasn't started yet have no rollup and fall back to the aggregate query.
+    """
+    courses = list(courses)
+    course_ids = [course.id for course in courses]
+
+    progress = {
+        rollup.course_id: {
+            "completed_modules": rollup.modules_passed,
+            "total_modules": rollup.modules_total,
+        }
+        for rollup in CourseProgress.objects.filter(user=user, course_id__in=course_ids)
+    }
+    missing = [course_id for course_id in course_ids if course_id not in progress]
+    if missing:
+        progress.update(course_progress_map(user, missing))
+
+    course_rows = []
+    for course in courses:
+        counts = progress[course.id]
+        total_modules = counts["total_modules"] or 1
+        completed_modules = counts["completed_modules"]
+
+        course_rows.append({
+            "course": course,
+            "progress_percent": int((completed_modules / total_modules) * 100),
+            "completed_modules": completed_modules,
+            "total_modules": total_modules,
+        })
+    return course_rows
+
+
+# =============================
+# MODULE PROGRESS FROM LESSONS
+# =============================
+
+def _lesson_based_progress(total, completed_count):
+    """
+    Score and status for a module from its lesson completion:
+      - score = percentage of lessons completed (0–100)
+      - status:
+          0%      -> not_started
+          1–99%   -> in_progress
+          100%    -> completed
+    A module with no lessons is treated as completed.
+    """
+    if total == 0:
+        return 100, "completed"
+
+    percent = int((completed_count / total) * 100)
+    if percent == 0:
+        return percent, "not_started"
+    if percent < 100:
+        return percent, "in_progress"
+    return percent, "completed"
+
+
+def _apply_lesson_based_progress(user_id, module, score, status, now):
+    """
+    Write score/status to ModuleProgress only if they differ from what's stored.
+
+    Uses a single conditional UPDATE, so an unchanged row costs no write.
+    Returns True if a row was created or updated.
+    """
+    completed_at = Coalesce(F("completed_at"), now) if status == "completed" else None
+
+    updated = (
+        ModuleProgress.objects
+        .filter(user_id=user_id, module=module)
+        .exclude(score=score, status=status)
+        .update(
+            score=score,
+            status=status,
+            completed_at=completed_at,
+            last_attempt_at=now,
+        )
+    )
+    if updated:
+        return True
+
+    _, created = ModuleProgress.objects.get_or_create(
+        user_id=user_id,
+        module=module,
+        defaults={
+            "score": score,
+            "status": status,
+            "completed_at": now if status == "completed" else None,
+            "last_attempt_at": now,
+        },
+    )
+    return created
+
+
+def sync_module_progress_from_lessons(user, module):
+    """
+    Recalculate ModuleProgress for a user/module based on lesson completion.
+
+    Only writes ModuleProgress when the score or status actually changes.
+    The user's CourseProgress rollup is always refreshed in the same
+    transaction: lessons_completed moves with every completed lesson, even
+    when the module's score doesn't (e.g. the quiz was already passed).
+    Returns True if ModuleProgress was written.
+    """
+    total = module.lessons.count()
+    completed_count = LessonProgress.objects.filter(
+        user=user,
+        lesson__module=module,
+        completed=True,
+    ).count()
+    score, status = _lesson_based_progress(total, completed_count)
+
+    with transaction.atomic():
+        changed = _apply_lesson_based_progress(user.pk, module, score, status, timezone.now())
+        refresh_course_progress(user, module.course_id)
+    return changed
+
+
+def resync_module_progress(module):
+    """
+    Recalculate every learner's ModuleProgress after a module's lessons change.
+
+    Loads everyone's completed-lesson counts with one grouped query and only
+    writes the rows whose score or status moved. Course rollups are left to
+    rebuild_course_progress, which the lesson signals run afterwards.
+    """
+    total = module.lessons.count()
+    completed_counts = dict(
+        LessonProgress.objects
+        .filter(lesson__module=module, completed=True)
+        .order_by()
+        .values_list("user_id")
+        .annotate(Count("id"))
+    )
+    user_ids = set(
+        ModuleProgress.objects.filter(module=module).values_list("user_id", flat=True)
+    )
+    user_ids.update(completed_counts)
+
+    now = timezone.now()
+    changed = 0
+    with transaction.atomic():
+        for user_id in user_ids:
+            score, status = _lesson_based_progress(total, completed_counts.get(user_id, 0))
+            if _apply_lesson_based_progress(user_id, module, score, status, now):
+                changed += 1
+    return changed
+
+
+# =============================
+# COURSE PROGRESS ROLLUPS
+# =============================
+
+def _compute_rollups(course_ids=None, user_ids=None):
+    """
+    Work out CourseProgress values from the raw progress tables.
+
+    Returns {(user_id, course_id): {field: value}} for every user with any
+    ModuleProgress or completed LessonProgress in the selected courses.
+    Uses four grouped queries regardless of the number of rows.
+    """
+    modules = Module.objects.order_by()
+    lessons = Lesson.objects.order_by()
+    module_progress = ModuleProgress.objects.order_by()
+    lesson_progress = LessonProgress.objects.filter(completed=True).order_by()
+
+    if course_ids is not None:
+        modules = modules.filter(course_id__in=course_ids)
+        lessons = lessons.filter(module__course_id__in=course_ids)
+        module_progress = module_progress.filter(module__course_id__in=course_ids)
+        lesson_progress = lesson_progress.filter(lesson__module__course_id__in=course_ids)
+
+    if user_ids is not None:
+        module_progress = module_progress.filter(user_id__in=user_ids)
+        lesson_progress = lesson_progress.filter(user_id__in=user_ids)
+
+    module_totals = dict(modules.values_list("course_id").annotate(Count("id")))
+    lesson_totals = dict(lessons.values_list("module__course_id").annotate(Count("id")))
+
+    rollups = {}
+
+    def rollup_for(user_id, course_id):
+        key = (user_id, course_id)
+        if key not in rollups:
+            rollups[key] = {
+                "modules_passed": 0,
+                "modules_total": module_totals.get(course_id, 0),
+                "lessons_completed": 0,
+                "lessons_total": lesson_totals.get(course_id, 0),
+                "percent": 0,
+                "last_activity_at": None,
+            }
+        return rollups[key]
+
+    def touch(rollup, when):
+        if when and (rollup["last_activity_at"] is None or when > rollup["last_activity_at"]):
+            rollup["last_activity_at"] = when
+
+    module_rows = module_progress.values_list("user_id", "module__course_id").annotate(
+        passed=Count("id", filter=Q(score__gte=F("module__min_score_to_pass"))),
+        last_attempt=Max("last_attempt_at"),
+    )
+    for user_id, course_id, passed, last_attempt in module_rows:
+        rollup = rollup_for(user_id, course_id)
+        rollup["modules_passed"] = passed
+        touch(rollup, last_attempt)
+
+    lesson_rows = lesson_progress.values_list("user_id", "lesson__module__course_id").annotate(
+        completed=Count("id"),
+        last_completed=Max("completed_at"),
+    )
+    for user_id, course_id, completed, last_completed in lesson_rows:
+        rollup = rollup_for(user_id, course_id)
+        rollup["lessons_completed"] = completed
+        touch(rollup, last_completed)
+
+    for rollup in rollups.values():
+        total = rollup["modules_total"] or 1
+        rollup["percent"] = int((rollup["modules_passed"] / total) * 100)
+
+    return rollups
+
+
+def refresh_course_progress(user, course_id):
+    """
+    Recalculate one user's CourseProgress row for a course.
+
+    Call this inside the same transaction as the progress write that
+    triggered it, so the rollup never disagrees with the raw rows.
+    """
+    values = _compute_rollups(course_ids=[course_id], user_ids=[user.pk]).get(
+        (user.pk, course_id)
+    )
+    if values is None:
+        CourseProgress.objects.filter(user=user, course_id=course_id).delete()
+        return None
+
+    rollup, _ = CourseProgress.objects.update_or_create(
+        user=user,
+        course_id=course_id,
+        defaults=values,
+    )
+    return rollup
+
+
+def rebuild_course_progress(course_ids=None):
+    """
+    Rebuild CourseProgress from scratch (optionally only for some courses).
+
+    Returns a dict with the number of rows created, updated and deleted.
+    """
+    expected = _compute_rollups(course_ids=course_ids)
+
+    existing_qs = CourseProgress.objects.all()
+    if course_ids is not None:
+        existing_qs = existing_qs.filter(course_id__in=course_ids)
+
+    to_update = []
+    to_delete = []
+    for rollup in existing_qs:
+        values = expected.pop((rollup.user_id, rollup.course_id), None)
+        if values is None:
+            to_delete.append(rollup.pk)
+            continue
+        if any(getattr(rollup, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(rollup, field, value)
+            to_update.append(rollup)
+
+    to_create = [
+        CourseProgress(user_id=user_id, course_id=course_id, **values)
+        for (user_id, course_id), values in expected.items()
+    ]
+
+    with transaction.atomic():
+        CourseProgress.objects.filter(pk__in=to_delete).delete()
+        CourseProgress.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=500)
+        CourseProgress.objects.bulk_create(to_create, batch_size=500)
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+    }
+
+
+def verify_course_progress(course_ids=None):
+    """
+    Compare stored CourseProgress rows with freshly computed values.
+
+    Returns a list of (user_id, course_id) pairs that are missing, stale
+    or shouldn't exist. An empty list means the rollup table is consistent.
+    """
+    expected = _compute_rollups(course_ids=course_ids)
+
+    existing_qs = CourseProgress.objects.all()
+    if course_ids is not None:
+        existing_qs = existing_qs.filter(course_id__in=course_ids)
+
+    mismatches = []
+    for rollup in existing_qs:
+        key = (rollup.user_id, rollup.course_id)
+        values = expected.pop(key, None)
+        if values is None or any(
+            getattr(rollup, field) != value for field, value in values.items()
+        ):
+            mismatches.append(key)
+
+    mismatches.extend(expected.keys())
+    return mismatches
+
+
+class CourseUnlockMap:
+    """
+    Locked/unlocked state of every module in a course for one user.
+
+    Loads the course's modules and the user's ModuleProgress for them with
+    one query each, then walks the modules in order once. A module is
+    unlocked when every mandatory module with a lower order has been passed
+    (modules sharing an order value don't block each other).
+    """
+
+    def __init__(self, user, course):
+        self.course = course
+        self.modules = list(course.modules.all())
+
+        modules_by_id = {module.id: module for module in self.modules}
+        self._progress = {}
+        for mp in ModuleProgress.objects.filter(user=user, module__in=self.modules):
+            # Reuse the loaded module so mp.passed doesn't query for it again
+            mp.module = modules_by_id[mp.module_id]
+            self._progress[mp.module_id] = mp
+
+        self._unlocked = {}
+        previous_passed = True
+        group_order = None
+        group_passed = True
+        for module in sorted(self.modules, key=lambda m: m.order):
+            module.course = course
+            if module.order != group_order:
+                previous_passed = previous_passed and group_passed
+                group_order = module.order
+                group_passed = True
+
+            self._unlocked[module.id] = previous_passed
+
+            if module.is_mandatory and not self.is_passed(module):
+                group_passed = False
+
+    def progress_for(self, module):
+        return self._progress.get(module.id)
+
+    def is_passed(self, module):
+        progress = self._progress.get(module.id)
+        return bool(progress and progress.passed)
+
+    def can_access(self, module):
+        return self._unlocked.get(module.id, False)
+
+
+def get_unlock_map(request, course):
+    """
+    Return the CourseUnlockMap for request.user, built at most once per request.
+    """
+    cache = getattr(request, "_academy_unlock_maps", None)
+    if cache is None:
+        cache = request._academy_unlock_maps = {}
+
+    if course.id not in cache:
+        cache[course.id] = CourseUnlockMap(request.user, course)
+    return cache[course.id]
@@ -0,0 +1,63 @@
+# academy/question_export.py
+#
+# Question bank export in the custom JSON format that question_import
+# reads. Questions are walked in chunks with their choices prefetched per
+# chunk, and the JSON is written out an entry at a time, so memory stays
+# bounded however large the bank is.
+
+import json
+
+from django.db.models import Prefetch
+
+from .models import Choice, Question
+
+CHUNK_SIZE = 500
+
+
+def questions_for(course=None, module=None):
+    """
+    Questions of one module, one course, or (with neither) every course.
+    """
+    questions = Question.objects.all()
+    if module is not None:
+        questions = questions.filter(module=module)
+    elif course is not None:
+        questions = questions.filter(module__course=course)
+    return questions
+
+
+def question_bank_entries(questions, chunk_size=CHUNK_SIZE):
+    """
+    Yield each question as a custom-format import entry, in course, module
+    and question order. Choices keep their original (id) order.
+    """
+    questions = (
+        questions
+        .select_related("module__course")
+        .prefetch_related(Prefetch("choices", queryset=Choice.objects.order_by("id")))
+        .order_by("module__course__order", "module__course__id", "module__order", "module__id", "order", "id")
+    )
+    for question in questions.iterator(chunk_size=chunk_size):
+        yield {
+            "course_slug": question.module.course.slug,
+            "module_slug": question.module.slug,
+            "order": question.order,
+            "text": question.text,
+            "explanation": question.explanation,
+            "choices": [
+                {"text": choice.text, "is_correct": choice.is_correct}
+                for choice in question.choices.all()
+            ],
+        }
+
+
+def stream_question_bank(entries):
+    """
+    Yield a JSON array of entries as UTF-8 bytes, one entry per chunk.
+    """
+    yield b"["
+    separator = b"\n"
+    for entry in entries:
+        yield separator + json.dumps(entry, ensure_ascii=False, indent=2).encode("utf-8")
+        separator = b",\n"
+    yield b"\n]\n"
@@ -0,0 +1,350 @@
+# academy/question_import.py
+#
+# Question bank import. The upload is parsed one entry at a time, module
+# references are resolved with a single query, and the questions and their
+# choices are written with bulk_create inside one transaction, so an import
+# either lands completely or not at all.
+#
+# Two file formats are accepted, both JSON arrays:
+#
+#   Django fixture:  [{"model": "academy.question", "pk": 1, "fields": {...}},
+#                     {"model": "academy.choice", "fields": {"question": 1, ...}}]
+#
+#   Custom:          [{"text": "...", "explanation": "...", "order": 1,
+#                      "course_slug": "...", "module_slug": "...",
+#                      "choices": [{"text": "...", "is_correct": true}, ...]}]
+
+import codecs
+import json
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .answer_keys import bump_answer_key_version
+from .models import Choice, Module, Question
+from .search import index_questions
+
+READ_SIZE = 64 * 1024
+BULK_BATCH_SIZE = 500
+
+CHOICE_TEXT_MAX_LENGTH = Choice._meta.get_field("text").max_length
+
+
+class QuestionImportError(ValueError):
+    """The file can't be read as a JSON array of entries."""
+
+
+def iter_json_array(fileobj, read_size=READ_SIZE):
+    """
+    Yield the elements of a top-level JSON array from a binary or text file
+    without loading the whole document, using JSONDecoder.raw_decode on a
+    rolling buffer.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, pos, eof = "", 0, False
+    consumed = 0  # characters dropped from the front of the buffer so far
+
+    def fill():
+        nonlocal buffer, pos, eof, consumed
+        chunk = fileobj.read(read_size)
+        if isinstance(chunk, bytes):
+            text = utf8.decode(chunk, final=not chunk)
+        else:
+            text = chunk
+        eof = not chunk
+        # Drop what's already been consumed before growing the buffer
+        consumed += pos
+        buffer = buffer[pos:] + text
+        pos = 0
+        return not eof
+
+    def truncated(value, end):
+        # A number cut at a chunk boundary ("2." of "2.5") decodes early
+        if end == len(buffer):
+            return True
+        return (
+            isinstance(value, (int, float))
+            and not isinstance(value, bool)
+            and buffer[end] in "0123456789+-.eE"
+        )
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if buffer[pos:pos + 1] != "[":
+        raise QuestionImportError("The file must contain a JSON list of questions.")
+    pos += 1
+
+    first = True
+    while True:
+        skip_whitespace()
+        if buffer[pos:pos + 1] == "]":
+            return
+        if pos == len(buffer):
+            raise QuestionImportError("Invalid JSON: the file ends before the list is closed.")
+        if not first:
+            if buffer[pos:pos + 1] != ",":
+                raise QuestionImportError(
+                    f"Invalid JSON near character {consumed + pos}: expected ',' or ']'."
+                )
+            pos += 1
+            skip_whitespace()
+        first = False
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                if not eof and fill():
+                    continue
+                raise QuestionImportError(
+                    f"Invalid JSON near character {consumed + exc.pos}: {exc.msg}."
+                ) from exc
+            # A value that runs to the end of the buffer may continue in
+            # the next chunk
+            if not eof and truncated(value, end) and fill():
+                continue
+            break
+        pos = end
+        yield value
+
+
+@dataclass
+class ImportPlan:
+    """
+    What an import would create, before anything is written.
+
+    questions: dicts of module_id/text/order/explanation/choices, in file order.
+    problems: (entry number, message) pairs for skipped or adjusted entries.
+    """
+    default_module: Module
+    questions: list = field(default_factory=list)
+    problems: list = field(default_factory=list)
+
+    @property
+    def choice_count(self):
+        return sum(len(question["choices"]) for question in self.questions)
+
+    @property
+    def module_ids(self):
+        return sorted({question["module_id"] for question in self.questions})
+
+
+def _clean_choices(number, raw_choices, problems):
+    if not isinstance(raw_choices, list):
+        problems.append((number, '"choices" is not a list; skipped.'))
+        return None
+    if not raw_choices:
+        # Kept, like a fixture question with no choice rows: the export
+        # writes such questions out and they must come back in
+        problems.append((number, "no choices."))
+        return []
+
+    choices = []
+    for raw in raw_choices:
+        if not isinstance(raw, dict):
+            problems.append((number, "a choice is not a JSON object; skipped."))
+            return None
+        text = str(raw.get("text", ""))
+        if len(text) > CHOICE_TEXT_MAX_LENGTH:
+            problems.append(
+                (number, f"a choice is longer than {CHOICE_TEXT_MAX_LENGTH} characters; skipped.")
+            )
+            return None
+        if not text.strip():
+            problems.append((number, "a choice has no text."))
+        choices.append({"text": text, "is_correct": bool(raw.get("is_correct", False))})
+
+    if not any(choice["is_correct"] for choice in choices):
+        problems.append((number, "no choice is marked correct."))
+    return choices
+
+
+def _order(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def plan_import(entries, default_module):
+    """
+    Build an ImportPlan from the entries of either file format.
+
+    Entries that can't be imported are skipped and noted in plan.problems,
+    as are module references that fall back to default_module. Module
+    references are collected while reading and resolved in one query at
+    the end.
+    """
+    plan = ImportPlan(default_module=default_module)
+    pending = []           # (number, question dict, module reference)
+    fixture_questions = {}  # fixture pk -> question dict
+    fixture_format = None
+
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            plan.problems.append((number, "not a JSON object; skipped."))
+            continue
+
+        if fixture_format is None:
+            fixture_format = "model" in entry and "fields" in entry
+
+        if fixture_format:
+            model = entry.get("model")
+            fields = entry.get("fields") or {}
+
+            if model == "academy.question":
+                question = {
+                    "text": str(fields.get("text", "")),
+                    "order": _order(fields.get("order", 1)),
+                    "explanation": str(fields.get("explanation") or ""),
+                    "choices": [],
+                }
+                fixture_questions[entry.get("pk")] = question
+                pending.append((number, question, ("id", fields.get("module"))))
+
+            elif model == "academy.choice":
+                question = fixture_questions.get(fields.get("question"))
+                if question is None:
+                    plan.problems.append(
+                        (number, f"choice for unknown question {fields.get('question')!r}; skipped.")
+                    )
+                    continue
+                text = str(fields.get("text", ""))
+                if len(text) > CHOICE_TEXT_MAX_LENGTH:
+                    plan.problems.append(
+                        (number, f"choice is longer than {CHOICE_TEXT_MAX_LENGTH} characters; skipped.")
+                    )
+                    continue
+                question["choices"].append(
+                    {"text": text, "is_correct": bool(fields.get("is_correct", False))}
+                )
+
+            else:
+                plan.problems.append((number, f"unsupported model {model!r}; skipped."))
+
+        else:
+            if "text" not in entry or "choices" not in entry:
+                plan.problems.append((number, 'needs both "text" and "choices"; skipped.'))
+                continue
+            choices = _clean_choices(number, entry["choices"], plan.problems)
+            if choices is None:
+                continue
+            question = {
+                "text": str(entry["text"]),
+                "order": _order(entry.get("order", 1)),
+                "explanation": str(entry.get("explanation") or ""),
+                "choices": choices,
+            }
+            reference = None
+            if entry.get("module_slug"):
+                reference = ("slug", (entry.get("course_slug") or None, entry["module_slug"]))
+            pending.append((number, question, reference))
+
+    modules_by_id, modules_by_slug = _resolve_modules(pending)
+
+    for number, question, reference in pending:
+        module = default_module
+        if reference and reference[1]:
+            kind, value = reference
+            if kind == "id":
+                module = modules_by_id.get(value)
+            else:
+                course_slug, module_slug = value
+                candidates = modules_by_slug.get(module_slug, [])
+                if course_slug:
+                    candidates = [m for m in candidates if m.course.slug == course_slug]
+                # A bare slug shared by several courses prefers the selected course
+                same_course = [m for m in candidates if m.course_id == default_module.course_id]
+                module = (same_course or candidates or [None])[0]
+
+            if module is None:
+                plan.problems.append(
+                    (number, f"module {_describe(kind, value)} not found; imported into \"{default_module}\".")
+                )
+                module = default_module
+
+        question["module_id"] = module.pk
+        plan.questions.append(question)
+
+    plan.problems.sort(key=lambda problem: problem[0])
+    return plan
+
+
+def _describe(kind, value):
+    if kind == "id":
+        return f"#{value}"
+    course_slug, module_slug = value
+    return f"\"{course_slug}/{module_slug}\"" if course_slug else f"\"{module_slug}\""
+
+
+def _resolve_modules(pending):
+    ids = {
+        ref[1] for _, _, ref in pending
+        if ref and ref[0] == "id" and isinstance(ref[1], int) and not isinstance(ref[1], bool)
+    }
+    slugs = {ref[1][1] for _, _, ref in pending if ref and ref[0] == "slug"}
+    if not ids and not slugs:
+        return {}, {}
+
+    modules = (
+        Module.objects
+        .select_related("course")
+        .filter(Q(pk__in=ids) | Q(slug__in=slugs))
+        .order_by("order", "pk")
+    )
+
+    by_id, by_slug = {}, {}
+    for module in modules:
+        by_id[module.pk] = module
+        by_slug.setdefault(module.slug, []).append(module)
+    return by_id, by_slug
+
+
+def run_import(plan, delete_existing=False):
+    """
+    Write an ImportPlan in one transaction: optionally clear the selected
+    module, bulk_create the questions, then their choices.
+
+    bulk_create skips the save signals, so the affected answer keys are
+    invalidated and the new questions indexed for search here. Returns (questions created, choices created).
+    """
+    with transaction.atomic():
+        if delete_existing:
+            Question.objects.filter(module=plan.default_module).delete()
+
+        questions = [
+            Question(
+                module_id=question["module_id"],
+                text=question["text"],
+                order=question["order"],
+                explanation=question["explanation"],
+            )
+            for question in plan.questions
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Question.objects.bulk_create(questions, batch_size=BULK_BATCH_SIZE)
+        else:
+            # Without RETURNING the new ids are unknown; insert one by one
+            for question in questions:
+                question.save()
+
+        choices = [
+            Choice(question=question, text=choice["text"], is_correct=choice["is_correct"])
+            for question, planned in zip(questions, plan.questions)
+            for choice in planned["choices"]
+        ]
+        Choice.objects.bulk_create(choices, batch_size=BULK_BATCH_SIZE)
+
+        bump_answer_key_version(*plan.module_ids)
+        index_questions(question.pk for question in questions)
+
+    return len(questions), len(choices)
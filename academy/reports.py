@@ -0,0 +1,202 @@
+# academy/reports.py
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from iota.pagination import keyset_page
+
+from .models import Certificate, Course, FinalTestSubmission, Module, ModuleProgress
+
+DRIVER_PROGRESS_PER_PAGE = 50
+FINAL_TESTS_PER_PAGE = 25
+
+# Sort keys accepted from the query string -> ORDER BY expressions
+DRIVER_PROGRESS_SORTS = {
+    "driver": ["u.username", "c.{order}", "m.{order}"],
+    "module": ["c.{order}", "m.{order}", "u.username"],
+    "score": ["COALESCE(mp.score, -1)", "u.username"],
+    "status": ["COALESCE(mp.status, 'not_started')", "u.username"],
+    "completed": ["mp.completed_at", "u.username"],
+}
+DRIVER_PROGRESS_STATUSES = [value for value, _ in ModuleProgress.STATUS_CHOICES]
+
+
+def _aware(value):
+    # Raw cursors skip the ORM's conversion to aware datetimes on some backends
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _driver_progress_sql(filters):
+    """
+    FROM/WHERE clause of the driver × module matrix: every non-superuser
+    crossed with every module, LEFT JOINed to their ModuleProgress so
+    untouched cells come back as "not_started".
+    """
+    qn = connection.ops.quote_name
+    sql = f"""
+        FROM {qn(get_user_model()._meta.db_table)} u
+        CROSS JOIN {qn(Module._meta.db_table)} m
+        INNER JOIN {qn(Course._meta.db_table)} c ON c.id = m.course_id
+        LEFT JOIN {qn(ModuleProgress._meta.db_table)} mp
+            ON mp.user_id = u.id AND mp.module_id = m.id
+        WHERE u.is_superuser = %s
+    """
+    params = [False]
+
+    if filters.get("driver"):
+        # Escape %, _ and \ the way the ORM does for icontains
+        like = f"%{connection.ops.prep_for_like_query(filters['driver'].upper())}%"
+        sql += r"""
+            AND (UPPER(u.username) LIKE %s ESCAPE '\'
+                 OR UPPER(u.first_name) LIKE %s ESCAPE '\'
+                 OR UPPER(u.last_name) LIKE %s ESCAPE '\'
+                 OR UPPER(u.email) LIKE %s ESCAPE '\')
+        """
+        params += [like, like, like, like]
+
+    if filters.get("course"):
+        sql += " AND m.course_id = %s"
+        params.append(filters["course"])
+
+    if filters.get("module"):
+        sql += " AND m.id = %s"
+        params.append(filters["module"])
+
+    if filters.get("status") in DRIVER_PROGRESS_STATUSES:
+        sql += " AND COALESCE(mp.status, 'not_started') = %s"
+        params.append(filters["status"])
+
+    return sql, params
+
+
+def _order_by(sort):
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in DRIVER_PROGRESS_SORTS:
+        key, descending = "driver", False
+
+    qn = connection.ops.quote_name
+    columns = [
+        column.format(order=qn("order"))
+        for column in DRIVER_PROGRESS_SORTS[key]
+    ]
+    direction = " DESC" if descending else ""
+    # Only the primary column flips; the rest keep pages stable
+    return ", ".join([columns[0] + direction] + columns[1:] + ["u.id", "m.id"])
+
+
+def driver_progress_rows(filters, sort="driver", offset=0, limit=None):
+    """
+    Cells of the driver progress matrix as dicts, in one query.
+
+    filters may contain "driver" (name/email search), "course" and "module"
+    ids and "status". limit=None returns every matching row.
+    """
+    from_sql, params = _driver_progress_sql(filters)
+    sql = f"""
+        SELECT u.id, u.username, u.first_name, u.last_name,
+               c.title, m.id, m.title,
+               mp.status, mp.score, mp.completed_at
+        {from_sql}
+        ORDER BY {_order_by(sort)}
+    """
+    if limit is not None:
+        sql += " " + connection.ops.limit_offset_sql(offset, offset + limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(1000)
+            if not batch:
+                break
+            for (user_id, username, first_name, last_name, course_title,
+                 module_id, module_title, status, score, completed_at) in batch:
+                full_name = f"{first_name} {last_name}".strip()
+                yield {
+                    "user_id": user_id,
+                    "driver": full_name or username,
+                    "course_title": course_title,
+                    "module_id": module_id,
+                    "module_title": module_title,
+                    "status": status or "not_started",
+                    "score": score,
+                    "completed_at": _aware(completed_at),
+                }
+
+
+def driver_progress_count(filters):
+    from_sql, params = _driver_progress_sql(filters)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) {from_sql}", params)
+        return cursor.fetchone()[0]
+
+
+def driver_progress_page(filters, sort="driver", page=1, per_page=DRIVER_PROGRESS_PER_PAGE):
+    """
+    One page of the driver progress matrix plus paging info for the template.
+    """
+    total = driver_progress_count(filters)
+    num_pages = max(1, math.ceil(total / per_page))
+    page = min(max(1, page), num_pages)
+    offset = (page - 1) * per_page
+
+    rows = list(driver_progress_rows(filters, sort=sort, offset=offset, limit=per_page))
+
+    return {
+        "rows": rows,
+        "count": total,
+        "number": page,
+        "num_pages": num_pages,
+        "has_previous": page > 1,
+        "has_next": page < num_pages,
+        "previous_page_number": page - 1,
+        "next_page_number": page + 1,
+        "start_index": offset + 1 if rows else 0,
+        "end_index": offset + len(rows),
+    }
+
+
+def final_test_submissions(filters):
+    """
+    FinalTestSubmission queryset for the manager list and its export.
+    filters: "status" ("reviewed" / "pending"), "module" id.
+    """
+    submissions = FinalTestSubmission.objects.all()
+    if filters.get("status") == "reviewed":
+        submissions = submissions.filter(reviewed=True)
+    elif filters.get("status") == "pending":
+        submissions = submissions.filter(reviewed=False)
+    if filters.get("module"):
+        submissions = submissions.filter(module_id=filters["module"])
+    return submissions
+
+
+def final_tests_page(filters, after=None, before=None, per_page=FINAL_TESTS_PER_PAGE):
+    """
+    One keyset page of final test submissions, newest first, with the
+    user/module joined in and the matching certificate id annotated.
+    """
+    certificate_id = (
+        Certificate.objects
+        .filter(user_id=OuterRef("user_id"), module_id=OuterRef("module_id"))
+        .order_by("-issued_at")
+        .values("id")[:1]
+    )
+    submissions = (
+        final_test_submissions(filters)
+        .select_related("user", "module__course")
+        .annotate(certificate_id=Subquery(certificate_id))
+    )
+    return keyset_page(submissions, "submitted_at", after=after, before=before, per_page=per_page)
@@ -0,0 +1,194 @@
+# academy/search.py
+#
+# Full-text search over questions (text, explanation, choices) and lessons
+# (title, content). Each searchable object has one SearchDocument row, kept
+# in sync by the signals in academy/signals.py. The index behind it depends
+# on the database (see migration 0006):
+#
+#   SQLite      FTS5 external-content table, maintained by triggers
+#   PostgreSQL  generated, weighted tsvector column with a GIN index
+#   otherwise   no index; icontains over title/body
+#
+# search() hides the difference.
+
+import re
+from functools import lru_cache
+from html import unescape
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+from .models import Choice, Lesson, Question, SearchDocument
+
+FTS_TABLE = "academy_searchdocument_fts"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+# =============================
+# INDEXING
+# =============================
+
+def _question_documents(question_ids):
+    choices = {}
+    for question_id, text in (
+        Choice.objects.filter(question_id__in=question_ids)
+        .order_by("id")
+        .values_list("question_id", "text")
+    ):
+        choices.setdefault(question_id, []).append(text)
+
+    questions = Question.objects.filter(pk__in=question_ids).select_related("module")
+    return [
+        SearchDocument(
+            kind=SearchDocument.KIND_QUESTION,
+            question=question,
+            course_id=question.module.course_id,
+            module_id=question.module_id,
+            title=question.text,
+            body="\n".join([question.explanation, *choices.get(question.pk, [])]).strip(),
+        )
+        for question in questions
+    ]
+
+
+def _lesson_documents(lesson_ids):
+    lessons = Lesson.objects.filter(pk__in=lesson_ids).select_related("module")
+    return [
+        SearchDocument(
+            kind=SearchDocument.KIND_LESSON,
+            lesson=lesson,
+            course_id=lesson.module.course_id,
+            module_id=lesson.module_id,
+            title=lesson.title,
+            body=unescape(strip_tags(lesson.content)),
+        )
+        for lesson in lessons
+    ]
+
+
+def index_questions(question_ids):
+    """
+    (Re)index the given questions with their choices.
+
+    Deleted questions and lessons need no call: their documents go with
+    them through the foreign key cascade.
+    """
+    question_ids = list({pk for pk in question_ids if pk})
+    if question_ids:
+        SearchDocument.objects.filter(question_id__in=question_ids).delete()
+        SearchDocument.objects.bulk_create(_question_documents(question_ids), batch_size=500)
+
+
+def index_lessons(lesson_ids):
+    lesson_ids = list({pk for pk in lesson_ids if pk})
+    if lesson_ids:
+        SearchDocument.objects.filter(lesson_id__in=lesson_ids).delete()
+        SearchDocument.objects.bulk_create(_lesson_documents(lesson_ids), batch_size=500)
+
+
+def rebuild_search_index(batch_size=500):
+    """
+    Rebuild every SearchDocument from scratch. Returns the document count.
+    """
+    SearchDocument.objects.all().delete()
+
+    total = 0
+    for model, build in ((Question, _question_documents), (Lesson, _lesson_documents)):
+        ids = list(model.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(ids), batch_size):
+            documents = build(ids[start:start + batch_size])
+            SearchDocument.objects.bulk_create(documents)
+            total += len(documents)
+
+    if fulltext_backend() == "fts5":
+        with connection.cursor() as cursor:
+            # Re-read the FTS index from its content table, clearing any drift
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return total
+
+
+# =============================
+# SEARCHING
+# =============================
+
+@lru_cache(maxsize=None)
+def _fts5_table_exists(alias):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def fulltext_backend():
+    """
+    "fts5", "postgresql" or "basic" for the default database.
+    """
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor == "sqlite" and _fts5_table_exists(connection.alias):
+        return "fts5"
+    return "basic"
+
+
+def _fts5_query(text):
+    # Every word must match, as a prefix; quoting keeps FTS5 syntax out
+    return " ".join(f'"{word}"*' for word in _WORD.findall(text))
+
+
+def search(text, course=None, module=None, kind=None):
+    """
+    SearchDocuments matching every word of `text`, best matches first.
+
+    course/module narrow the results; kind is SearchDocument.KIND_QUESTION
+    or KIND_LESSON. Returns a queryset, so callers can paginate it.
+    """
+    documents = SearchDocument.objects.select_related("course", "module")
+    if module is not None:
+        documents = documents.filter(module=module)
+    elif course is not None:
+        documents = documents.filter(course=course)
+    if kind:
+        documents = documents.filter(kind=kind)
+
+    backend = fulltext_backend()
+    table = SearchDocument._meta.db_table
+
+    if backend == "fts5":
+        match = _fts5_query(text)
+        if not match:
+            return documents.none()
+        # bm25() is lower-is-better; title matches count double
+        rank = RawSQL(
+            f"SELECT bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+        return (
+            documents
+            .filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+            .annotate(rank=rank)
+            .order_by("rank", "pk")
+        )
+
+    if backend == "postgresql":
+        if not _WORD.search(text):
+            return documents.none()
+        matches = RawSQL(
+            f"{table}.search_vector @@ websearch_to_tsquery('english', %s)",
+            [text],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"ts_rank({table}.search_vector, websearch_to_tsquery('english', %s))",
+            [text],
+            output_field=FloatField(),
+        )
+        return documents.filter(matches).annotate(rank=rank).order_by("-rank", "pk")
+
+    words = _WORD.findall(text)
+    if not words:
+        return documents.none()
+    for word in words:
+        documents = documents.filter(Q(title__icontains=word) | Q(body__icontains=word))
+    return documents.order_by("kind", "pk")
@@ -0,0 +1,247 @@
+# academy/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .analytics import record_submission
+from .answer_keys import bump_answer_key_version
+from .assignments import group_member_ids, refresh_effective_assignments
+from .models import (
+    Choice,
+    CourseAssignment,
+    FinalTestSubmission,
+    Lesson,
+    Module,
+    Question,
+    QuestionStats,
+    SearchDocument,
+)
+from .progress import rebuild_course_progress, resync_module_progress
+from .search import index_lessons, index_questions
+
+
+# =============================
+# COURSE PROGRESS ROLLUPS
+# =============================
+
+def _rebuild_rollups_on_commit(course_id):
+    # Module totals or pass marks changed for everyone on the course
+    transaction.on_commit(lambda: rebuild_course_progress(course_ids=[course_id]))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, **kwargs):
+    _rebuild_rollups_on_commit(instance.course_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    if kwargs.get("created") is False:
+        # Edits to an existing lesson don't change any counts
+        return
+
+    # Look the module up by id: on a cascade it may already be gone,
+    # in which case module_changed covers the rebuild.
+    module = Module.objects.filter(pk=instance.module_id).first()
+    if module is None:
+        return
+
+    def resync():
+        # Lesson membership changed: learners' module scores move first,
+        # then the course rollups are rebuilt from them.
+        resync_module_progress(module)
+        rebuild_course_progress(course_ids=[module.course_id])
+
+    transaction.on_commit(resync)
+
+
+# =============================
+# QUIZ ANSWER KEYS
+# =============================
+# The handlers run once per row, so they avoid queries of their own: the
+# module a question was loaded with is kept from post_init, and rows removed
+# by one delete() (cascades included) bump each module only once.
+
+@receiver(post_init, sender=Question)
+def question_remember_module(sender, instance, **kwargs):
+    # A question moved to another module invalidates both answer keys.
+    # Read __dict__ so a deferred module_id isn't fetched.
+    instance._previous_module_id = instance.__dict__.get("module_id")
+
+
+@receiver(post_save, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    previous_module_id = instance._previous_module_id
+    instance._moved_from_module_id = (
+        previous_module_id if previous_module_id != instance.module_id else None
+    )
+    # The next save compares against what is stored now
+    instance._previous_module_id = instance.module_id
+    bump_answer_key_version(instance.module_id, previous_module_id)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, origin=None, **kwargs):
+    _bump_once_per_delete(origin, instance.module_id)
+
+
+@receiver(post_save, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    if Choice.question.is_cached(instance):
+        bump_answer_key_version(instance.question.module_id)
+    else:
+        bump_answer_key_version(_question_module_ids([instance.question_id]).get(instance.question_id))
+
+
+@receiver(post_delete, sender=Choice)
+def choice_deleted(sender, instance, origin=None, **kwargs):
+    # Choices removed along with their question (or module/course) are
+    # covered by question_deleted
+    if not _deleted_directly(origin, Choice):
+        return
+    seen = _delete_state(origin, "questions")
+    if instance.question_id not in seen:
+        seen.add(instance.question_id)
+        module_id = _question_module_ids([instance.question_id]).get(instance.question_id)
+        _bump_once_per_delete(origin, module_id)
+
+
+def _question_module_ids(question_ids):
+    return dict(Question.objects.filter(pk__in=question_ids).values_list("id", "module_id"))
+
+
+def _delete_state(origin, name):
+    # Bookkeeping for one delete() call, kept on the object it started from
+    if origin is None:
+        return set()
+    attribute = f"_answer_key_{name}"
+    if not hasattr(origin, attribute):
+        setattr(origin, attribute, set())
+    return getattr(origin, attribute)
+
+
+def _bump_once_per_delete(origin, module_id):
+    bumped = _delete_state(origin, "modules")
+    if module_id and module_id not in bumped:
+        bumped.add(module_id)
+        bump_answer_key_version(module_id)
+
+
+# =============================
+# SEARCH INDEX
+# =============================
+# Deletes need no handler for the documents themselves: they cascade
+# from their question/lesson.
+
+@receiver(post_save, sender=Question)
+def question_index(sender, instance, **kwargs):
+    index_questions([instance.pk])
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_index(sender, instance, origin=None, **kwargs):
+    # Choices removed along with their question (or module/course) leave
+    # nothing to re-index
+    if kwargs["signal"] is post_delete and not _deleted_directly(origin, Choice):
+        return
+    index_questions([instance.question_id])
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_index(sender, instance, **kwargs):
+    index_lessons([instance.pk])
+
+
+@receiver(post_save, sender=Module)
+def module_index(sender, instance, created, **kwargs):
+    # A module moved to another course takes its documents with it
+    if not created:
+        SearchDocument.objects.filter(module=instance).exclude(
+            course_id=instance.course_id
+        ).update(course_id=instance.course_id)
+
+
+def _deleted_directly(origin, model):
+    origin_model = getattr(origin, "model", None) or type(origin)
+    return origin is None or origin_model is model
+
+
+# =============================
+# EFFECTIVE ASSIGNMENTS
+# =============================
+
+def _assignment_user_ids(user_id, group_id):
+    if user_id:
+        return {user_id}
+    return group_member_ids([group_id])
+
+
+@receiver(pre_save, sender=CourseAssignment)
+def assignment_remember_owner(sender, instance, **kwargs):
+    # An assignment moved to another user/group must be taken off the old one
+    instance._previous_user_ids = set()
+    if instance.pk:
+        previous = (
+            CourseAssignment.objects.filter(pk=instance.pk)
+            .values_list("user_id", "group_id")
+            .first()
+        )
+        if previous:
+            instance._previous_user_ids = _assignment_user_ids(*previous)
+
+
+@receiver(pre_delete, sender=CourseAssignment)
+def assignment_remember_members(sender, instance, **kwargs):
+    # Collect group members now: when the group itself is being deleted,
+    # its memberships are gone by post_delete
+    instance._previous_user_ids = _assignment_user_ids(instance.user_id, instance.group_id)
+
+
+@receiver(post_save, sender=CourseAssignment)
+@receiver(post_delete, sender=CourseAssignment)
+def assignment_changed(sender, instance, **kwargs):
+    user_ids = set(getattr(instance, "_previous_user_ids", ()))
+    if kwargs["signal"] is post_save:
+        user_ids |= _assignment_user_ids(instance.user_id, instance.group_id)
+    refresh_effective_assignments(user_ids)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear(): only this user is affected
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_effective_assignments([instance.pk])
+        return
+
+    # group.user_set.add/remove/clear(): pk_set holds user ids, except on
+    # clear, where the members have to be read before they're removed
+    if action == "pre_clear":
+        instance._cleared_user_ids = group_member_ids([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        refresh_effective_assignments(pk_set or ())
+    elif action == "post_clear":
+        refresh_effective_assignments(getattr(instance, "_cleared_user_ids", ()))
+
+
+# =============================
+# FINAL TEST ANALYTICS
+# =============================
+
+@receiver(post_save, sender=FinalTestSubmission)
+def submission_stats(sender, instance, created, raw=False, **kwargs):
+    # Only new submissions count; reviews re-save without changing answers
+    if created and not raw:
+        record_submission(instance)
+
+
+@receiver(post_save, sender=Question)
+def question_stats_module(sender, instance, created, **kwargs):
+    # A question moved to another module takes its stats with it
+    if not created and instance._moved_from_module_id:
+        QuestionStats.objects.filter(pk=instance.pk).update(module_id=instance.module_id)
@@ -0,0 +1,84 @@
+# academy/streaming.py
+#
+# Helpers for building large downloads as a stream of chunks, so exports
+# never need the whole file in memory.
+
+import io
+import tempfile
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Write-only, unseekable sink that collects bytes until they're drained.
+    zipfile supports unseekable output (it writes data descriptors instead
+    of seeking back), which is what lets us stream the archive.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_source(source):
+    # A file-like object is read in CHUNK_SIZE pieces (and closed afterwards);
+    # anything else is taken to be an iterable of bytes chunks.
+    if hasattr(source, "read"):
+        with source:
+            while True:
+                data = source.read(CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+    else:
+        yield from source
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """
+    Yield a ZIP archive chunk by chunk.
+
+    entries is an iterable of (arcname, source) pairs, where source is either
+    a file-like object or an iterable of bytes chunks (e.g. a generator).
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=compression) as archive:
+        for arcname, source in entries:
+            with archive.open(arcname, mode="w", force_zip64=True) as dest:
+                for data in _iter_source(source):
+                    dest.write(data)
+                    chunk = buffer.drain()
+                    if chunk:
+                        yield chunk
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
+
+
+def copy_to_tempfile(write):
+    """
+    Call write(fileobj) against a temporary file and return it rewound,
+    for outputs (like ReportLab canvases) that can't be generated as a stream.
+    """
+    tmp = tempfile.TemporaryFile()
+    write(tmp)
+    tmp.seek(0)
+    return tmp
@@ -0,0 +1,140 @@
+# academy/tasks.py
+#
+# Background job handlers for the academy (run by `manage.py run_jobs`).
+
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage
+
+from jobs.queue import handler
+
+from .certificates import ensure_certificate_pdf, render_missing_pdfs, store_merged_pdf
+from .models import Certificate, FinalTestSubmission
+
+
+def final_test_email(submission):
+    """
+    Build the (subject, body) of the email sent to superusers when a final
+    test is submitted, from the submission's marked answers snapshot.
+    """
+    user = submission.user
+    module = submission.module
+    course = module.course
+
+    answers = submission.answers or []
+    total_questions = len(answers)
+    correct_count = sum(1 for a in answers if a.get("is_correct"))
+    score_percent = int((correct_count / total_questions) * 100) if total_questions > 0 else 0
+
+    subject = (
+        f"[Cozy Academy] Final test submitted: "
+        f"{user} – {course.title} ({score_percent}%)"
+    )
+
+    body_lines = [
+        f"User: {user} (ID: {user.id})",
+        f"Course: {course.title}",
+        f"Module: {module.title}",
+        f"Submitted at: {submission.submitted_at}",
+        f"Score: {correct_count} / {total_questions} ({score_percent}%)",
+        "",
+        "Answers:",
+    ]
+
+    for a in answers:
+        body_lines.append("")
+        body_lines.append(f"Q: {a['question_text']}")
+        if a["selected_choice_text"]:
+            body_lines.append(f"Selected: {a['selected_choice_text']}")
+        else:
+            body_lines.append("Selected: (no answer selected)")
+
+        if a["correct_choice_text"]:
+            body_lines.append(f"Correct: {a['correct_choice_text']}")
+        else:
+            body_lines.append("Correct: (no correct choice set)")
+
+        body_lines.append(
+            f"Marked: {'CORRECT' if a['is_correct'] else 'INCORRECT'}"
+        )
+
+        if a["explanation"]:
+            body_lines.append(f"Explanation: {a['explanation']}")
+
+    return subject, "\n".join(body_lines)
+
+
+@handler("academy.final_test_submitted")
+def notify_final_test_submitted(payload, context):
+    """
+    Email all active superusers the marked answers of a final test submission.
+    """
+    submission = (
+        FinalTestSubmission.objects
+        .select_related("user", "module__course")
+        .filter(pk=payload["submission_id"])
+        .first()
+    )
+    if submission is None:
+        # Deleted before the worker got to it
+        return
+
+    User = get_user_model()
+    superuser_emails = list(
+        User.objects.filter(is_superuser=True, is_active=True)
+        .exclude(email__isnull=True)
+        .exclude(email__exact="")
+        .values_list("email", flat=True)
+    )
+    if not superuser_emails:
+        return
+
+    subject, body = final_test_email(submission)
+    EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=None,  # uses DEFAULT_FROM_EMAIL
+        to=superuser_emails,
+        connection=context.mail_connection,
+    ).send()
+
+
+@handler("academy.render_certificate")
+def render_certificate(payload, context):
+    """
+    Render and store a newly issued certificate's PDF.
+    """
+    certificate = (
+        Certificate.objects
+        .select_related("user", "course", "module")
+        .filter(pk=payload["certificate_id"])
+        .first()
+    )
+    if certificate is not None:
+        ensure_certificate_pdf(certificate)
+
+
+@handler("academy.render_certificates")
+def render_certificates(payload, context):
+    """
+    Render the stored PDFs a bulk certificate export is waiting for.
+    """
+    certificates = (
+        Certificate.objects
+        .select_related("user", "course", "module")
+        .filter(pk__in=payload["certificate_ids"])
+    )
+    render_missing_pdfs(certificates, workers=1)
+
+
+@handler("academy.merge_certificates")
+def merge_certificates(payload, context):
+    """
+    Render and store the merged PDF for a bulk certificate export.
+    """
+    certificates = (
+        Certificate.objects
+        .select_related("user", "course", "module")
+        .filter(pk__in=payload["certificate_ids"])
+        .order_by("issued_at", "id")
+    )
+    store_merged_pdf(certificates)
@@ -1,3 +1,1057 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import run_batch
+
+from .analytics import hardest_questions, pass_rate_trend, rebuild_question_stats
+from .answer_keys import get_answer_key
+from .assignments import rebuild_effective_assignments, verify_effective_assignments
+from .certificates import issue_certificate
+from .models import (
+    Certificate,
+    Choice,
+    ChoiceStats,
+    Course,
+    CourseAssignment,
+    CourseProgress,
+    DailyModuleStats,
+    EffectiveAssignment,
+    FinalTestSubmission,
+    Lesson,
+    LessonProgress,
+    Module,
+    ModuleProgress,
+    Question,
+    QuestionStats,
+    SearchDocument,
+)
+from .progress import CourseUnlockMap, refresh_course_progress, verify_course_progress
+from .question_export import question_bank_entries, questions_for, stream_question_bank
+from .question_import import QuestionImportError, iter_json_array, plan_import, run_import
+from .reports import driver_progress_count, driver_progress_page, driver_progress_rows, final_tests_page
+from .search import rebuild_search_index, search
+
+User = get_user_model()
+
+
+def make_course(index, modules=3):
+    course = Course.objects.create(title=f"Course {index}", slug=f"course-{index}", order=index)
+    for order in range(1, modules + 1):
+        Module.objects.create(course=course, title=f"Module {order}", slug=f"module-{order}", order=order)
+    return course
+
+
+def use_temporary_media(test):
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    settings = override_settings(MEDIA_ROOT=media_root)
+    settings.enable()
+    test.addCleanup(settings.disable)
+
+
+class DashboardQueryCountTests(TestCase):
+    # session, user, assigned courses, CourseProgress rollups and the
+    # aggregate for courses without a rollup (the news banner is cached
+    # in-process)
+    QUERIES = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user("driver", password="pass")
+        self.client.force_login(self.user)
+        self.url = reverse("academy_dashboard")
+
+    def assign(self, count, start=1, modules=3):
+        for index in range(start, start + count):
+            course = make_course(index, modules=modules)
+            CourseAssignment.objects.create(user=self.user, course=course)
+            # Pass the first module of each course
+            ModuleProgress.objects.create(
+                user=self.user, module=course.modules.first(), score=100, status="completed"
+            )
+
+    def assertDashboardQueries(self, courses):
+        # The first request fills the banner cache
+        self.client.get(self.url)
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["course_data"]), courses)
+        return response
+
+    def test_one_course(self):
+        self.assign(1)
+        response = self.assertDashboardQueries(1)
+        row = response.context["course_data"][0]
+        self.assertEqual((row["completed_modules"], row["total_modules"]), (1, 3))
+
+    def test_query_count_does_not_grow_with_courses_or_modules(self):
+        self.assign(8, modules=12)
+        response = self.assertDashboardQueries(8)
+        for row in response.context["course_data"]:
+            self.assertEqual((row["completed_modules"], row["total_modules"]), (1, 12))
+
+    def test_rollups_and_missing_rollups_together(self):
+        self.assign(6)
+        for course in Course.objects.all()[:3]:
+            refresh_course_progress(self.user, course.id)
+        response = self.assertDashboardQueries(6)
+        for row in response.context["course_data"]:
+            self.assertEqual((row["completed_modules"], row["total_modules"]), (1, 3))
+
+
+class CourseUnlockMapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("driver", password="pass")
+        self.course = make_course(1, modules=4)
+        self.modules = list(self.course.modules.order_by("order"))
+
+    def pass_module(self, module, score=100):
+        ModuleProgress.objects.create(user=self.user, module=module, score=score, status="completed")
+
+    def unlocked(self):
+        unlock_map = CourseUnlockMap(self.user, self.course)
+        return [unlock_map.can_access(module) for module in self.modules]
+
+    def test_modules_unlock_in_order(self):
+        self.assertEqual(self.unlocked(), [True, False, False, False])
+        self.pass_module(self.modules[0])
+        self.assertEqual(self.unlocked(), [True, True, False, False])
+
+    def test_score_below_the_pass_mark_keeps_the_next_module_locked(self):
+        self.pass_module(self.modules[0], score=self.modules[0].min_score_to_pass - 1)
+        self.assertEqual(self.unlocked(), [True, False, False, False])
+
+    def test_optional_modules_do_not_block(self):
+        Module.objects.filter(pk=self.modules[1].pk).update(is_mandatory=False)
+        self.pass_module(self.modules[0])
+        self.assertEqual(self.unlocked(), [True, True, True, False])
+
+    def test_modules_sharing_an_order_do_not_block_each_other(self):
+        Module.objects.filter(pk=self.modules[2].pk).update(order=self.modules[1].order)
+        self.pass_module(self.modules[0])
+        self.assertEqual(self.unlocked(), [True, True, True, False])
+        self.pass_module(self.modules[1])
+        self.assertEqual(self.unlocked(), [True, True, True, False])
+        self.pass_module(self.modules[2])
+        self.assertEqual(self.unlocked(), [True, True, True, True])
+
+    def test_course_detail_query_count_does_not_grow_with_modules(self):
+        course = make_course(2, modules=30)
+        for module in course.modules.all()[:10]:
+            self.pass_module(module)
+        self.client.force_login(self.user)
+        url = reverse("academy_course_detail", args=[course.slug])
+        self.client.get(url)
+
+        # session, user, course, modules and the user's module progress
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        access = [row["can_access"] for row in response.context["module_rows"]]
+        self.assertEqual(access, [True] * 11 + [False] * 19)
+
+
+class CourseProgressRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("driver", password="pass")
+        self.client.force_login(self.user)
+        self.course = make_course(1, modules=2)
+        self.module = self.course.modules.order_by("order").first()
+        self.lesson = Lesson.objects.create(module=self.module, title="Mirrors", content="Check them.")
+        question = Question.objects.create(module=self.module, text="Which mirror first?")
+        self.right = Choice.objects.create(question=question, text="Interior", is_correct=True)
+        Choice.objects.create(question=question, text="None", is_correct=False)
+
+    def rollup(self):
+        return CourseProgress.objects.get(user=self.user, course=self.course)
+
+    def test_completing_a_lesson_after_passing_the_quiz_updates_the_rollup(self):
+        quiz_url = reverse("academy_module_quiz", args=[self.course.slug, self.module.slug])
+        self.client.post(quiz_url, {f"question_{self.right.question_id}": self.right.id})
+        self.assertEqual((self.rollup().modules_passed, self.rollup().lessons_completed), (1, 0))
+
+        # The module is already at 100%, so its ModuleProgress doesn't change
+        self.client.get(reverse("academy_complete_lesson", args=[self.lesson.id]))
+        self.assertTrue(LessonProgress.objects.filter(user=self.user, lesson=self.lesson, completed=True).exists())
+
+        rollup = self.rollup()
+        self.assertEqual((rollup.modules_passed, rollup.lessons_completed, rollup.lessons_total), (1, 1, 1))
+        self.assertEqual(verify_course_progress(), [])
+
+
+class ModuleDetailTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("driver", password="pass")
+        self.client.force_login(self.user)
+        self.course = make_course(1, modules=1)
+        self.module = self.course.modules.get()
+        self.lessons = [
+            Lesson.objects.create(module=self.module, title=f"Lesson {order}", order=order, content="...")
+            for order in (1, 2)
+        ]
+        self.url = reverse("academy_module_detail", args=[self.course.slug, self.module.slug])
+
+    def complete(self, lesson):
+        self.client.get(reverse("academy_complete_lesson", args=[lesson.id]))
+
+    def progress(self):
+        return ModuleProgress.objects.values_list("score", "status").get(user=self.user, module=self.module)
+
+    def test_viewing_a_module_writes_nothing(self):
+        self.complete(self.lessons[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context["lesson_progress_percent"], 50)
+        writes = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+            and "django_session" not in query["sql"]
+        ]
+        self.assertEqual(writes, [])
+
+    def test_completing_lessons_updates_module_progress(self):
+        self.complete(self.lessons[0])
+        self.assertEqual(self.progress(), (50, "in_progress"))
+        self.complete(self.lessons[1])
+        self.assertEqual(self.progress(), (100, "completed"))
+
+    def test_adding_and_removing_lessons_resyncs_learners(self):
+        self.complete(self.lessons[0])
+        self.complete(self.lessons[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(module=self.module, title="Lesson 3", order=3, content="...")
+        self.assertEqual(self.progress(), (66, "in_progress"))
+        self.assertEqual(CourseProgress.objects.get(user=self.user).lessons_total, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].delete()
+        self.assertEqual(self.progress(), (50, "in_progress"))
+        self.assertEqual(verify_course_progress(), [])
+
+
+class AnswerKeyVersionTests(TestCase):
+    def setUp(self):
+        self.course = make_course(1, modules=2)
+        self.module, self.other = self.course.modules.order_by("order")
+        for order in range(1, 31):
+            question = Question.objects.create(module=self.module, text=f"Question {order}", order=order)
+            Choice.objects.create(question=question, text="Right", is_correct=True)
+            Choice.objects.create(question=question, text="Wrong")
+
+    def version(self, module):
+        return Module.objects.values_list("answer_key_version", flat=True).get(pk=module.pk)
+
+    def module_updates(self, queries):
+        return [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "academy_module"')
+        ]
+
+    def test_bulk_delete_bumps_each_module_once(self):
+        before = self.version(self.module)
+        with CaptureQueriesContext(connection) as queries:
+            Question.objects.filter(module=self.module).delete()
+        self.assertEqual(len(self.module_updates(queries)), 1)
+        self.assertEqual(self.version(self.module), before + 1)
+
+    def test_deleting_choices_bumps_once(self):
+        before = self.version(self.module)
+        with CaptureQueriesContext(connection) as queries:
+            Choice.objects.filter(question__module=self.module, is_correct=False).delete()
+        self.assertEqual(len(self.module_updates(queries)), 1)
+        self.assertEqual(self.version(self.module), before + 1)
+
+    def test_replacing_questions_on_import_does_not_grow_with_the_module(self):
+        data = b'[{"text": "New", "choices": [{"text": "A", "is_correct": true}]}]'
+        plan = plan_import(iter_json_array(io.BytesIO(data)), self.module)
+        with CaptureQueriesContext(connection) as queries:
+            run_import(plan, delete_existing=True)
+        # Once for the delete, once for the new questions
+        self.assertEqual(len(self.module_updates(queries)), 2)
+        self.assertEqual(list(self.module.questions.values_list("text", flat=True)), ["New"])
+
+    def test_moving_a_question_invalidates_both_modules(self):
+        question = Question.objects.filter(module=self.module).first()
+        old_key = get_answer_key(self.module)
+        self.assertIn(question.pk, old_key["questions"])
+
+        question.module = self.other
+        with CaptureQueriesContext(connection) as queries:
+            question.save()
+        # The old module comes from when the question was loaded, not a query
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query["sql"].startswith('SELECT "academy_question"."module_id"')
+        ])
+
+        self.module.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertNotIn(question.pk, get_answer_key(self.module)["questions"])
+        self.assertIn(question.pk, get_answer_key(self.other)["questions"])
+
+        # Moving it back is noticed too
+        question.module = self.module
+        question.save()
+        self.other.refresh_from_db()
+        self.assertNotIn(question.pk, get_answer_key(self.other)["questions"])
+
+    def test_editing_a_choice_changes_the_answer_key(self):
+        choice = Choice.objects.filter(question__module=self.module, text="Wrong").first()
+        self.assertNotIn(choice.pk, get_answer_key(self.module)["questions"][choice.question_id]["correct"])
+        choice.is_correct = True
+        choice.save()
+        self.module.refresh_from_db()
+        self.assertIn(choice.pk, get_answer_key(self.module)["questions"][choice.question_id]["correct"])
+
+
+class DriverProgressMatrixTests(TestCase):
+    def setUp(self):
+        self.courses = [make_course(1, modules=2), make_course(2, modules=3)]
+        self.modules = list(Module.objects.order_by("course__order", "order"))
+        self.drivers = [
+            User.objects.create_user("ab_c", first_name="Alex", last_name="Brown"),
+            User.objects.create_user("abxc", first_name="Sam", last_name="100% Green"),
+            User.objects.create_user("carol", email="carol@example.com"),
+        ]
+        User.objects.create_superuser("boss", password="pass")
+        ModuleProgress.objects.create(user=self.drivers[0], module=self.modules[0], score=90, status="completed")
+        ModuleProgress.objects.create(user=self.drivers[1], module=self.modules[0], score=40, status="in_progress")
+
+    def drivers_matching(self, search):
+        return {row["driver"] for row in driver_progress_rows({"driver": search})}
+
+    def test_every_driver_is_crossed_with_every_module(self):
+        rows = list(driver_progress_rows({}))
+        self.assertEqual(len(rows), 3 * 5)
+        self.assertEqual(driver_progress_count({}), 15)
+        self.assertNotIn("boss", {row["driver"] for row in rows})
+        statuses = [row["status"] for row in rows if row["module_id"] != self.modules[0].id]
+        self.assertEqual(set(statuses), {"not_started"})
+
+    def test_filters(self):
+        course = self.courses[0]
+        self.assertEqual(driver_progress_count({"course": course.id}), 3 * 2)
+        self.assertEqual(driver_progress_count({"module": self.modules[0].id}), 3)
+        self.assertEqual(driver_progress_count({"status": "completed"}), 1)
+        self.assertEqual(driver_progress_count({"status": "not_started", "module": self.modules[0].id}), 1)
+        self.assertEqual(driver_progress_count({"status": "bogus"}), 15)
+
+    def test_search_treats_wildcards_literally(self):
+        self.assertEqual(self.drivers_matching("b_c"), {"Alex Brown"})
+        self.assertEqual(self.drivers_matching("100%"), {"Sam 100% Green"})
+        self.assertEqual(self.drivers_matching("%"), {"Sam 100% Green"})
+        self.assertEqual(self.drivers_matching("CAROL@"), {"carol"})
+        self.assertEqual(self.drivers_matching("\\"), set())
+
+    def test_pages_cover_every_cell_once(self):
+        seen = []
+        page = driver_progress_page({}, sort="-score", page=1, per_page=4)
+        self.assertEqual((page["count"], page["num_pages"]), (15, 4))
+        self.assertEqual([row["score"] for row in page["rows"][:2]], [90, 40])
+        for number in range(1, 5):
+            page = driver_progress_page({}, sort="-score", page=number, per_page=4)
+            seen += [(row["user_id"], row["module_id"]) for row in page["rows"]]
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+
+        last = driver_progress_page({}, page=99, per_page=4)
+        self.assertEqual((last["number"], last["start_index"], last["end_index"]), (4, 13, 15))
+
+    def test_view_query_count_does_not_grow_with_drivers(self):
+        for index in range(30):
+            User.objects.create_user(f"extra{index}")
+        self.client.force_login(User.objects.get(username="boss"))
+        url = reverse("academy_manager_driver_progress")
+        self.client.get(url)
+        # session, user, the count, one page of cells, and the course and
+        # module filter lists
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {"page": 2})
+        self.assertEqual(len(response.context["rows"]), 50)
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        course = make_course(1, modules=2)
+        self.module = course.modules.order_by("order").first()
+        driver = User.objects.create_user("driver", first_name="Ünïcödé", last_name="Driver")
+        User.objects.create_user("plain")
+        ModuleProgress.objects.create(user=driver, module=self.module, score=85, status="completed")
+        self.client.force_login(User.objects.create_superuser("boss", password="pass"))
+
+    def export(self, export_format, **params):
+        url = reverse("academy_manager_driver_progress_export", args=[export_format])
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        return b"".join(response.streaming_content)
+
+    def test_csv(self):
+        body = self.export("csv", sort="-score")
+        self.assertTrue(body.startswith("\ufeff".encode()))
+        rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+        self.assertEqual(rows[0], ["Driver", "Course", "Module", "Status", "Score (%)", "Completed at"])
+        self.assertEqual(len(rows), 1 + 2 * 2)
+        self.assertEqual(rows[1][:5], ["Ünïcödé Driver", "Course 1", "Module 1", "completed", "85"])
+        self.assertEqual(rows[-1][3:5], ["not_started", ""])
+
+    def test_csv_neutralises_formulas(self):
+        User.objects.filter(username="plain").update(first_name="=HYPERLINK(1)")
+        rows = list(csv.reader(io.StringIO(self.export("csv", status="not_started").decode("utf-8-sig"))))
+        self.assertIn("'=HYPERLINK(1)", {row[0] for row in rows})
+
+    def test_xlsx_is_a_valid_workbook(self):
+        body = self.export("xlsx", module=self.module.id)
+        with zipfile.ZipFile(io.BytesIO(body)) as workbook:
+            self.assertIn("xl/workbook.xml", workbook.namelist())
+            sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+        namespace = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        rows = sheet.findall(".//s:row", namespace)
+        self.assertEqual(len(rows), 1 + 2)
+        first = rows[1].findall("s:c", namespace)
+        self.assertEqual(first[0].find(".//s:t", namespace).text, "Ünïcödé Driver")
+        self.assertEqual(first[4].find("s:v", namespace).text, "85")
+
+    def test_unknown_format_is_a_404(self):
+        url = reverse("academy_manager_driver_progress_export", args=["pdf"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class FinalTestListTests(TestCase):
+    def setUp(self):
+        self.module = make_course(1, modules=1).modules.get()
+        self.user = User.objects.create_user("driver")
+        now = timezone.now()
+        answers = [{"question_id": 1, "is_correct": True}, {"question_id": 2, "is_correct": False}]
+        # Pairs share a timestamp, so the id has to break the tie
+        for index in range(7):
+            FinalTestSubmission.objects.create(
+                user=self.user, module=self.module, answers=answers,
+                submitted_at=now - timezone.timedelta(minutes=index // 2),
+                reviewed=index % 3 == 0,
+            )
+
+    def test_scores_are_stored_and_backfilled_from_answers(self):
+        self.assertEqual(FinalTestSubmission.objects.first().score_percent, 50)
+        # As for rows submitted before the columns existed
+        FinalTestSubmission.objects.update(correct_count=0, total_questions=0, score_percent=0)
+        call_command("backfill_final_test_scores", stdout=io.StringIO())
+        self.assertEqual(
+            set(FinalTestSubmission.objects.values_list("correct_count", "total_questions", "score_percent")),
+            {(1, 2, 50)},
+        )
+
+    def test_keyset_pages_walk_forward_and_back(self):
+        expected = list(FinalTestSubmission.objects.order_by("-submitted_at", "-id").values_list("id", flat=True))
+
+        pages = []
+        cursor = None
+        while True:
+            page = final_tests_page({}, after=cursor, per_page=3)
+            pages.append([submission.id for submission in page["items"]])
+            if not page["has_next"]:
+                break
+            cursor = page["next_cursor"]
+        self.assertEqual(pages, [expected[0:3], expected[3:6], expected[6:7]])
+        self.assertFalse(final_tests_page({}, per_page=3)["has_previous"])
+
+        back = final_tests_page({}, before=page["previous_cursor"], per_page=3)
+        self.assertEqual([submission.id for submission in back["items"]], expected[3:6])
+        self.assertTrue(back["has_previous"] and back["has_next"])
+        back = final_tests_page({}, before=back["previous_cursor"], per_page=3)
+        self.assertEqual([submission.id for submission in back["items"]], expected[0:3])
+        self.assertFalse(back["has_previous"])
+
+    def test_filters_and_bad_cursors(self):
+        reviewed = final_tests_page({"status": "reviewed"}, per_page=10)["items"]
+        self.assertEqual(len(reviewed), 3)
+        self.assertTrue(all(submission.reviewed for submission in reviewed))
+        self.assertEqual(len(final_tests_page({}, after="not-a-cursor", per_page=10)["items"]), 7)
+
+    def test_view_is_a_fixed_number_of_queries(self):
+        self.client.force_login(User.objects.create_superuser("boss", password="pass"))
+        url = reverse("academy_manager_final_tests")
+        self.client.get(url)
+        # session, user, the page (with certificate subquery) and the module filter list
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["submissions"]), 7)
+
+
+class ManagerUsersTests(TestCase):
+    def setUp(self):
+        self.boss = User.objects.create_superuser("boss", password="pass")
+        self.client.force_login(self.boss)
+        self.url = reverse("academy_manager_users")
+        courses = [make_course(index, modules=1) for index in (1, 2)]
+        for index in range(60):
+            user = User.objects.create_user(f"driver{index:02}", email=f"d{index}@example.com")
+            CourseAssignment.objects.create(user=user, course=courses[index % 2])
+
+    def test_list_is_paginated_with_a_fixed_number_of_queries(self):
+        self.client.get(self.url)
+        # session, user, count, the page of users and their assignments
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {"page": 2})
+        page = response.context["page"]
+        self.assertEqual((page.number, page.paginator.count, len(page.object_list)), (2, 61, 11))
+        self.assertEqual(
+            [len(user.effective_assignments.all()) for user in page.object_list],
+            [1] * 11,
+        )
+
+    def test_search(self):
+        response = self.client.get(self.url, {"q": "DRIVER1"})
+        self.assertEqual(
+            [user.username for user in response.context["users"]],
+            [f"driver{index}" for index in range(10, 20)],
+        )
+        response = self.client.get(self.url, {"q": "d42@example"})
+        self.assertEqual([user.username for user in response.context["users"]], ["driver42"])
+
+    def test_panel_is_loaded_on_demand(self):
+        user = User.objects.get(username="driver03")
+        response = self.client.get(reverse("academy_manager_user_panel", args=[user.id]))
+        self.assertEqual(response.context["managed_user"], user)
+        self.assertEqual([a.course.title for a in response.context["assignments"]], ["Course 2"])
+        self.assertNotContains(self.client.get(self.url), "unassign_course")
+
+    def test_actions_return_to_the_page_they_came_from(self):
+        user = User.objects.get(username="driver05")
+        back = f"{self.url}?q=driver&page=2"
+        response = self.client.post(self.url, {"action": "toggle_active", "user_id": user.id, "next": back})
+        self.assertRedirects(response, back, fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+
+        response = self.client.post(self.url, {"action": "toggle_active", "user_id": user.id,
+                                               "next": "https://evil.example.com/"})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "academy.hashers.ImportPBKDF2PasswordHasher",
+])
+class DriverImportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("boss", password="pass"))
+        self.url = reverse("academy_manager_users_import")
+        self.course = make_course(1, modules=1)
+        self.group = Group.objects.create(name="Depot A")
+
+    def upload(self, text, **data):
+        csv_file = SimpleUploadedFile("drivers.csv", ("\ufeff" + text).encode("utf-8"), content_type="text/csv")
+        return self.client.post(self.url, {"csv_file": csv_file, **data})
+
+    def test_import_hashes_in_process_and_upgrades_on_login(self):
+        rows = "".join(f"driver{index},d{index}@example.com,Tr4ctor-Beam-{index},Depot A,course-1\n" for index in range(10))
+        with mock.patch("academy.onboarding.ProcessPoolExecutor", side_effect=AssertionError("forked")):
+            response = self.upload("username,email,password,group,courses\n" + rows)
+        self.assertRedirects(response, reverse("academy_manager_users"), fetch_redirect_response=False)
+
+        driver = User.objects.get(username="driver3")
+        self.assertTrue(driver.password.startswith("pbkdf2_sha256_import$"))
+        self.assertEqual(list(driver.groups.all()), [self.group])
+        self.assertEqual(list(driver.effective_assignments.values_list("course", flat=True)), [self.course.id])
+
+        self.assertTrue(self.client.login(username="driver3", password="Tr4ctor-Beam-3"))
+        driver.refresh_from_db()
+        self.assertTrue(driver.password.startswith("pbkdf2_sha256$"))
+
+    def test_nothing_is_imported_while_rows_have_errors(self):
+        text = (
+            "username,email,password,group,courses\n"
+            "good,good@example.com,Tr4ctor-Beam-1,,\n"
+            "boss,not-an-email,123,Nowhere,no-such-course\n"
+        )
+        response = self.upload(text)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({line for line, _ in response.context["errors"]}, {3})
+        self.assertFalse(User.objects.filter(username="good").exists())
+
+        self.upload(text, skip_invalid="on")
+        self.assertTrue(User.objects.filter(username="good").exists())
+
+
+class QuestionImportTests(TestCase):
+    def setUp(self):
+        self.course = make_course(1, modules=2)
+        self.module, self.other = self.course.modules.order_by("order")
+
+    def plan(self, entries, read_size=7):
+        data = json.dumps(entries).encode()
+        return plan_import(iter_json_array(io.BytesIO(data), read_size=read_size), self.module)
+
+    def test_reader_handles_values_split_across_reads(self):
+        data = b'\xef\xbb\xbf [ {"n": 12.5e3, "s": "caf\xc3\xa9"} , 1234567 , true ] '
+        self.assertEqual(
+            list(iter_json_array(io.BytesIO(data), read_size=3)),
+            [{"n": 12500.0, "s": "café"}, 1234567, True],
+        )
+
+    def test_reader_rejects_bad_files(self):
+        for data in (b'{"text": "x"}', b'[{"a": 1} {"b": 2}]', b'[{"a": 1}, '):
+            with self.subTest(data=data), self.assertRaises(QuestionImportError):
+                list(iter_json_array(io.BytesIO(data)))
+
+    def test_custom_entries_and_their_problems(self):
+        plan = self.plan([
+            {"text": "Kept", "choices": [{"text": "A", "is_correct": True}], "module_slug": "module-2"},
+            {"text": "No module", "choices": [{"text": "A", "is_correct": True}], "module_slug": "nowhere"},
+            {"text": "Missing choices"},
+            {"text": "Long", "choices": [{"text": "x" * 300}]},
+            "not an object",
+        ])
+        self.assertEqual([q["module_id"] for q in plan.questions], [self.other.id, self.module.id])
+        self.assertEqual([number for number, _ in plan.problems], [2, 3, 4, 5])
+        self.assertIn("imported into", plan.problems[0][1])
+
+    def test_fixture_format(self):
+        plan = self.plan([
+            {"model": "academy.question", "pk": 7, "fields": {"module": self.other.id, "text": "Q", "order": 2}},
+            {"model": "academy.choice", "fields": {"question": 7, "text": "Yes", "is_correct": True}},
+            {"model": "academy.choice", "fields": {"question": 99, "text": "Orphan"}},
+        ])
+        self.assertEqual(run_import(plan), (1, 1))
+        question = Question.objects.get()
+        self.assertEqual((question.module, question.order, question.choices.get().text), (self.other, 2, "Yes"))
+        self.assertEqual(plan.problems[0][0], 3)
+
+    def test_module_lookups_are_one_query(self):
+        entries = [
+            {"text": f"Q{index}", "choices": [{"text": "A", "is_correct": True}],
+             "module_slug": f"module-{index % 2 + 1}", "course_slug": "course-1"}
+            for index in range(200)
+        ]
+        with self.assertNumQueries(1):
+            plan = self.plan(entries, read_size=4096)
+        self.assertEqual(len(plan.questions), 200)
+
+    def test_failed_import_writes_nothing(self):
+        Question.objects.create(module=self.module, text="Existing")
+        plan = self.plan([{"text": "New", "choices": [{"text": "A", "is_correct": True}]}])
+        with mock.patch.object(Choice.objects, "bulk_create", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                run_import(plan, delete_existing=True)
+        self.assertEqual(list(Question.objects.values_list("text", flat=True)), ["Existing"])
+
+    def test_dry_run_through_the_view(self):
+        self.client.force_login(User.objects.create_superuser("boss", password="pass"))
+        upload = SimpleUploadedFile("bank.json", json.dumps([
+            {"text": "Q", "choices": [{"text": "A", "is_correct": True}]},
+        ]).encode())
+        response = self.client.post(
+            reverse("academy_import_questions"),
+            {"module_id": self.module.id, "dry_run": "on", "json_file": upload},
+        )
+        self.assertEqual(len(response.context["report"].questions), 1)
+        self.assertFalse(Question.objects.exists())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.course = make_course(1, modules=2)
+        self.other_course = make_course(2, modules=1)
+        self.module, self.second = self.course.modules.order_by("order")
+        self.question = Question.objects.create(
+            module=self.module, text="When may you overtake?", explanation="Only when the road ahead is clear."
+        )
+        self.choice = Choice.objects.create(question=self.question, text="On a blind bend", is_correct=False)
+        self.lesson = Lesson.objects.create(
+            module=self.second, title="Tachographs", content="<p>Record <b>driving</b> hours &amp; breaks.</p>"
+        )
+        Question.objects.create(module=self.other_course.modules.get(), text="Driving hours in Europe")
+
+    def found(self, text, **filters):
+        return [(document.kind, document.object_id) for document in search(text, **filters)]
+
+    def test_questions_match_on_text_explanation_and_choices(self):
+        self.assertEqual(self.found("overtak"), [("question", self.question.id)])
+        self.assertEqual(self.found("road clear"), [("question", self.question.id)])
+        self.assertEqual(self.found("blind bend"), [("question", self.question.id)])
+        self.assertEqual(self.found("blind motorway"), [])
+
+    def test_lessons_are_indexed_without_markup(self):
+        self.assertEqual(self.found("hours breaks"), [("lesson", self.lesson.id)])
+        self.assertEqual(self.found("amp"), [])
+
+    def test_filters(self):
+        self.assertEqual(len(self.found("driving hours")), 2)
+        self.assertEqual(self.found("driving hours", course=self.course), [("lesson", self.lesson.id)])
+        self.assertEqual(self.found("driving", module=self.module), [])
+        self.assertEqual(len(self.found("driving", kind=SearchDocument.KIND_QUESTION)), 1)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.choice.text = "On a zebra crossing"
+        self.choice.save()
+        self.assertEqual(self.found("blind"), [])
+        self.assertEqual(self.found("zebra"), [("question", self.question.id)])
+
+        self.question.delete()
+        self.assertEqual(self.found("overtake"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        for text in ('"', "OR", "overtake NOT", "*", "-", "()"):
+            with self.subTest(text=text):
+                list(search(text))
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild_search_index(), 3)
+        self.assertEqual(self.found("overtak"), [("question", self.question.id)])
+
+
+class EffectiveAssignmentTests(TestCase):
+    def setUp(self):
+        self.course, self.other = make_course(1, modules=1), make_course(2, modules=1)
+        self.group = Group.objects.create(name="Depot A")
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+
+    def courses(self, user):
+        return set(EffectiveAssignment.objects.filter(user=user).values_list("course__slug", flat=True))
+
+    def tearDown(self):
+        self.assertEqual(verify_effective_assignments(), [])
+
+    def test_group_assignments_follow_membership(self):
+        CourseAssignment.objects.create(group=self.group, course=self.course)
+        self.alice.groups.add(self.group)
+        self.assertEqual(self.courses(self.alice), {"course-1"})
+
+        self.group.user_set.add(self.bob)
+        self.assertEqual(self.courses(self.bob), {"course-1"})
+
+        self.group.user_set.clear()
+        self.assertEqual((self.courses(self.alice), self.courses(self.bob)), (set(), set()))
+
+    def test_direct_and_group_assignments_overlap(self):
+        self.alice.groups.add(self.group)
+        direct = CourseAssignment.objects.create(user=self.alice, course=self.course)
+        CourseAssignment.objects.create(group=self.group, course=self.course)
+
+        direct.delete()
+        self.assertEqual(self.courses(self.alice), {"course-1"})
+        self.alice.groups.remove(self.group)
+        self.assertEqual(self.courses(self.alice), set())
+
+    def test_moving_an_assignment_and_deleting_a_group(self):
+        self.bob.groups.add(self.group)
+        assignment = CourseAssignment.objects.create(user=self.alice, course=self.other)
+        assignment.user, assignment.group = None, self.group
+        assignment.save()
+        self.assertEqual((self.courses(self.alice), self.courses(self.bob)), (set(), {"course-2"}))
+
+        self.group.delete()
+        self.assertEqual(self.courses(self.bob), set())
+
+    def test_rebuild_repairs_drift(self):
+        CourseAssignment.objects.create(user=self.alice, course=self.course)
+        EffectiveAssignment.objects.all().delete()
+        EffectiveAssignment.objects.create(user=self.bob, course=self.other)
+        self.assertEqual(len(verify_effective_assignments()), 2)
+        self.assertEqual(rebuild_effective_assignments(), {"created": 1, "deleted": 1})
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("driver")
+        self.course = make_course(1, modules=2)
+        self.module, self.other = self.course.modules.order_by("order")
+        self.questions = {}
+        for module in (self.module, self.other):
+            for order in range(1, 3):
+                question = Question.objects.create(module=module, text=f"Q{order}", order=order)
+                Choice.objects.create(question=question, text="Right", is_correct=True)
+                Choice.objects.create(question=question, text="Wrong")
+                self.questions[module.pk, order] = question
+
+    def submit(self, module, picks, days_ago=0):
+        answers = []
+        for order, text in picks:
+            question = self.questions[module.pk, order]
+            choice = question.choices.filter(text=text).first() if text else None
+            answers.append({
+                "question_id": question.pk,
+                "selected_choice_id": choice.pk if choice else None,
+                "is_correct": bool(choice and choice.is_correct),
+            })
+        correct = sum(answer["is_correct"] for answer in answers)
+        return FinalTestSubmission.objects.create(
+            user=self.user,
+            module=module,
+            submitted_at=timezone.now() - timedelta(days=days_ago),
+            answers=answers,
+            correct_count=correct,
+            total_questions=len(answers),
+            score_percent=round(correct * 100 / len(answers)),
+        )
+
+    def snapshot(self):
+        return (
+            sorted(QuestionStats.objects.values_list("question_id", "module_id", "attempts", "correct", "unanswered")),
+            sorted(ChoiceStats.objects.values_list("choice_id", "question_id", "picks")),
+            sorted(DailyModuleStats.objects.values_list("module_id", "date", "submissions", "passed", "score_total")),
+        )
+
+    def test_incremental_totals_match_a_rebuild(self):
+        self.submit(self.module, [(1, "Right"), (2, "Right")])
+        self.submit(self.module, [(1, "Wrong"), (2, None)])
+        self.submit(self.module, [(1, "Right"), (2, "Wrong")], days_ago=1)
+        self.submit(self.other, [(1, None), (2, "Right")])
+
+        stats = QuestionStats.objects.get(pk=self.questions[self.module.pk, 1].pk)
+        self.assertEqual((stats.attempts, stats.correct, stats.unanswered), (3, 2, 0))
+        today = DailyModuleStats.objects.get(module=self.module, date=timezone.localdate())
+        self.assertEqual((today.submissions, today.passed, today.score_total), (2, 1, 100))
+
+        incremental = self.snapshot()
+        self.assertEqual(
+            rebuild_question_stats(),
+            {"submissions": 4, "questions": 4, "choices": 5, "days": 3},
+        )
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rebuild_drops_deleted_submissions(self):
+        kept = self.submit(self.module, [(1, "Right"), (2, "Right")])
+        self.submit(self.module, [(1, "Wrong"), (2, "Wrong")]).delete()
+        self.assertEqual(QuestionStats.objects.get(pk=self.questions[self.module.pk, 1].pk).attempts, 2)
+
+        out = io.StringIO()
+        call_command("rebuild_question_stats", stdout=out)
+        stats = QuestionStats.objects.get(pk=self.questions[self.module.pk, 1].pk)
+        self.assertEqual((stats.attempts, stats.correct), (1, 1))
+        self.assertFalse(ChoiceStats.objects.filter(choice__text="Wrong").exists())
+        day = DailyModuleStats.objects.get()
+        self.assertEqual((day.module_id, day.submissions, day.score_total), (kept.module_id, 1, 100))
+
+    def test_hardest_questions_and_trend_read_the_totals(self):
+        self.submit(self.module, [(1, "Wrong"), (2, "Right")])
+        self.submit(self.module, [(1, "Wrong"), (2, "Right")], days_ago=2)
+        self.submit(self.other, [(1, "Right"), (2, "Right")])
+
+        hardest = hardest_questions(module=self.module)
+        self.assertEqual([row.question.text for row in hardest], ["Q1", "Q2"])
+        self.assertEqual(
+            [(choice["text"], choice["picks"], choice["percent"]) for choice in hardest[0].choice_rows],
+            [("Right", 0, 0), ("Wrong", 2, 100)],
+        )
+        self.assertEqual(len(hardest_questions(course=self.course)), 4)
+        self.assertEqual(hardest_questions(module=self.module, min_attempts=3), [])
+
+        trend = pass_rate_trend(course=self.course)
+        self.assertEqual(
+            [(row["submissions"], row["passed"], row["average_score"]) for row in trend],
+            [(1, 0, 50), (2, 1, 75)],
+        )
+
+        admin = User.objects.create_superuser("admin", password="pass")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("academy_question_analytics"), {"module": self.module.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row.pk for row in response.context["questions"]], [row.pk for row in hardest])
+
+
+class FinalTestQueryCountTests(TestCase):
+    QUESTIONS = 100
+    # session, user, course, module, unlock map (modules + progress), the
+    # cached answer key, the submission insert and its analytics counters
+    # (inside savepoints), and the notification job
+    QUERIES = 25
+
+    def setUp(self):
+        self.user = User.objects.create_user("driver", password="pass")
+        self.client.force_login(self.user)
+        self.course = make_course(1, modules=1)
+        self.module = self.course.modules.get()
+
+        questions = Question.objects.bulk_create(
+            Question(module=self.module, text=f"Question {order}", order=order)
+            for order in range(1, self.QUESTIONS + 1)
+        )
+        Choice.objects.bulk_create(
+            Choice(question=question, text=text, is_correct=text == "Right")
+            for question in questions
+            for text in ("Right", "Wrong", "Also wrong")
+        )
+        self.url = reverse("academy_final_test", args=[self.course.slug, self.module.slug])
+
+    def answers(self):
+        correct = dict(
+            Choice.objects.filter(question__module=self.module, is_correct=True)
+            .values_list("question_id", "id")
+        )
+        wrong = dict(
+            Choice.objects.filter(question__module=self.module, text="Wrong")
+            .values_list("question_id", "id")
+        )
+        # 75 right, 5 wrong and 20 left unanswered
+        data = {}
+        for position, question_id in enumerate(sorted(correct)):
+            if position % 4 != 3:
+                data[f"question_{question_id}"] = correct[question_id]
+            elif position % 10 == 3:
+                data[f"question_{question_id}"] = wrong[question_id]
+        return data
+
+    def test_query_count_for_a_100_question_final_test(self):
+        data = self.answers()
+        # The answer key is normally already cached by the GET of the form
+        get_answer_key(self.module)
+
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+
+        submission = FinalTestSubmission.objects.get()
+        self.assertEqual(submission.total_questions, self.QUESTIONS)
+        self.assertEqual(submission.correct_count, 75)
+        self.assertEqual(len(submission.answers), self.QUESTIONS)
+        self.assertEqual(sum(answer["selected_choice_id"] is None for answer in submission.answers), 20)
+
+
+class QuestionBankRoundTripTests(TestCase):
+    def setUp(self):
+        self.course = make_course(1, modules=2)
+        self.other_course = make_course(2, modules=1)  # also has a "module-1"
+        first, second = self.course.modules.order_by("order")
+
+        def question(module, text, choices, order=1, explanation=""):
+            question = Question.objects.create(module=module, text=text, order=order, explanation=explanation)
+            for choice_text, is_correct in choices:
+                Choice.objects.create(question=question, text=choice_text, is_correct=is_correct)
+
+        question(first, "Which lane?", [("Left", False), ("Right", True), ("Centre", False)],
+                 explanation="Keep right when overtaking.")
+        question(first, 'Quotes "and" \\ backslashes, ünïcödé ✓\nand a newline  ', [("Yes", True)], order=2)
+        question(first, "Several correct", [("A", True), ("B", True), ("C", False)], order=2)
+        question(first, "No correct choice", [("A", False), ("B", False)], order=3)
+        question(first, "No choices yet", [], order=4)
+        question(first, "A blank choice", [("", False), ("   ", False), ("Real", True)], order=5)
+        question(second, "Second module", [("Only", True)], order=0)
+        question(self.other_course.modules.get(), "Other course, same module slug", [("X", True)])
+
+    def snapshot(self):
+        return [
+            (
+                question.module.course.slug,
+                question.module.slug,
+                question.order,
+                question.text,
+                question.explanation,
+                [(choice.text, choice.is_correct) for choice in question.choices.order_by("id")],
+            )
+            for question in Question.objects.select_related("module__course").order_by(
+                "module__course__order", "module__order", "order", "id"
+            )
+        ]
+
+    def test_export_then_import_is_lossless(self):
+        before = self.snapshot()
+        exported = b"".join(stream_question_bank(question_bank_entries(questions_for())))
+
+        Question.objects.all().delete()
+        plan = plan_import(iter_json_array(io.BytesIO(exported), read_size=64), self.course.modules.first())
+        self.assertFalse([problem for problem in plan.problems if "skipped" in problem[1]])
+        self.assertEqual(run_import(plan), (8, 14))
+
+        self.assertEqual(self.snapshot(), before)
+
+
+class CertificatePdfTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = User.objects.create_user("driver", password="pass", first_name="Dana", last_name="Driver")
+        course = make_course(1, modules=1)
+        self.certificate, _ = issue_certificate(self.user, course.modules.get(), 95)
+        self.url = reverse("academy_generate_certificate_pdf", args=[self.certificate.id])
+        self.client.force_login(self.user)
+
+    def test_pdf_is_rendered_once_and_stored_by_content_hash(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content)
+        self.assertTrue(body.startswith(b"%PDF"))
+
+        self.certificate.refresh_from_db()
+        self.assertEqual(self.certificate.pdf_file.name, f"certificates/{self.certificate.pdf_sha256}.pdf")
+        self.assertEqual(response["ETag"], f'"{self.certificate.pdf_sha256}"')
+        self.assertIn("Last-Modified", response)
+
+        rendered_at = self.certificate.pdf_rendered_at
+        self.client.get(self.url)
+        self.certificate.refresh_from_db()
+        self.assertEqual(self.certificate.pdf_rendered_at, rendered_at)
+
+    def test_conditional_get_is_answered_with_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_other_users_are_refused(self):
+        other = User.objects.create_user("other", password="pass")
+        issue_certificate(other, self.certificate.module, 90)
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class CertificateExportTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        course = make_course(1, modules=1)
+        for index in range(3):
+            user = User.objects.create_user(f"driver{index}", password="pass")
+            issue_certificate(user, course.modules.get(), 90 + index)
+        # Leave the PDFs unrendered, as after a layout change
+        Job.objects.all().delete()
+
+        self.client.force_login(User.objects.create_superuser("boss", password="pass"))
+        self.url = reverse("academy_manager_certificates_export")
+
+    def test_zip_export_queues_missing_pdfs_then_serves_the_stored_files(self):
+        response = self.client.get(self.url, {"format": "zip"})
+        self.assertRedirects(response, reverse("academy_manager_certificates"), fetch_redirect_response=False)
+        job = Job.objects.get()
+        self.assertEqual((job.kind, len(job.payload["certificate_ids"])), ("academy.render_certificates", 3))
+        self.assertFalse(Certificate.objects.exclude(pdf_file="").exists())
+
+        self.assertEqual(run_batch()["done"], 1)
+        self.assertEqual(Certificate.objects.exclude(pdf_file="").count(), 3)
+
+        response = self.client.get(self.url, {"format": "zip"})
+        self.assertEqual(response["Content-Type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                sorted(f"{number}.pdf" for number in Certificate.objects.values_list("certificate_number", flat=True)),
+            )
+        self.assertEqual(Job.objects.filter(status="pending").count(), 0)
+
+    def test_merged_pdf_is_built_by_the_worker(self):
+        response = self.client.get(self.url, {"format": "pdf"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Job.objects.get().kind, "academy.merge_certificates")
+
+        run_batch()
+        response = self.client.get(self.url, {"format": "pdf"})
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+        self.assertEqual(Job.objects.count(), 1)
@@ -74,6 +74,16 @@ urlpatterns = [
         views.manager_users,
         name="academy_manager_users",
     ),
+    path(
+        "managers/users/import/",
+        views.manager_users_import,
+        name="academy_manager_users_import",
+    ),
+    path(
+        "managers/users/<int:user_id>/panel/",
+        views.manager_user_panel,
+        name="academy_manager_user_panel",
+    ),
 
     # Certificates
     path(
@@ -81,6 +91,11 @@ urlpatterns = [
         views.manager_certificates,
         name="academy_manager_certificates",
     ),
+    path(
+        "managers/certificates/export/",
+        views.manager_certificates_export,
+        name="academy_manager_certificates_export",
+    ),
     path(
         "managers/certificate/<int:certificate_id>/pdf/",
         views.generate_certificate_pdf,
@@ -93,6 +108,11 @@ urlpatterns = [
         views.manager_final_tests,
         name="academy_manager_final_tests",
     ),
+    path(
+        "managers/final-tests/export/<str:export_format>/",
+        views.manager_final_tests_export,
+        name="academy_manager_final_tests_export",
+    ),
     path(
         "managers/final-tests/pass/<int:submission_id>/",
         views.manager_mark_pass,
@@ -181,6 +201,11 @@ urlpatterns = [
         views.manager_driver_progress,
         name="academy_manager_driver_progress",
     ),
+    path(
+        "managers/driver-progress/export/<str:export_format>/",
+        views.manager_driver_progress_export,
+        name="academy_manager_driver_progress_export",
+    ),
     # QUESTION MANAGEMENT
     path("manager/questions/<int:question_id>/edit/", views.edit_question, name="academy_edit_question"),
 
@@ -190,6 +215,8 @@ urlpatterns = [
     path("manager/questions/<int:question_id>/choices/add/", views.add_choice, name="academy_add_choice"),
     path("managers/questions/", views.manage_questions, name="academy_manage_questions"),
     path("managers/questions/import/", views.import_questions, name="academy_import_questions"),
+    path("managers/questions/export/", views.export_questions, name="academy_export_questions"),
+    path("managers/questions/analytics/", views.manager_question_analytics, name="academy_question_analytics"),
     path(
         "managers/assign/",
         views.manager_assign,
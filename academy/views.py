@@ -4,24 +4,59 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import user_passes_test
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 from .models import ManagerDocument
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, url_has_allowed_host_and_scheme
 from .models import Certificate, ModuleProgress, FinalTestSubmission
 from django.conf import settings
-from reportlab.lib.utils import ImageReader
-from .forms import QuestionForm, ChoiceFormSet
+from .forms import CertificateExportForm, DriverImportForm, QuestionForm, ChoiceFormSet
+import csv
 import json
 from django.contrib.admin.views.decorators import staff_member_required
 from .models import Question, Choice, Module
-from django.db.models import Q
-from .models import Course, CourseAssignment
+from django.db import transaction
+from django.core.paginator import Paginator
+from django.core.files.storage import default_storage
+from django.db.models import Count, Prefetch, Q
+from .models import Course, CourseAssignment, EffectiveAssignment
 import os
 
+from iota.slugs import save_with_unique_slug
+from jobs.mail import enqueue_mail_admins
+from jobs.queue import enqueue
+
+from .analytics import TREND_DAYS, hardest_questions, pass_rate_trend
+from .answer_keys import get_answer_key, mark_answer, mark_final_test
+from .certificates import (
+    ensure_certificate_pdf,
+    export_certificates_zip,
+    filter_certificates,
+    issue_certificate,
+    merged_pdf_name,
+    queue_missing_pdfs,
+)
+from .exports import (
+    FORMATS as EXPORT_FORMATS,
+    WRITERS as EXPORT_WRITERS,
+    certificate_report,
+    driver_progress_report,
+    final_test_report,
+)
+from .onboarding import IMPORT_HASHER, import_drivers, read_driver_csv, validate_driver_rows
+from .question_export import question_bank_entries, questions_for, stream_question_bank
+from .question_import import QuestionImportError, iter_json_array, plan_import, run_import
+from .search import search as search_documents
+from .progress import (
+    build_course_rows,
+    get_unlock_map,
+    refresh_course_progress,
+    sync_module_progress_from_lessons,
+)
+from .reports import driver_progress_page, final_tests_page
 
 from .models import (
     Course,
@@ -36,72 +71,6 @@ from .models import (
 )
 
 
-def _update_module_progress_from_lessons(user, module):
-    """
-    Recalculate ModuleProgress for a user/module based on lesson completion.
-
-    For now:
-      - score = percentage of lessons completed (0–100)
-      - status:
-          0%      -> not_started
-          1–99%   -> in_progress
-          100%    -> completed
-    """
-    module_progress = _get_module_progress(user, module)
-
-    lessons = module.lessons.all()
-    total = lessons.count()
-
-    if total == 0:
-        # No lessons: treat as completed module
-        module_progress.score = 100
-        module_progress.status = "completed"
-        if module_progress.completed_at is None:
-            module_progress.completed_at = timezone.now()
-    else:
-        completed_count = LessonProgress.objects.filter(
-            user=user,
-            lesson__module=module,
-            completed=True,
-        ).count()
-
-        percent = int((completed_count / total) * 100)
-
-        module_progress.score = percent
-
-        if percent == 0:
-            module_progress.status = "not_started"
-            module_progress.completed_at = None
-        elif percent < 100:
-            module_progress.status = "in_progress"
-            module_progress.completed_at = None
-        else:
-            module_progress.status = "completed"
-            if module_progress.completed_at is None:
-                module_progress.completed_at = timezone.now()
-
-    module_progress.last_attempt_at = timezone.now()
-    module_progress.save()
-    return module_progress
-
-
-def _can_access_module(user, module):
-    """
-    Returns True if the user has passed all previous mandatory modules in this course.
-    'Passed' means ModuleProgress.score >= module.min_score_to_pass.
-    """
-    previous_modules = module.course.modules.filter(
-        order__lt=module.order,
-        is_mandatory=True,
-    )
-
-    for m in previous_modules:
-        prog = ModuleProgress.objects.filter(user=user, module=m).first()
-        if not prog or not prog.passed:
-            return False
-    return True
-
-
 def _get_module_progress(user, module):
     """
     Convenience helper to get or create ModuleProgress.
@@ -123,21 +92,9 @@ def _issue_certificate_if_needed(request, module_progress):
     module = module_progress.module
     course = module.course
 
-    existing = Certificate.objects.filter(user=user, module=module).first()
-    if existing:
-        return existing
-
-    # Generate a simple unique certificate number
-    timestamp = int(timezone.now().timestamp())
-    cert_number = f"COZY-{course.id}-{module.id}-{user.id}-{timestamp}"
-
-    certificate = Certificate.objects.create(
-        user=user,
-        course=course,
-        module=module,
-        score=module_progress.score,
-        certificate_number=cert_number,
-    )
+    certificate, created = issue_certificate(user, module, module_progress.score)
+    if not created:
+        return certificate
 
     # Build URL to the certificate detail page
     url = request.build_absolute_uri(
@@ -157,7 +114,8 @@ def _issue_certificate_if_needed(request, module_progress):
         f"View/print the certificate here: {url}"
     )
 
-    mail_admins(subject, message)
+    # Sent by the background worker (manage.py run_jobs), not during the request
+    enqueue_mail_admins(subject, message)
 
     return certificate
 
@@ -168,43 +126,15 @@ def dashboard(request):
     Show only assigned courses (user or group) and the user's progress in each.
     """
 
-    # 1. Get course IDs assigned to this user OR their groups
-    assigned_course_ids = CourseAssignment.objects.filter(
-        Q(user=request.user) |
-        Q(group__in=request.user.groups.all())
-    ).values_list("course_id", flat=True)
-
-    # 2. Load the assigned courses, still respecting is_active
+    # 1. Assigned courses, direct or through a group, from the materialised
+    #    table (see academy/assignments.py), still respecting is_active
     courses = Course.objects.filter(
-        id__in=assigned_course_ids,
+        effective_assignments__user=request.user,
         is_active=True
-    ).prefetch_related("modules").order_by("order")
+    ).order_by("order")
 
-    course_data = []
-
-    # 3. Progress calculation remains EXACTLY the same
-    for course in courses:
-        modules = course.modules.all()
-        total_modules = modules.count() or 1
-        completed_modules = 0
-
-        for module in modules:
-            mp = ModuleProgress.objects.filter(
-                user=request.user,
-                module=module
-            ).first()
-
-            if mp and mp.passed:
-                completed_modules += 1
-
-        progress_percent = int((completed_modules / total_modules) * 100)
-
-        course_data.append({
-            "course": course,
-            "progress_percent": progress_percent,
-            "completed_modules": completed_modules,
-            "total_modules": total_modules,
-        })
+    # 3. Passed/total module counts for every course in one aggregate query
+    course_data = build_course_rows(request.user, courses)
 
     return render(request, "academy/dashboard.html", {
         "course_data": course_data,
@@ -217,21 +147,15 @@ def course_detail(request, course_slug):
     Show all modules in a course, with lock/unlock and basic status.
     """
     course = get_object_or_404(Course, slug=course_slug, is_active=True)
-    modules = course.modules.all()
+    unlock_map = get_unlock_map(request, course)
 
     module_rows = []
-    for module in modules:
-        module_progress = ModuleProgress.objects.filter(
-            user=request.user,
-            module=module,
-        ).first()
-        can_access = _can_access_module(request.user, module)
-
+    for module in unlock_map.modules:
         module_rows.append(
             {
                 "module": module,
-                "progress": module_progress,
-                "can_access": can_access,
+                "progress": unlock_map.progress_for(module),
+                "can_access": unlock_map.can_access(module),
             }
         )
 
@@ -251,27 +175,29 @@ def module_detail(request, course_slug, module_slug):
     module = get_object_or_404(course.modules, slug=module_slug)
 
     # Check if user is allowed to access this module
-    if not _can_access_module(request.user, module):
+    if not get_unlock_map(request, course).can_access(module):
         messages.warning(request, "Please complete the previous modules first.")
         return redirect("academy_course_detail", course_slug=course.slug)
 
-    # Get or create module progress record
-    module_progress = _get_module_progress(request.user, module)
+    # Read-only: progress is recalculated when lessons are completed, added or removed
+    module_progress = get_unlock_map(request, course).progress_for(module)
 
-    lessons = module.lessons.all()
+    lessons = list(module.lessons.all())
+    lesson_progress = {
+        lp.lesson_id: lp
+        for lp in LessonProgress.objects.filter(user=request.user, lesson__module=module)
+    }
 
-    lesson_rows = []
-    for lesson in lessons:
-        lp = LessonProgress.objects.filter(user=request.user, lesson=lesson).first()
-        lesson_rows.append(
-            {
-                "lesson": lesson,
-                "progress": lp,
-            }
-        )
+    lesson_rows = [
+        {
+            "lesson": lesson,
+            "progress": lesson_progress.get(lesson.id),
+        }
+        for lesson in lessons
+    ]
 
     # Calculate % of lessons completed for display
-    total_lessons = lessons.count() or 1
+    total_lessons = len(lessons) or 1
     completed_lessons = sum(
         1
         for row in lesson_rows
@@ -279,8 +205,10 @@ def module_detail(request, course_slug, module_slug):
     )
     lesson_progress_percent = int((completed_lessons / total_lessons) * 100)
 
-    # Update module_progress (score + status) based on lessons
-    module_progress = _update_module_progress_from_lessons(request.user, module)
+    # A module without lessons counts as completed as soon as it's opened
+    if not lessons and (module_progress is None or module_progress.status != "completed"):
+        sync_module_progress_from_lessons(request.user, module)
+        module_progress = ModuleProgress.objects.filter(user=request.user, module=module).first()
 
     context = {
         "course": course,
@@ -304,7 +232,7 @@ def module_quiz(request, course_slug, module_slug):
     module = get_object_or_404(course.modules, slug=module_slug)
 
     # Respect module locking rules
-    if not _can_access_module(request.user, module):
+    if not get_unlock_map(request, course).can_access(module):
         messages.warning(request, "Please complete the previous modules first.")
         return redirect("academy_course_detail", course_slug=course.slug)
 
@@ -331,23 +259,24 @@ def module_quiz(request, course_slug, module_slug):
         }
         return render(request, "academy/module_quiz.html", context)
 
-    # POST – mark answers
-    total_questions = questions.count()
+    # POST – mark answers against the cached answer key (no per-question queries)
+    answer_key = get_answer_key(module)
+    question_list = list(questions)
+    total_questions = len(question_list)
     correct_count = 0
     answers_marked = []
 
-    for question in questions:
+    for question in question_list:
         field_name = f"question_{question.id}"
-        choice_id = request.POST.get(field_name)
+        choice_id, is_correct = mark_answer(
+            answer_key, question.id, request.POST.get(field_name)
+        )
         selected_choice = None
-        is_correct = False
-
-        if choice_id:
-            try:
-                selected_choice = Choice.objects.get(id=choice_id, question=question)
-                is_correct = selected_choice.is_correct
-            except Choice.DoesNotExist:
-                selected_choice = None
+        if choice_id is not None:
+            # Already loaded by prefetch_related("choices")
+            selected_choice = next(
+                (c for c in question.choices.all() if c.id == choice_id), None
+            )
 
         if is_correct:
             correct_count += 1
@@ -378,7 +307,9 @@ def module_quiz(request, course_slug, module_slug):
             module_progress.status = "in_progress"
         passed = False
 
-    module_progress.save()
+    with transaction.atomic():
+        module_progress.save()
+        refresh_course_progress(request.user, course.id)
 
     # If this is the final assessment module and they passed, issue certificate
     # Adjust slug string to whatever you used in admin
@@ -401,21 +332,23 @@ def module_quiz(request, course_slug, module_slug):
 def academy_complete_lesson(request, lesson_id):
     lesson = get_object_or_404(Lesson, id=lesson_id)
 
-    # Get or create progress record
-    progress, created = LessonProgress.objects.get_or_create(
-        user=request.user,
-        lesson=lesson,
-    )
+    module = lesson.module
 
-    # Mark as complete
-    progress.completed = True
-    if progress.completed_at is None:
-        progress.completed_at = timezone.now()
-    progress.save()
+    with transaction.atomic():
+        # Get or create progress record
+        progress, created = LessonProgress.objects.get_or_create(
+            user=request.user,
+            lesson=lesson,
+        )
 
-    # Update module progress now that this lesson is complete
-    module = lesson.module
-    _update_module_progress_from_lessons(request.user, module)
+        # Mark as complete
+        progress.completed = True
+        if progress.completed_at is None:
+            progress.completed_at = timezone.now()
+        progress.save()
+
+        # Update module (and course rollup) progress now that this lesson is complete
+        sync_module_progress_from_lessons(request.user, module)
 
     # Always go back to the module page after completion
     return redirect(
@@ -473,13 +406,15 @@ def final_test(request, course_slug, module_slug):
     module = get_object_or_404(course.modules, slug=module_slug)
 
     # Optional: only allow final test if previous mandatory modules are passed
-    if not _can_access_module(request.user, module):
+    if not get_unlock_map(request, course).can_access(module):
         messages.warning(request, "Please complete the previous modules first.")
         return redirect("academy_course_detail", course_slug=course.slug)
 
-    questions = module.questions.prefetch_related("choices").all()
+    # Questions and choices come from the cached answer key, so marking a
+    # submission costs no per-question queries
+    answer_key = get_answer_key(module)
 
-    if not questions:
+    if not answer_key["questions"]:
         messages.error(request, "Final test questions have not been set up yet.")
         return redirect(
             "academy_module_detail",
@@ -488,110 +423,18 @@ def final_test(request, course_slug, module_slug):
         )
 
     if request.method == "POST":
-        answers = []
-        total_questions = questions.count()
-        correct_count = 0
-
-        for q in questions:
-            field_name = f"question_{q.id}"
-            selected_choice_id = request.POST.get(field_name)
-            selected_choice = None
-            selected_choice_text = None
-
-            if selected_choice_id:
-                selected_choice = q.choices.filter(id=selected_choice_id).first()
-                if selected_choice:
-                    selected_choice_text = selected_choice.text
-
-            # Find the correct choice for this question
-            correct_choice = q.choices.filter(is_correct=True).first()
-            correct_choice_text = correct_choice.text if correct_choice else None
-
-            # Mark correctness
-            is_correct = (
-                selected_choice is not None
-                and correct_choice is not None
-                and selected_choice.id == correct_choice.id
-            )
-            if is_correct:
-                correct_count += 1
-
-            answers.append(
-                {
-                    "question_id": q.id,
-                    "question_text": q.text,
-                    "selected_choice_id": selected_choice.id if selected_choice else None,
-                    "selected_choice_text": selected_choice_text,
-                    "correct_choice_text": correct_choice_text,
-                    "is_correct": is_correct,
-                    "explanation": q.explanation,
-                }
-            )
-
-        # Save submission (now with marked answers + explanations)
-        submission = FinalTestSubmission.objects.create(
-            user=request.user,
-            module=module,
-            answers=answers,
-        )
-
-        # Calculate score as a percentage
-        score_percent = int((correct_count / total_questions) * 100) if total_questions > 0 else 0
-
-        # Email all superusers
-        User = get_user_model()
-        superuser_emails = list(
-            User.objects.filter(is_superuser=True, is_active=True)
-            .exclude(email__isnull=True)
-            .exclude(email__exact="")
-            .values_list("email", flat=True)
-        )
+        answers, correct_count = mark_final_test(answer_key, request.POST)
 
-        if superuser_emails:
-            subject = (
-                f"[Cozy Academy] Final test submitted: "
-                f"{request.user} – {course.title} ({score_percent}%)"
+        with transaction.atomic():
+            # Save submission (now with marked answers + explanations)
+            submission = FinalTestSubmission.objects.create(
+                user=request.user,
+                module=module,
+                answers=answers,
             )
 
-            body_lines = [
-                f"User: {request.user} (ID: {request.user.id})",
-                f"Course: {course.title}",
-                f"Module: {module.title}",
-                f"Submitted at: {submission.submitted_at}",
-                f"Score: {correct_count} / {total_questions} ({score_percent}%)",
-                "",
-                "Answers:",
-            ]
-
-            for a in answers:
-                body_lines.append("")
-                body_lines.append(f"Q: {a['question_text']}")
-                if a["selected_choice_text"]:
-                    body_lines.append(f"Selected: {a['selected_choice_text']}")
-                else:
-                    body_lines.append("Selected: (no answer selected)")
-
-                if a["correct_choice_text"]:
-                    body_lines.append(f"Correct: {a['correct_choice_text']}")
-                else:
-                    body_lines.append("Correct: (no correct choice set)")
-
-                body_lines.append(
-                    f"Marked: {'CORRECT' if a['is_correct'] else 'INCORRECT'}"
-                )
-
-                if a["explanation"]:
-                    body_lines.append(f"Explanation: {a['explanation']}")
-
-            body = "\n".join(body_lines)
-
-            send_mail(
-                subject=subject,
-                message=body,
-                from_email=None,  # uses DEFAULT_FROM_EMAIL
-                recipient_list=superuser_emails,
-                fail_silently=True,
-            )
+            # Superusers are emailed the marked answers by the background worker
+            enqueue("academy.final_test_submitted", {"submission_id": submission.id})
 
         messages.success(
             request,
@@ -608,7 +451,7 @@ def final_test(request, course_slug, module_slug):
     context = {
         "course": course,
         "module": module,
-        "questions": questions,
+        "questions": module.questions.prefetch_related("choices"),
     }
     return render(request, "academy/final_test.html", context)
 
@@ -622,22 +465,6 @@ def manager_dashboard(request):
     return render(request, "academy/manager/dashboard.html")
 
 
-@superuser_required
-def manager_final_tests(request):
-    submissions = FinalTestSubmission.objects.all().order_by('-submitted_at')
-    return render(request, "academy/manager/final_tests.html", {
-        "submissions": submissions
-    })
-
-
-@superuser_required
-def manager_driver_progress(request):
-    progress = ModuleProgress.objects.select_related("user", "module").all()
-    return render(request, "academy/manager/driver_progress.html", {
-        "progress": progress
-    })
-
-
 @superuser_required
 def manager_documents(request):
     return render(request, "academy/manager/documents.html")
@@ -652,118 +479,123 @@ def manager_tools(request):
 @user_passes_test(lambda u: u.is_superuser or Certificate.objects.filter(user=u).exists())
 def generate_certificate_pdf(request, certificate_id):
     """
-    Generate a stylish landscape certificate PDF with Cozy branding.
-    """
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.lib.utils import ImageReader
-    from reportlab.pdfgen import canvas
-    from django.templatetags.static import static
+    Serve the certificate PDF (Cozy-branded landscape layout).
 
-    certificate = get_object_or_404(Certificate, id=certificate_id)
-    user = certificate.user
-    course = certificate.course
-    module = certificate.module
+    The PDF is rendered once and stored in media under its content hash;
+    it's only re-rendered when LAYOUT_VERSION changes. Responses carry an
+    ETag/Last-Modified so reprints can be answered with 304 Not Modified.
+    """
+    certificate = get_object_or_404(
+        Certificate.objects.select_related("user", "course", "module"),
+        id=certificate_id,
+    )
 
     # Only owner or superuser can access
-    if not (request.user.is_superuser or request.user == user):
+    if not (request.user.is_superuser or request.user == certificate.user):
         return HttpResponseForbidden("You do not have permission to view this certificate.")
 
-    # Landscape page setup
-    page_width, page_height = landscape(A4)
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="Cozy_Certificate_{certificate.id}.pdf"'
-
-    # Initialize canvas
-    p = canvas.Canvas(response, pagesize=landscape(A4))
-    margin = 50
-
-    # Colors
-    burgundy = colors.HexColor("#800020")
-    gray = colors.HexColor("#444444")
-
-    # Background border
-    p.setStrokeColor(burgundy)
-    p.setLineWidth(4)
-    p.rect(margin / 2, margin / 2, page_width - margin, page_height - margin, stroke=1, fill=0)
-
-    # Logo (top-left)
-    logo_path = os.path.join(settings.BASE_DIR, "static", "css", "media", "LOGO-Cozys.webp")
-    logo = ImageReader(logo_path)
-    p.drawImage(
-        logo,
-        x=margin,
-        y=page_height - 130,
-        width=180,
-        height=80,
-        mask="auto",
-        preserveAspectRatio=True,
-    )
+    ensure_certificate_pdf(certificate)
 
-        # Title
-    p.setFont("Helvetica-Bold", 32)
-    p.setFillColor(burgundy)
-    p.drawCentredString(page_width / 2, page_height - 200, "Certificate of Completion")
-
-    # Subtitle line
-    p.setStrokeColor(gray)
-    p.line(page_width / 4, page_height - 210, page_width * 3 / 4, page_height - 210)
-
-    # Recipient
-    p.setFillColor(gray)
-    p.setFont("Helvetica", 16)
-    p.drawCentredString(page_width / 2, page_height - 270, "This certifies that")
-
-    p.setFont("Helvetica-Bold", 26)
-    p.setFillColor(burgundy)
-    name_text = user.get_full_name() or user.username
-    p.drawCentredString(page_width / 2, page_height - 305, name_text)
-
-    p.setFillColor(gray)
-    p.setFont("Helvetica", 15)
-    p.drawCentredString(page_width / 2, page_height - 335, "has successfully completed")
-
-    # Course + module info
-    p.setFont("Helvetica-Bold", 20)
-    p.setFillColor(burgundy)
-    p.drawCentredString(page_width / 2, page_height - 370, course.title)
-
-    p.setFont("Helvetica", 13)
-    p.setFillColor(gray)
-    p.drawCentredString(page_width / 2, page_height - 395, f"Module: {module.title}")
-    p.drawCentredString(page_width / 2, page_height - 415, f"Score Achieved: {certificate.score}%")
-
-    # Issue details
-    p.setFont("Helvetica-Oblique", 11)
-    p.setFillColor(gray)
-    p.drawCentredString(page_width / 2, margin + 80, f"Issued on {certificate.issued_at.strftime('%d %B %Y')}")
-    p.drawCentredString(page_width / 2, margin + 60, f"Certificate No: {certificate.certificate_number}")
-
-    # Footer
-    p.setFont("Helvetica", 10)
-    p.setFillColor(burgundy)
-    p.drawCentredString(page_width / 2, margin + 35, "Cozy Coaches – Driver Academy")
-    p.setFillColor(gray)
-    p.drawCentredString(page_width / 2, margin + 20, "© Cozy Coaches Ltd. All rights reserved")
-
-    # Save and return
-    p.showPage()
-    p.save()
-    return response
+    etag = f'"{certificate.pdf_sha256}"'
+    last_modified = int(certificate.pdf_rendered_at.timestamp())
 
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
 
+    response = FileResponse(
+        certificate.pdf_file.open("rb"),
+        content_type="application/pdf",
+        filename=f"Cozy_Certificate_{certificate.id}.pdf",
+    )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def manager_certificates(request):
     """View for superusers to manage and review certificates"""
-    certificates = Certificate.objects.all().order_by("-issued_at")
+    certificates = (
+        Certificate.objects
+        .select_related("user", "course", "module")
+        .order_by("-issued_at")
+    )
     return render(request, "academy/manager/certificates.html", {
         "certificates": certificates,
+        "export_form": CertificateExportForm(),
     })
 
 
+@superuser_required
+def manager_certificates_export(request):
+    """
+    Download every certificate matching the filters as a ZIP of PDFs, as
+    one merged PDF, or as a CSV/XLSX register. PDFs that aren't stored yet
+    are queued for the job worker and the manager is asked to come back.
+    """
+    form = CertificateExportForm(request.GET)
+    if not form.is_valid():
+        for error in form.non_field_errors():
+            messages.error(request, error)
+        if not form.non_field_errors():
+            messages.error(request, "Please check the export filters.")
+        return redirect("academy_manager_certificates")
+
+    filters = {
+        key: form.cleaned_data[key]
+        for key in ("course", "module", "date_from", "date_to", "group")
+    }
+    export_format = form.cleaned_data["format"]
+    if export_format in EXPORT_FORMATS:
+        return _export_response(certificate_report(filters), export_format, "Cozy_Certificates_Report")
+
+    certificates = list(filter_certificates(**filters))
+    if not certificates:
+        messages.info(request, "No certificates match those filters.")
+        return redirect("academy_manager_certificates")
+
+    stamp = timezone.now().strftime("%Y%m%d-%H%M")
+
+    # Rendering happens in the job worker; this view only serves stored files
+    if export_format == "pdf":
+        name = merged_pdf_name(certificates)
+        if default_storage.exists(name):
+            return FileResponse(
+                default_storage.open(name, "rb"),
+                as_attachment=True,
+                filename=f"Cozy_Certificates_{stamp}.pdf",
+                content_type="application/pdf",
+            )
+        enqueue("academy.merge_certificates", {
+            "certificate_ids": [certificate.id for certificate in certificates],
+        })
+        messages.info(
+            request,
+            f"The merged PDF of {len(certificates)} certificates is being prepared. "
+            "Run the same export again in a few minutes to download it.",
+        )
+        return redirect("academy_manager_certificates")
+
+    missing = queue_missing_pdfs(certificates)
+    if missing:
+        messages.info(
+            request,
+            f"{missing} of {len(certificates)} certificate PDFs are being rendered. "
+            "Run the same export again in a few minutes to download them.",
+        )
+        return redirect("academy_manager_certificates")
+
+    response = StreamingHttpResponse(
+        export_certificates_zip(certificates),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = f'attachment; filename="Cozy_Certificates_{stamp}.zip"'
+    return response
+
+
 @superuser_required
 def manager_documents(request):
     if request.method == "POST" and request.FILES.get("document"):
@@ -778,40 +610,55 @@ def manager_documents(request):
     return render(request, "academy/manager/documents.html", {"documents": documents})
 
 
+def _final_tests_filters(request):
+    return {
+        "status": request.GET.get("status", ""),
+        "module": _int_or_none(request.GET.get("module")),
+    }
+
+
 @superuser_required
 def manager_final_tests(request):
-    submissions = (
-        FinalTestSubmission.objects
-        .select_related("user", "module")
-        .all()
-        .order_by("-submitted_at")
-    )
-
-    # Attach summary stats to each submission instance
-    for s in submissions:
-        answers = s.answers or []
-        total = len(answers)
-        correct = sum(1 for a in answers if a.get("is_correct"))
-        incorrect = total - correct
+    """
+    Final test submissions, newest first, a keyset page at a time.
 
-        if total > 0:
-            score_percent = int((correct / total) * 100)
-        else:
-            score_percent = 0
+    Scores are read from the stored columns and the certificate link comes
+    from a subquery, so the page is one query however many rows it shows.
+    """
+    filters = _final_tests_filters(request)
+    page = final_tests_page(
+        filters,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
 
-        # Add attributes for the template to use
-        s.total_questions = total
-        s.correct_count = correct
-        s.incorrect_count = incorrect
-        s.score_percent = score_percent
+    query = request.GET.copy()
+    query.pop("after", None)
+    query.pop("before", None)
 
     return render(
         request,
         "academy/manager/final_tests.html",
-        {"submissions": submissions},
+        {
+            "submissions": page["items"],
+            "page": page,
+            "filters": filters,
+            "query": query.urlencode(),
+            "modules": Module.objects.select_related("course").order_by("course__order", "order"),
+        },
     )
 
 
+@superuser_required
+def manager_final_tests_export(request, export_format):
+    """
+    Final test results as CSV/XLSX. Accepts ?status=reviewed|pending and ?module=<id>.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format.")
+    return _export_response(final_test_report(_final_tests_filters(request)), export_format, "Cozy_Final_Tests")
+
+
 @superuser_required
 def manager_mark_pass(request, submission_id):
     """Mark a final test submission as passed, update progress, and generate certificate."""
@@ -820,40 +667,32 @@ def manager_mark_pass(request, submission_id):
     if request.method != "POST":
         return redirect("academy_manager_final_tests")
 
-    submission.reviewed = True
-    submission.is_passed = True
-    submission.reviewed_by = request.user
-    submission.reviewed_at = timezone.now()
-    submission.save()
-
-    # Update module progress
-    mp, _ = ModuleProgress.objects.get_or_create(
-        user=submission.user,
-        module=submission.module,
-        defaults={"status": "completed", "score": 100},
-    )
-    mp.status = "completed"
-    mp.score = max(mp.score, 100)
-    now = timezone.now()
-    mp.completed_at = mp.completed_at or now
-    mp.last_attempt_at = now
-    mp.save()
-
-    # 🟡 CREATE CERTIFICATE IF NONE EXISTS
-    course = submission.module.course
-    user = submission.user
-    existing = Certificate.objects.filter(user=user, module=submission.module).first()
+    with transaction.atomic():
+        submission.reviewed = True
+        submission.is_passed = True
+        submission.reviewed_by = request.user
+        submission.reviewed_at = timezone.now()
+        submission.save()
 
-    if not existing:
-        cert_number = f"COZY-{course.id}-{submission.module.id}-{user.id}-{int(now.timestamp())}"
-        Certificate.objects.create(
-            user=user,
-            course=course,
+        # Update module progress
+        mp, _ = ModuleProgress.objects.get_or_create(
+            user=submission.user,
             module=submission.module,
-            score=mp.score,
-            certificate_number=cert_number,
+            defaults={"status": "completed", "score": 100},
         )
+        mp.status = "completed"
+        mp.score = max(mp.score, 100)
+        now = timezone.now()
+        mp.completed_at = mp.completed_at or now
+        mp.last_attempt_at = now
+        mp.save()
+        refresh_course_progress(submission.user, submission.module.course_id)
+
+    # 🟡 CREATE CERTIFICATE IF NONE EXISTS
+    user = submission.user
+    _, created = issue_certificate(user, submission.module, mp.score)
 
+    if created:
         # Optional: notify admins
         messages.success(
             request,
@@ -869,14 +708,26 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+MANAGER_USERS_PER_PAGE = 50
+
+
+def _manager_users_next(request):
+    """
+    Where to send the manager after a user action: back to the list page
+    (with its search and page) they came from, if it's a local URL.
+    """
+    next_url = request.POST.get("next") or request.GET.get("next")
+    if next_url and url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        return next_url
+    return reverse("academy_manager_users")
+
+
 @superuser_required
 def manager_users(request):
     """Full CRUD management for users by superusers, including username editing + course assignment."""
-    from .models import Course, CourseAssignment
-
     User = get_user_model()
-    users = User.objects.all().order_by("username")
-    courses = Course.objects.all().order_by("title")
 
     if request.method == "POST":
         action = request.POST.get("action")
@@ -960,12 +811,108 @@ def manager_users(request):
             else:
                 messages.error(request, "Please select a course before assigning.")
 
-        return redirect("academy_manager_users")
+        # Remove a course assignment
+        elif action == "unassign_course":
+            assignment = get_object_or_404(
+                CourseAssignment.objects.select_related("user", "course"),
+                id=request.POST.get("assignment_id"),
+                user__isnull=False,
+            )
+            assignment.delete()
+            messages.info(request, f"{assignment.user.username} unassigned from {assignment.course.title}.")
+
+        return redirect(_manager_users_next(request))
+
+    query = request.GET.get("q", "").strip()
+    users = User.objects.order_by("username").prefetch_related(
+        Prefetch(
+            "effective_assignments",
+            queryset=EffectiveAssignment.objects.select_related("course").order_by("course__title"),
+        )
+    )
+    if query:
+        users = users.filter(
+            Q(username__icontains=query)
+            | Q(email__icontains=query)
+            | Q(first_name__icontains=query)
+            | Q(last_name__icontains=query)
+        )
+
+    page = Paginator(users, MANAGER_USERS_PER_PAGE).get_page(request.GET.get("page"))
 
-    # Context now includes courses for the assignment UI
     return render(request, "academy/manager/users.html", {
-        "users": users,
-        "courses": courses,
+        "users": page.object_list,
+        "page": page,
+        "query": query,
+    })
+
+
+@superuser_required
+def manager_users_import(request):
+    """
+    Bulk-create drivers from a CSV of username,email,password,group,courses.
+    Every row is checked first; nothing is created while there are errors
+    unless the manager chooses to skip the invalid rows.
+    """
+    form = DriverImportForm(request.POST or None, request.FILES or None)
+    errors = []
+    created = None
+
+    if request.method == "POST" and form.is_valid():
+        upload = form.cleaned_data["csv_file"]
+        try:
+            rows = read_driver_csv(upload.file)
+        except (ValueError, UnicodeDecodeError, csv.Error) as exc:
+            messages.error(request, f"Could not read the CSV: {exc}")
+        else:
+            valid, errors = validate_driver_rows(rows)
+            if not rows:
+                messages.warning(request, "The CSV has no rows to import.")
+            elif errors and not form.cleaned_data["skip_invalid"]:
+                messages.error(
+                    request,
+                    f"{len({line for line, _ in errors})} row(s) have errors, so nothing was imported.",
+                )
+            else:
+                # No process pool in a web worker: hash here, at the import cost
+                created = import_drivers(valid, workers=1, hasher=IMPORT_HASHER)
+                messages.success(request, f"Imported {created} driver(s).")
+                if not errors:
+                    return redirect("academy_manager_users")
+
+    return render(request, "academy/manager/users_import.html", {
+        "form": form,
+        "errors": errors,
+        "created": created,
+    })
+
+
+@superuser_required
+def manager_user_panel(request, user_id):
+    """
+    The per-user management panel, as an HTML fragment loaded into the
+    offcanvas on the users page when it's opened.
+    """
+    target_user = get_object_or_404(get_user_model(), id=user_id)
+    assignments = (
+        CourseAssignment.objects
+        .filter(user=target_user)
+        .select_related("course")
+        .order_by("course__title")
+    )
+    # Courses that come only through the user's groups can't be removed here
+    group_courses = (
+        Course.objects
+        .filter(effective_assignments__user=target_user)
+        .exclude(courseassignment__user=target_user)
+        .order_by("title")
+    )
+    return render(request, "academy/manager/user_panel.html", {
+        "managed_user": target_user,
+        "assignments": assignments,
+        "group_courses": group_courses,
+        "courses": Course.objects.order_by("title"),
+        "next": _manager_users_next(request),
     })
 
 
@@ -1126,13 +1073,14 @@ def add_module(request, course_id):
             messages.error(request, "Module title is required.")
             return redirect("academy_add_module", course_id=course.id)
 
-        Module.objects.create(
+        module = Module(
             course=course,
             title=title,
             description=description,
             order=order,
-            slug=title.lower().strip().replace(" ", "-")
         )
+        # Slugs are unique per course: "Safety" again becomes "safety-2"
+        save_with_unique_slug(module, title, scope=course.modules.all(), fallback="module")
 
         messages.success(request, f"Module '{title}' created successfully.")
         return redirect("academy_manage_modules", course_id=course.id)
@@ -1182,42 +1130,85 @@ def add_lesson(request, module_id):
     )
 
 
-@superuser_required
-def manager_driver_progress(request):
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
-    users = User.objects.filter(is_superuser=False).order_by("username")
-    modules = Module.objects.all().order_by("course__order", "order")
 
-    display_rows = []
+def _driver_progress_filters(request):
+    """
+    Filters for the driver progress matrix (and its exports) from the query string.
+    """
+    return {
+        "driver": request.GET.get("driver", "").strip(),
+        "course": _int_or_none(request.GET.get("course")),
+        "module": _int_or_none(request.GET.get("module")),
+        "status": request.GET.get("status", ""),
+    }
 
-    for user in users:
-        for module in modules:
-            mp = ModuleProgress.objects.filter(user=user, module=module).first()
 
-            if mp:
-                status = mp.status
-                score = mp.score
-                completed_at = mp.completed_at
-            else:
-                status = "not_started"
-                score = None
-                completed_at = None
+def _export_response(report, export_format, basename):
+    """
+    Stream a (header, rows) report as a CSV or XLSX download.
+    """
+    header, rows = report
+    stamp = timezone.now().strftime("%Y%m%d-%H%M")
+    response = StreamingHttpResponse(
+        EXPORT_WRITERS[export_format](header, rows),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{basename}_{stamp}.{export_format}"'
+    return response
 
-            display_rows.append({
-                "user": user,
-                "module": module,
-                "score": score,
-                "status": status,
-                "completed_at": completed_at,
-            })
+
+@superuser_required
+def manager_driver_progress(request):
+    """
+    Every driver × module cell, built by one LEFT JOIN query per page, with
+    server-side filtering, sorting and pagination.
+    """
+    filters = _driver_progress_filters(request)
+    sort = request.GET.get("sort", "driver")
+    page = driver_progress_page(
+        filters,
+        sort=sort,
+        page=_int_or_none(request.GET.get("page")) or 1,
+    )
+
+    # Query strings for the pagination and column-sort links
+    query = request.GET.copy()
+    query.pop("page", None)
+    query_without_sort = query.copy()
+    query_without_sort.pop("sort", None)
 
     return render(request, "academy/manager/driver_progress_all.html", {
-        "rows": display_rows
+        "rows": page["rows"],
+        "page": page,
+        "filters": filters,
+        "sort": sort,
+        "query": query.urlencode(),
+        "query_without_sort": query_without_sort.urlencode(),
+        "courses": Course.objects.order_by("order", "title"),
+        "modules": Module.objects.select_related("course").order_by("course__order", "order"),
+        "statuses": ModuleProgress.STATUS_CHOICES,
     })
 
 
+@superuser_required
+def manager_driver_progress_export(request, export_format):
+    """
+    The full driver progress matrix (same filters and sort as the page) as CSV/XLSX.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format.")
+    report = driver_progress_report(
+        _driver_progress_filters(request),
+        sort=request.GET.get("sort", "driver"),
+    )
+    return _export_response(report, export_format, "Cozy_Driver_Progress")
+
 
 @login_required
 def update_choice(request, choice_id):
@@ -1265,146 +1256,156 @@ def add_choice(request, question_id):
     return HttpResponse(status=405)
 
 
+MANAGE_QUESTIONS_PER_PAGE = 50
+
+
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def manage_questions(request):
-    questions = Question.objects.all().order_by("id")
+    """
+    Questions by course/module, or full-text search results across
+    questions, choices and lessons when ?q= is given. Paginated.
+    """
+    query = request.GET.get("q", "").strip()
+    course = Course.objects.filter(id=_int_or_none(request.GET.get("course"))).first()
+    module = Module.objects.filter(id=_int_or_none(request.GET.get("module"))).first()
+
+    if query:
+        results = search_documents(query, course=course, module=module, kind=request.GET.get("kind") or None)
+    else:
+        results = Question.objects.select_related("module__course").order_by(
+            "module__course__order", "module__order", "order", "id"
+        )
+        if module is not None:
+            results = results.filter(module=module)
+        elif course is not None:
+            results = results.filter(module__course=course)
+
+    page = Paginator(results, MANAGE_QUESTIONS_PER_PAGE).get_page(request.GET.get("page"))
+
+    filters = request.GET.copy()
+    filters.pop("page", None)
+
     return render(request, "academy/manager/manage_questions.html", {
-        "questions": questions,
+        "page": page,
+        "query": query,
+        "selected_course": course,
+        "selected_module": module,
+        "kind": request.GET.get("kind", ""),
+        "filters": filters.urlencode(),
+        "courses": Course.objects.order_by("order", "title"),
+        "modules": Module.objects.select_related("course").order_by("course__order", "order"),
+    })
+
+
+@superuser_required
+def manager_question_analytics(request):
+    """
+    Final test analytics for a course or module: the hardest questions with
+    how their answers were spread, and the daily pass rate. Reads only the
+    stats tables kept up to date by academy.analytics.
+    """
+    course = Course.objects.filter(id=_int_or_none(request.GET.get("course"))).first()
+    module = Module.objects.filter(id=_int_or_none(request.GET.get("module"))).first()
+    min_attempts = max(_int_or_none(request.GET.get("min_attempts")) or 1, 1)
+
+    return render(request, "academy/manager/question_analytics.html", {
+        "questions": hardest_questions(course=course, module=module, min_attempts=min_attempts),
+        "trend": pass_rate_trend(course=course, module=module),
+        "trend_days": TREND_DAYS,
+        "min_attempts": min_attempts,
+        "selected_course": course,
+        "selected_module": module,
+        "courses": Course.objects.order_by("order", "title"),
+        "modules": Module.objects.select_related("course").order_by("course__order", "order"),
     })
 
 
+@superuser_required
+def export_questions(request):
+    """
+    Download a module's or course's questions (or the whole bank) as JSON
+    in the custom format import_questions accepts.
+    """
+    course = module = None
+    if request.GET.get("module"):
+        module = get_object_or_404(Module.objects.select_related("course"), id=_int_or_none(request.GET["module"]))
+    elif request.GET.get("course"):
+        course = get_object_or_404(Course, id=_int_or_none(request.GET["course"]))
+
+    if module is not None:
+        name = f"{module.course.slug}_{module.slug}"
+    elif course is not None:
+        name = course.slug
+    else:
+        name = "all"
+
+    response = StreamingHttpResponse(
+        stream_question_bank(question_bank_entries(questions_for(course=course, module=module))),
+        content_type="application/json",
+    )
+    response["Content-Disposition"] = f'attachment; filename="questions_{name}.json"'
+    return response
+
+
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def import_questions(request):
+    """
+    Import a question bank (fixture or custom JSON format) into a module.
+
+    The whole import runs in one transaction. With "dry run" ticked the
+    file is only checked and the report shows what would be imported.
+    """
+    report = None
+
     if request.method == "POST":
         module_id = request.POST.get("module_id")
         delete_existing = request.POST.get("delete_existing") == "on"
+        dry_run = request.POST.get("dry_run") == "on"
         uploaded_file = request.FILES.get("json_file")
 
         if not uploaded_file:
             messages.error(request, "No JSON file uploaded.")
             return redirect("academy_import_questions")
 
-        # Load raw JSON
+        # Validate module from form
         try:
-            data = json.load(uploaded_file)
-        except json.JSONDecodeError:
-            messages.error(request, "Invalid JSON format.")
+            default_module = Module.objects.select_related("course").get(id=module_id)
+        except (Module.DoesNotExist, ValueError):
+            messages.error(request, "Module not found.")
             return redirect("academy_import_questions")
 
-        # Validate module from form
         try:
-            default_module = Module.objects.get(id=module_id)
-        except Module.DoesNotExist:
-            messages.error(request, "Module not found.")
+            plan = plan_import(iter_json_array(uploaded_file.file), default_module)
+        except (QuestionImportError, UnicodeDecodeError) as exc:
+            messages.error(request, f"Invalid JSON format. {exc}")
             return redirect("academy_import_questions")
 
-        # Delete existing questions if checkbox ticked
-        if delete_existing:
-            Question.objects.filter(module=default_module).delete()
-
-        created_q = 0
-        created_c = 0
-        skipped = 0
-
-        # ------------------------------------------------------------------
-        # DETECT FORMAT TYPE
-        # ------------------------------------------------------------------
-        fixture_format = False
-        if isinstance(data, list) and len(data) > 0:
-            first = data[0]
-            fixture_format = "model" in first and "fields" in first
-
-        # ------------------------------------------------------------------
-        # FORMAT A: Django fixture format
-        # ------------------------------------------------------------------
-        if fixture_format:
-            question_map = {}  # map pk → created Question object
-
-            for obj in data:
-                model = obj.get("model")
-                fields = obj.get("fields", {})
-
-                # Create Question
-                if model == "academy.question":
-                    module = default_module
-
-                    # If fixture specifies module override
-                    mod_id = fields.get("module")
-                    if mod_id:
-                        module = Module.objects.filter(id=mod_id).first() or module
-
-                    q = Question.objects.create(
-                        module=module,
-                        text=fields.get("text", ""),
-                        order=fields.get("order", 1),
-                        explanation=fields.get("explanation", "")
-                    )
-                    question_map[obj["pk"]] = q
-                    created_q += 1
-
-                # Create Choice
-                elif model == "academy.choice":
-                    q_pk = fields.get("question")
-                    question = question_map.get(q_pk)
-
-                    # If question doesn’t exist
-                    if not question:
-                        skipped += 1
-                        continue
-
-                    Choice.objects.create(
-                        question=question,
-                        text=fields.get("text", ""),
-                        is_correct=fields.get("is_correct", False)
-                    )
-                    created_c += 1
-
-        # ------------------------------------------------------------------
-        # FORMAT B: Clean custom JSON format
-        # ------------------------------------------------------------------
+        if dry_run:
+            messages.info(
+                request,
+                f"Dry run: {len(plan.questions)} questions and {plan.choice_count} choices "
+                f"would be imported. Nothing was saved.",
+            )
+            report = plan
         else:
-            for entry in data:
-                # Must contain text + choices
-                if "text" not in entry or "choices" not in entry:
-                    skipped += 1
-                    continue
-
-                # Module override by slug
-                module = default_module
-                slug = entry.get("module_slug")
-                if slug:
-                    module = Module.objects.filter(slug=slug).first() or default_module
-
-                q = Question.objects.create(
-                    module=module,
-                    text=entry["text"],
-                    order=entry.get("order", 1),
-                    explanation=entry.get("explanation", "")
-                )
-                created_q += 1
-
-                # Add choices
-                for ch in entry["choices"]:
-                    Choice.objects.create(
-                        question=q,
-                        text=ch["text"],
-                        is_correct=ch.get("is_correct", False)
-                    )
-                    created_c += 1
-
-        # ------------------------------------------------------------------
-
-        messages.success(
-            request,
-            f"Imported {created_q} questions and {created_c} choices. "
-            f"Skipped {skipped}."
-        )
-        return redirect("academy_import_questions")
+            created_q, created_c = run_import(plan, delete_existing=delete_existing)
+            messages.success(
+                request,
+                f"Imported {created_q} questions and {created_c} choices. "
+                f"Skipped or adjusted {len(plan.problems)}."
+            )
+            if not plan.problems:
+                return redirect("academy_import_questions")
+            report = plan
 
-    modules = Module.objects.all()
-    return render(request, "academy/manager/import_questions.html", {"modules": modules})
+    modules = Module.objects.select_related("course").order_by("course__order", "order")
+    return render(request, "academy/manager/import_questions.html", {
+        "modules": modules,
+        "courses": Course.objects.order_by("order", "title"),
+        "report": report,
+    })
 
 
 @superuser_required
@@ -1438,11 +1439,30 @@ def manager_assign(request):
 
     assignments = CourseAssignment.objects.select_related("user", "group", "course")
 
+    # Who is assigned what, groups resolved: learner counts per course, and
+    # the learners of the selected course
+    course_counts = courses.annotate(learners=Count("effective_assignments"))
+    selected_course = None
+    learners = None
+    course_id = _int_or_none(request.GET.get("course"))
+    if course_id:
+        selected_course = get_object_or_404(Course, id=course_id)
+        learners = Paginator(
+            EffectiveAssignment.objects
+            .filter(course=selected_course)
+            .select_related("user")
+            .order_by("user__username"),
+            MANAGER_USERS_PER_PAGE,
+        ).get_page(request.GET.get("page"))
+
     return render(request, "academy/manager/assign.html", {
         "users": users,
         "groups": groups,
         "courses": courses,
         "assignments": assignments,
+        "course_counts": course_counts,
+        "selected_course": selected_course,
+        "learners": learners,
     })
 
 
@@ -0,0 +1,76 @@
+# iota/pagination.py
+#
+# Keyset ("cursor") pagination for newest-first lists. Pages are found by
+# seeking past the last (field, id) pair seen instead of using OFFSET, so
+# deep pages cost the same as the first one and rows don't shift between
+# pages when new ones are added.
+
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat() if hasattr(value, 'isoformat') else value}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(model, field, cursor):
+    """
+    (value, pk) from a cursor, or None if it's missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit("|", 1)
+        value = model._meta.get_field(field).to_python(value)
+        return value, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, ValidationError):
+        return None
+
+
+def keyset_page(queryset, field, after=None, before=None, per_page=25):
+    """
+    One page of queryset ordered newest first on (field, id).
+
+    after: cursor of the last row of the previous page (walk to older rows).
+    before: cursor of the first row of the next page (walk back to newer rows).
+
+    Returns a dict with "items", "has_next"/"has_previous" and the
+    "next_cursor"/"previous_cursor" to put in the links.
+    """
+    model = queryset.model
+    after = decode_cursor(model, field, after)
+    before = None if after else decode_cursor(model, field, before)
+
+    if before:
+        value, pk = before
+        rows = list(
+            queryset
+            .filter(Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk}))
+            .order_by(field, "pk")[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after:
+            value, pk = after
+            queryset = queryset.filter(
+                Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk})
+            )
+        rows = list(queryset.order_by(f"-{field}", "-pk")[:per_page + 1])
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_previous = after is not None
+
+    return {
+        "items": items,
+        "has_next": has_next and bool(items),
+        "has_previous": has_previous and bool(items),
+        "next_cursor": encode_cursor(getattr(items[-1], field), items[-1].pk) if items else None,
+        "previous_cursor": encode_cursor(getattr(items[0], field), items[0].pk) if items else None,
+    }
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     "academy",
     "news",
     "shop",
+    "jobs",
 
     # third-party
     "django_ckeditor_5",
@@ -115,6 +116,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "news.context_processors.breaking_news",
             ],
         },
     },
@@ -138,8 +140,44 @@ DATABASES = {
 
 
 # -----------------------------------------------------------
-# PASSWORD VALIDATION
+# CACHE
 # -----------------------------------------------------------
+# "default" is shared by every web worker and the run_jobs worker: cached
+# news pages are retired by bumping a version number kept in it (see
+# news/caching.py), so a per-process cache would leave the other processes
+# serving stale pages. Create its table once per database with
+# `python manage.py createcachetable` (the test runner does this itself).
+#
+# "local" is per process, for small values read on every page (the
+# breaking news banner) that must not cost a query.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "iota_cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "iota-local",
+    },
+}
+
+
+# -----------------------------------------------------------
+# PASSWORD HASHING & VALIDATION
+# -----------------------------------------------------------
+
+# Django's defaults, plus the cheaper hasher the bulk driver import uses in
+# web requests. Those passwords are upgraded to the first hasher on login.
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "academy.hashers.ImportPBKDF2PasswordHasher",
+]
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -0,0 +1,73 @@
+# iota/slugs.py
+#
+# Unique slug allocation. Instead of trying "title", "title-2", "title-3"...
+# one query at a time, the taken slugs sharing the prefix are read in one
+# query and the next free suffix is worked out from them. Two saves racing
+# for the same slug are settled by the unique constraint: the loser's
+# insert fails inside a savepoint and it allocates again.
+
+import re
+
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+MAX_ATTEMPTS = 5
+
+
+def next_free_slug(queryset, base, field="slug", max_length=50):
+    """
+    base if nothing in queryset uses it, otherwise base-N with the lowest
+    free N from 2 up. base is shortened if base-N wouldn't fit in
+    max_length.
+    """
+    base = base[:max_length].strip("-")
+    while True:
+        taken = set(
+            queryset
+            .filter(**{f"{field}__startswith": base})
+            .values_list(field, flat=True)
+        )
+        if base not in taken:
+            return base
+
+        suffix = re.compile(rf"^{re.escape(base)}-(\d+)$")
+        numbers = {int(match.group(1)) for match in map(suffix.match, taken) if match}
+        number = 2
+        while number in numbers:
+            number += 1
+        candidate = f"{base}-{number}"
+        if len(candidate) <= max_length:
+            return candidate
+        # No room for the suffix: make room and look again
+        base = base[:max_length - (len(candidate) - len(base))].strip("-")
+
+
+def save_with_unique_slug(instance, text, *, field="slug", scope=None, fallback="item", save=None):
+    """
+    Give instance a unique slug made from text, then save it.
+
+    scope is the queryset the slug must be unique within (default: every
+    row of the model, e.g. pass course.modules.all() for per-course slugs).
+    save is called to do the actual save (default instance.save); it runs
+    in a savepoint and is retried with a fresh slug if another save took
+    the slug in the meantime.
+    """
+    model = type(instance)
+    max_length = model._meta.get_field(field).max_length
+    queryset = scope if scope is not None else model._default_manager.all()
+    if instance.pk is not None:
+        queryset = queryset.exclude(pk=instance.pk)
+
+    base = slugify(text) or fallback
+    save = save or instance.save
+
+    for attempt in range(MAX_ATTEMPTS):
+        slug = next_free_slug(queryset, base, field=field, max_length=max_length)
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            # Only a lost race for the slug is worth retrying
+            if attempt == MAX_ATTEMPTS - 1 or not queryset.filter(**{field: slug}).exists():
+                raise
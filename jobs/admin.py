@@ -0,0 +1,19 @@
+from django.contrib import admin, messages
+
+from .models import Job
+from .queue import retry_dead
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "status", "attempts", "max_attempts", "run_after", "created_at", "finished_at")
+    list_filter = ("status", "kind")
+    search_fields = ("kind", "last_error")
+    ordering = ("-created_at",)
+    readonly_fields = ("locked_at", "last_error", "created_at", "finished_at")
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Retry selected dead jobs")
+    def retry_jobs(self, request, queryset):
+        count = retry_dead(queryset)
+        messages.success(request, f"{count} job(s) re-queued.")
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        from . import mail  # noqa: F401  (registers the mail handlers)
+
+        # Each app registers its own job handlers in <app>/tasks.py
+        autodiscover_modules("tasks")
@@ -0,0 +1,49 @@
+# jobs/mail.py
+
+from django.core.mail import EmailMessage, mail_admins
+
+from .queue import enqueue, handler
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None):
+    """
+    Queue an email instead of sending it during the request.
+    Same arguments as django.core.mail.send_mail.
+    """
+    return enqueue(
+        "mail.send",
+        {
+            "subject": subject,
+            "message": message,
+            "from_email": from_email,
+            "recipient_list": list(recipient_list),
+        },
+    )
+
+
+def enqueue_mail_admins(subject, message):
+    """
+    Queue an email to settings.ADMINS (see django.core.mail.mail_admins).
+    """
+    return enqueue("mail.admins", {"subject": subject, "message": message})
+
+
+@handler("mail.send")
+def send_mail_job(payload, context):
+    email = EmailMessage(
+        subject=payload["subject"],
+        body=payload["message"],
+        from_email=payload.get("from_email"),  # None uses DEFAULT_FROM_EMAIL
+        to=payload["recipient_list"],
+        connection=context.mail_connection,
+    )
+    email.send()
+
+
+@handler("mail.admins")
+def mail_admins_job(payload, context):
+    mail_admins(
+        payload["subject"],
+        payload["message"],
+        connection=context.mail_connection,
+    )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import run_batch
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (emails etc.). Keeps polling unless --once/--until-empty is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+        parser.add_argument("--once", action="store_true", help="Run a single batch and exit.")
+        parser.add_argument(
+            "--until-empty",
+            action="store_true",
+            help="Keep running batches until nothing is runnable, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = run_batch(limit=options["batch_size"])
+            processed = sum(stats.values())
+
+            if processed:
+                self.stdout.write(
+                    f"Jobs: {stats['done']} done, {stats['retried']} retried, {stats['dead']} dead."
+                )
+
+            if options["once"] or (options["until_empty"] and not processed):
+                break
+
+            if not processed:
+                time.sleep(options["sleep"])
@@ -0,0 +1,206 @@
+# jobs/queue.py
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+# A job still "running" after this long belongs to a worker that died. Jobs
+# are claimed one at a time, so this only has to outlast the slowest job.
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+def handler(kind):
+    """
+    Register a function as the handler for a job kind:
+
+        @handler("mail.send")
+        def send(payload, context):
+            ...
+
+    Handlers raise to signal failure; the job is then retried or dead-lettered.
+    """
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, *, max_attempts=5, run_after=None):
+    """
+    Add a job to the queue.
+
+    The row is written in the caller's transaction, so a job is only ever
+    visible to workers if the work that produced it was committed.
+    """
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def backoff_delay(attempts):
+    """
+    Seconds to wait before retrying a job that has failed `attempts` times.
+    """
+    return min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), BACKOFF_MAX_SECONDS)
+
+
+class JobContext:
+    """
+    Resources shared by every job in a batch.
+
+    The SMTP connection is opened on first use and reused for the rest of the
+    batch, so a burst of emails costs one connection rather than one each.
+    """
+
+    def __init__(self):
+        self._mail_connection = None
+
+    @property
+    def mail_connection(self):
+        if self._mail_connection is None:
+            self._mail_connection = get_connection()
+            self._mail_connection.open()
+        return self._mail_connection
+
+    def reset_mail_connection(self):
+        # After a failure the connection may be unusable; reopen on next use
+        if self._mail_connection is not None:
+            try:
+                self._mail_connection.close()
+            except Exception:
+                pass
+            self._mail_connection = None
+
+    def close(self):
+        self.reset_mail_connection()
+
+
+def claim_next():
+    """
+    Lock the next runnable job for this worker and mark it running, or
+    return None when there is nothing to do.
+
+    Jobs are claimed one at a time, just before they run, so LOCK_TIMEOUT
+    only has to cover a single job rather than a whole batch.
+    """
+    now = timezone.now()
+    runnable = Q(status="pending", run_after__lte=now) | Q(
+        status="running", locked_at__lt=now - LOCK_TIMEOUT
+    )
+
+    with transaction.atomic():
+        jobs = Job.objects.filter(runnable).order_by("run_after", "id")
+        if connection.features.has_select_for_update:
+            jobs = jobs.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked
+            )
+        job = jobs.first()
+        if job is None:
+            return None
+
+        Job.objects.filter(pk=job.pk).update(status="running", locked_at=now)
+    job.status = "running"
+    job.locked_at = now
+    return job
+
+
+def _run_job(job, context):
+    func = HANDLERS.get(job.kind)
+    if func is None:
+        raise LookupError(f"No handler registered for job kind '{job.kind}'.")
+    func(job.payload, context)
+
+
+def _finish(job, claimed_at):
+    # Only the worker still holding the lock records the outcome: if the job
+    # outlived LOCK_TIMEOUT and was reclaimed, the new owner's run counts
+    updated = Job.objects.filter(pk=job.pk, status="running", locked_at=claimed_at).update(
+        status=job.status,
+        attempts=job.attempts,
+        run_after=job.run_after,
+        locked_at=job.locked_at,
+        last_error=job.last_error,
+        finished_at=job.finished_at,
+    )
+    if not updated:
+        logger.warning("Job %s (%s) was reclaimed by another worker while running.", job.pk, job.kind)
+    return bool(updated)
+
+
+def run_batch(limit=50):
+    """
+    Claim and run up to `limit` jobs, one at a time. Returns counts of
+    done/retried/dead jobs.
+    """
+    stats = {"done": 0, "retried": 0, "dead": 0}
+    context = None
+    try:
+        for _ in range(limit):
+            job = claim_next()
+            if job is None:
+                break
+            if context is None:
+                context = JobContext()
+
+            claimed_at = job.locked_at
+            job.attempts += 1
+            try:
+                _run_job(job, context)
+            except Exception as exc:
+                logger.warning("Job %s (%s) failed: %s", job.pk, job.kind, exc)
+                context.reset_mail_connection()
+                job.last_error = traceback.format_exc()
+                job.locked_at = None
+
+                if job.attempts >= job.max_attempts:
+                    job.status = "dead"
+                    job.finished_at = timezone.now()
+                    outcome = "dead"
+                else:
+                    job.status = "pending"
+                    job.run_after = timezone.now() + timedelta(
+                        seconds=backoff_delay(job.attempts)
+                    )
+                    outcome = "retried"
+            else:
+                job.status = "done"
+                job.locked_at = None
+                job.finished_at = timezone.now()
+                job.last_error = ""
+                outcome = "done"
+
+            if _finish(job, claimed_at):
+                stats[outcome] += 1
+    finally:
+        if context is not None:
+            context.close()
+
+    return stats
+
+
+def retry_dead(jobs):
+    """
+    Put dead-lettered jobs back on the queue with a fresh set of attempts.
+    """
+    return jobs.filter(status="dead").update(
+        status="pending",
+        attempts=0,
+        run_after=timezone.now(),
+        finished_at=None,
+    )
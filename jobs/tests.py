@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .mail import enqueue_mail
+from .models import Job
+from .queue import HANDLERS, LOCK_TIMEOUT, backoff_delay, enqueue, retry_dead, run_batch
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class RunBatchTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.failing = True
+
+        def flaky(payload, context):
+            self.calls.append(payload)
+            if self.failing:
+                raise RuntimeError("SMTP server unavailable")
+
+        HANDLERS["tests.flaky"] = flaky
+        self.addCleanup(HANDLERS.pop, "tests.flaky")
+
+    def make_runnable(self, job):
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    def test_enqueued_mail_is_sent_by_the_worker(self):
+        enqueue_mail("Shift change", "Report at 6am.", ["driver@example.com"])
+        enqueue_mail("Depot closed", "Use the north gate.", ["driver@example.com", "lead@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+
+        stats = run_batch()
+
+        self.assertEqual(stats, {"done": 2, "retried": 0, "dead": 0})
+        self.assertEqual([message.subject for message in mail.outbox], ["Shift change", "Depot closed"])
+        self.assertEqual(mail.outbox[1].to, ["driver@example.com", "lead@example.com"])
+        self.assertFalse(Job.objects.exclude(status="done").exists())
+        self.assertEqual(run_batch(), {"done": 0, "retried": 0, "dead": 0})
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue("tests.flaky", {"n": 1})
+
+        before = timezone.now()
+        self.assertEqual(run_batch(), {"done": 0, "retried": 1, "dead": 0})
+        job.refresh_from_db()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(job.locked_at)
+        self.assertIn("SMTP server unavailable", job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=backoff_delay(1)))
+
+        # Not runnable again until the backoff has passed
+        self.assertEqual(run_batch(), {"done": 0, "retried": 0, "dead": 0})
+        self.assertEqual(len(self.calls), 1)
+
+        self.make_runnable(job)
+        before = timezone.now()
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=backoff_delay(2)))
+        self.assertEqual(backoff_delay(2), 2 * backoff_delay(1))
+
+        self.failing = False
+        self.make_runnable(job)
+        self.assertEqual(run_batch(), {"done": 1, "retried": 0, "dead": 0})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ("done", 3, ""))
+
+    def test_job_is_dead_lettered_after_max_attempts(self):
+        job = enqueue("tests.flaky", max_attempts=2)
+
+        run_batch()
+        self.make_runnable(job)
+        self.assertEqual(run_batch(), {"done": 0, "retried": 0, "dead": 1})
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("dead", 2))
+        self.assertIsNotNone(job.finished_at)
+        self.make_runnable(job)
+        self.assertEqual(run_batch(), {"done": 0, "retried": 0, "dead": 0})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_unknown_kind_fails_like_any_other_error(self):
+        job = enqueue("tests.missing", max_attempts=1)
+        self.assertEqual(run_batch(), {"done": 0, "retried": 0, "dead": 1})
+        job.refresh_from_db()
+        self.assertIn("No handler registered", job.last_error)
+
+    def test_retry_dead_requeues_only_dead_jobs(self):
+        dead = enqueue("tests.flaky", max_attempts=1)
+        pending = enqueue("tests.flaky", run_after=timezone.now() + timedelta(hours=1))
+        run_batch()
+
+        self.assertEqual(retry_dead(Job.objects.all()), 1)
+        dead.refresh_from_db()
+        self.assertEqual((dead.status, dead.attempts), ("pending", 0))
+        self.assertIsNone(dead.finished_at)
+
+        self.failing = False
+        self.assertEqual(run_batch(), {"done": 1, "retried": 0, "dead": 0})
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.attempts), ("pending", 0))
+
+    def test_stale_running_job_is_reclaimed(self):
+        self.failing = False
+        job = enqueue("tests.flaky")
+        Job.objects.filter(pk=job.pk).update(
+            status="running", locked_at=timezone.now() - LOCK_TIMEOUT - timedelta(minutes=1)
+        )
+        self.assertEqual(run_batch(), {"done": 1, "retried": 0, "dead": 0})
+
+    def test_jobs_are_claimed_one_at_a_time(self):
+        self.failing = False
+        first = enqueue("tests.flaky", {"n": 1})
+        second = enqueue("tests.flaky", {"n": 2})
+        seen = []
+
+        def record(payload, context):
+            seen.append(Job.objects.values_list("status", "locked_at").get(pk=second.pk))
+            self.calls.append(payload)
+
+        HANDLERS["tests.flaky"] = record
+        self.assertEqual(run_batch(), {"done": 2, "retried": 0, "dead": 0})
+
+        # While the first job ran, the second wasn't locked yet
+        self.assertEqual(seen[0], ("pending", None))
+        self.assertEqual(self.calls, [{"n": 1}, {"n": 2}])
+        first.refresh_from_db()
+        self.assertEqual(first.status, "done")
+
+    def test_reclaimed_job_is_not_overwritten_by_the_slow_worker(self):
+        job = enqueue("tests.flaky")
+        reclaimed_at = timezone.now() + timedelta(minutes=11)
+
+        def slow(payload, context):
+            # Another worker takes the job over while this one is still on it
+            Job.objects.filter(pk=job.pk).update(status="running", locked_at=reclaimed_at, attempts=1)
+            raise RuntimeError("too slow")
+
+        HANDLERS["tests.flaky"] = slow
+        self.assertEqual(run_batch(), {"done": 0, "retried": 0, "dead": 0})
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_at, job.last_error), ("running", reclaimed_at, ""))
+
+    def test_run_jobs_command_until_empty(self):
+        enqueue_mail("Shift change", "Report at 6am.", ["driver@example.com"])
+        out = StringIO()
+        call_command("run_jobs", "--until-empty", stdout=out)
+        self.assertIn("1 done, 0 retried, 0 dead", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
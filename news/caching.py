@@ -0,0 +1,70 @@
+# news/caching.py
+#
+# Everything cached from the news tables sits under one version number.
+# Any change to a story bumps it, which retires every cached list page at
+# once without having to know which pages the story appeared on.
+#
+# The version lives in the shared cache (settings.CACHES), so a bump from
+# one web worker, the job worker or a management command is seen by all
+# of them.
+#
+# Values read on every page (the breaking banner) are kept in the
+# process-local cache instead, so they cost no queries. A bump clears this
+# process's copies at once; other processes pick the change up when their
+# copies expire after LOCAL_TIMEOUT seconds.
+
+import time
+
+from django.core.cache import cache, caches
+
+VERSION_KEY = "news:version"
+LOCAL_TIMEOUT = 15
+
+_local_keys = set()
+
+
+def _fresh_version():
+    # Starts from the clock rather than 1: if the counter is ever culled,
+    # the new one can't land back on versions whose entries are still cached
+    return time.time_ns() // 1000
+
+
+def news_cache_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() so two processes starting together agree on the first value
+        cache.add(VERSION_KEY, _fresh_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version if version is not None else _fresh_version()
+
+
+def bump_news_cache_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Not set (or culled): any fresh value retires the old keys
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+    caches["local"].delete_many(_local_keys)
+
+
+def news_cache_key(*parts):
+    """
+    A cache key that changes whenever any story changes.
+    """
+    return ":".join(["news", str(news_cache_version()), *(str(part) for part in parts)])
+
+
+def local_news_value(name, build, timeout=LOCAL_TIMEOUT):
+    """
+    A small value kept in the process-local cache, rebuilt by build() when
+    missing. Up to `timeout` seconds stale in processes other than the one
+    that changed a story.
+    """
+    key = f"news:{name}"
+    _local_keys.add(key)
+    local = caches["local"]
+    value = local.get(key)
+    if value is None:
+        value = build()
+        local.set(key, value, timeout)
+    return value
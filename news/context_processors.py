@@ -0,0 +1,25 @@
+# news/context_processors.py
+#
+# The breaking story for the banner in templates/base.html. It is kept in
+# the process-local cache (see news/caching.py), so the banner costs no
+# queries: a story save, delete, archive toggle or set_breaking clears it in
+# the process that made the change, and other processes refresh it within
+# LOCAL_TIMEOUT seconds.
+
+from .caching import local_news_value
+from .models import NewsStory
+
+
+def _breaking_story():
+    story = (
+        NewsStory.objects
+        .filter(is_breaking=True, is_archived=False)
+        .values("id", "title", "slug")
+        .first()
+    )
+    # {} rather than None, so "no breaking story" is cached as well
+    return story or {}
+
+
+def breaking_news(request):
+    return {"breaking_news": local_news_value("breaking", _breaking_story) or None}
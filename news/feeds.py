@@ -0,0 +1,131 @@
+# news/feeds.py
+#
+# RSS 2.0, Atom 1.0 and JSON Feed 1.1 of the latest non-archived stories,
+# for the in-cab tablets and depot screens that poll for news. The breaking
+# story is flagged with a "Breaking" category (tag in JSON Feed).
+#
+# A feed is rendered once and cached under the news cache version (see
+# news_feed). Its ETag is a hash of the rendered body, so it changes exactly
+# when what pollers would download changes, whatever changed the stories.
+# Last-Modified is the time that ETag was first seen, kept in a stamp
+# outside the versioned keys: a version bump that leaves the feed as it was
+# keeps the old time, and a removed story (which leaves no updated_at
+# behind) still moves it forward.
+
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+
+from .models import NewsStory
+
+FEED_TITLE = "IOTA News"
+FEED_DESCRIPTION = "Updates, announcements, and operational highlights."
+FEED_ITEMS = 30
+BREAKING_CATEGORY = "Breaking"
+
+SYNDICATION_FEEDS = {
+    "rss": Rss201rev2Feed,
+    "atom": Atom1Feed,
+}
+FORMATS = ("rss", "atom", "json")
+
+
+def feed_etag(body):
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def feed_last_modified(stamp_key, etag):
+    """
+    When the feed with this ETag was first served, as a Unix timestamp.
+    A new ETag gets the current time, always later than the previous one so
+    If-Modified-Since can't confuse two versions made within a second.
+    """
+    stamp = cache.get(stamp_key)
+    if stamp and stamp[0] == etag:
+        return stamp[1]
+    last_modified = int(time.time())
+    if stamp:
+        last_modified = max(last_modified, stamp[1] + 1)
+    cache.set(stamp_key, (etag, last_modified), timeout=None)
+    return last_modified
+
+
+def feed_stories(limit=FEED_ITEMS):
+    return list(
+        NewsStory.objects
+        .filter(is_archived=False)
+        .defer("body", "body_html")
+        .order_by("-created_at", "-pk")[:limit]
+    )
+
+
+def _item(story, absolute):
+    image = story.picture("feature")
+    return {
+        "id": story.pk,
+        "title": story.title,
+        "url": absolute(reverse("news_detail", args=[story.slug])),
+        "summary": story.excerpt,
+        "image": absolute(image["src"]) if image else None,
+        "published": story.created_at,
+        "updated": story.updated_at,
+        "breaking": story.is_breaking,
+    }
+
+
+def render_feed(feed_format, stories, absolute):
+    """
+    (content type, body bytes) of one feed. absolute turns a path into an
+    absolute URL (request.build_absolute_uri).
+    """
+    items = [_item(story, absolute) for story in stories]
+    home = absolute(reverse("news_list"))
+    feed_url = absolute(reverse("news_feed", args=[feed_format]))
+
+    if feed_format == "json":
+        feed = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": FEED_TITLE,
+            "description": FEED_DESCRIPTION,
+            "home_page_url": home,
+            "feed_url": feed_url,
+            "items": [
+                {
+                    "id": str(item["id"]),
+                    "url": item["url"],
+                    "title": item["title"],
+                    "summary": item["summary"],
+                    "content_text": item["summary"],
+                    **({"image": item["image"]} if item["image"] else {}),
+                    "date_published": item["published"].isoformat(),
+                    "date_modified": item["updated"].isoformat(),
+                    **({"tags": [BREAKING_CATEGORY]} if item["breaking"] else {}),
+                }
+                for item in items
+            ],
+        }
+        body = json.dumps(feed, ensure_ascii=False, indent=2).encode("utf-8")
+        return "application/feed+json; charset=utf-8", body
+
+    feed = SYNDICATION_FEEDS[feed_format](
+        title=FEED_TITLE,
+        link=home,
+        description=FEED_DESCRIPTION,
+        feed_url=feed_url,
+        language="en",
+    )
+    for item in items:
+        feed.add_item(
+            title=item["title"],
+            link=item["url"],
+            description=item["summary"],
+            unique_id=item["url"],
+            pubdate=item["published"],
+            updateddate=item["updated"],
+            categories=[BREAKING_CATEGORY] if item["breaking"] else None,
+        )
+    return feed.content_type, feed.writeString("utf-8").encode("utf-8")
@@ -0,0 +1,151 @@
+# news/images.py
+#
+# Resized copies of story images. Uploads are kept as they are; a background
+# job (news/tasks.py) writes a WebP and a JPEG of each size next to the
+# original and records them on NewsStory.image_variants:
+#
+#   {
+#       "source": "news/photo.png",
+#       "card": {"width": 480, "height": 270,
+#                "webp": {"name": "news/photo_card.webp", "url": "/media/..."},
+#                "jpeg": {"name": "news/photo_card.jpg", "url": "/media/..."}},
+#       "feature": {...},
+#       "full": {...},
+#   }
+#
+# Templates show them with news/_picture.html and NewsStory.picture().
+
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; images are never scaled up
+SIZES = {
+    "card": 480,
+    "feature": 1200,
+    "full": 1920,
+}
+
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Transparent images are flattened onto the news page background for JPEG
+JPEG_BACKGROUND = (16, 18, 24)
+
+
+def variant_name(source_name, size, extension):
+    stem, _ = posixpath.splitext(source_name)
+    return f"{stem}_{size}.{extension}"
+
+
+def _flatten(image):
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, JPEG_BACKGROUND)
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _encode(image, image_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(source_name, storage=default_storage):
+    """
+    Write every size and format of an image to storage and return the
+    image_variants dict describing them. Raises ValueError if the file
+    isn't an image Pillow can read.
+    """
+    with storage.open(source_name, "rb") as source:
+        try:
+            original = Image.open(source)
+            original.load()
+        except (UnidentifiedImageError, OSError) as exc:
+            raise ValueError(f"{source_name} is not a readable image.") from exc
+
+    # Phone photos are often stored sideways with an EXIF rotation
+    original = ImageOps.exif_transpose(original)
+    has_alpha = original.mode in ("RGBA", "LA") or "transparency" in original.info
+
+    variants = {"source": source_name}
+    for size, longest_edge in SIZES.items():
+        image = original.copy()
+        image.thumbnail((longest_edge, longest_edge), Image.Resampling.LANCZOS)
+
+        variant = {"width": image.width, "height": image.height}
+        for key, (image_format, extension, options) in FORMATS.items():
+            if image_format == "JPEG":
+                encoded = _encode(_flatten(image), image_format, options)
+            else:
+                encoded = _encode(image.convert("RGBA" if has_alpha else "RGB"), image_format, options)
+
+            name = variant_name(source_name, size, extension)
+            # Replace an earlier rendering rather than getting a suffixed copy
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(encoded))
+            variant[key] = {"name": name, "url": storage.url(name)}
+        variants[size] = variant
+
+    return variants
+
+
+def picture(variants, size, fallback_url=None):
+    """
+    What news/_picture.html needs to show one size: a JPEG src, WebP and
+    JPEG srcsets (this size plus the next one up, for high-density
+    screens) and the dimensions. Before the variants exist (or if they
+    couldn't be made) only src is set, to fallback_url.
+    """
+    names = list(SIZES)
+    variant = (variants or {}).get(size)
+    if not isinstance(variant, dict):
+        return {"src": fallback_url} if fallback_url else None
+
+    candidates = [variant]
+    larger = (variants or {}).get(names[names.index(size) + 1]) if size != names[-1] else None
+    if isinstance(larger, dict) and larger["width"] > variant["width"]:
+        candidates.append(larger)
+
+    def srcset(key):
+        return ", ".join(f"{c[key]['url']} {c['width']}w" for c in candidates)
+
+    return {
+        "src": variant["jpeg"]["url"],
+        "webp_srcset": srcset("webp"),
+        "jpeg_srcset": srcset("jpeg"),
+        "width": variant["width"],
+        "height": variant["height"],
+    }
+
+
+def variant_files(variants):
+    """
+    Storage names of every file listed in an image_variants dict.
+    """
+    return [
+        variant[key]["name"]
+        for size in SIZES
+        if isinstance(variant := (variants or {}).get(size), dict)
+        for key in FORMATS
+        if key in variant
+    ]
+
+
+def delete_files(names, storage=default_storage):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete image variant %s", name, exc_info=True)
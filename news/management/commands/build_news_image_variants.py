@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from news.caching import bump_news_cache_version
+from news.images import build_variants, delete_files, variant_files
+from news.models import NewsStory
+
+
+class Command(BaseCommand):
+    help = "Make the resized WebP/JPEG copies of news story images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild every story's copies, not just the missing ones.",
+        )
+
+    def handle(self, *args, **options):
+        stories = NewsStory.objects.exclude(image="").exclude(image__isnull=True).only("image", "image_variants")
+        built = failed = 0
+
+        for story in stories.iterator():
+            if not options["all"] and story.image_variants.get("source") == story.image.name:
+                continue
+            try:
+                variants = build_variants(story.image.name)
+            except (ValueError, OSError) as exc:
+                failed += 1
+                self.stderr.write(f"Story {story.pk}: {exc}")
+                continue
+
+            stale = set(variant_files(story.image_variants)) - set(variant_files(variants))
+            NewsStory.objects.filter(pk=story.pk).update(image_variants=variants)
+            delete_files(stale)
+            built += 1
+
+        if built:
+            bump_news_cache_version()
+        self.stdout.write(self.style.SUCCESS(f"Built image copies for {built} stories ({failed} failed)."))
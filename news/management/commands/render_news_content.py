@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from news.caching import bump_news_cache_version
+from news.models import RENDERED_FIELDS, NewsStory
+
+
+class Command(BaseCommand):
+    help = "Fill in the sanitised body, excerpt, reading time and first image of news stories."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every story, not just the ones without a sanitised body.",
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        stories = NewsStory.objects.only("synopsis", "body", *RENDERED_FIELDS).order_by("pk")
+        if not options["all"]:
+            stories = stories.filter(body_html="")
+
+        batch, rendered = [], 0
+        for story in stories.iterator(chunk_size=options["batch_size"]):
+            story.render_content()
+            batch.append(story)
+            if len(batch) >= options["batch_size"]:
+                # bulk_update leaves updated_at alone: the stories haven't been edited
+                NewsStory.objects.bulk_update(batch, RENDERED_FIELDS)
+                rendered += len(batch)
+                batch = []
+        if batch:
+            NewsStory.objects.bulk_update(batch, RENDERED_FIELDS)
+            rendered += len(batch)
+
+        if rendered:
+            bump_news_cache_version()
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} stories."))
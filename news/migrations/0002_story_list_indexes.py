@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsstory',
+            index=models.Index(fields=['-created_at', '-id'], name='news_story_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsstory',
+            index=models.Index(fields=['is_archived', '-created_at', '-id'], name='news_story_visible_idx'),
+        ),
+    ]
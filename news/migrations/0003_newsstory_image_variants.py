@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_story_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsstory',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
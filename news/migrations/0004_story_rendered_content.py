@@ -0,0 +1,242 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:35
+
+import math
+import re
+from html import escape, unescape
+from html.parser import HTMLParser
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# A frozen copy of news/sanitize.py as it was when this migration was
+# written, so later changes to the sanitizer can't change what it does.
+# Stories saved afterwards are rendered by the current one.
+
+ALLOWED_TAGS = {
+    "p", "br", "hr", "div", "span",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+    "strong", "b", "em", "i", "u", "s", "sub", "sup", "mark", "small",
+    "a", "img", "figure", "figcaption", "oembed",
+    "ul", "ol", "li", "label", "input",
+    "blockquote", "pre", "code",
+    "table", "thead", "tbody", "tfoot", "tr", "th", "td", "caption", "colgroup", "col",
+}
+
+# Tags dropped together with everything inside them. Void elements such as
+# <embed> have no content or end tag, so they are just left out like any
+# other tag that isn't allowed.
+DROP_CONTENT_TAGS = {"script", "style", "iframe", "object", "template", "noscript", "svg", "math"}
+
+VOID_TAGS = {"br", "hr", "img", "input", "col"}
+
+GLOBAL_ATTRIBUTES = {"class", "style", "title", "lang", "dir"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "target", "rel"},
+    "img": {"src", "alt", "width", "height"},
+    "oembed": {"url"},
+    "ol": {"start", "reversed", "type"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+    "col": {"span"},
+    "colgroup": {"span"},
+    # CKEditor to-do lists are rendered as disabled checkboxes
+    "input": {"type", "checked", "disabled"},
+}
+URL_ATTRIBUTES = {"href", "src", "url"}
+URL_SCHEMES = {"http", "https", "mailto", "tel"}
+
+ALLOWED_STYLES = {
+    "color", "background-color", "font-size", "font-family", "font-weight", "font-style",
+    "text-align", "text-decoration", "margin-left", "padding-left",
+    "width", "height", "border", "border-color", "border-style", "border-width",
+    "vertical-align", "list-style-type",
+}
+_UNSAFE_STYLE_VALUE = re.compile(r"url\s*\(|expression\s*\(|javascript:|[<>\\]", re.IGNORECASE)
+_SCHEME = re.compile(r"^([a-z][a-z0-9+.\-]*):", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+EXCERPT_LENGTH = 500
+WORDS_PER_MINUTE = 200
+
+
+def _safe_url(value):
+    # Browsers ignore control characters and whitespace inside a scheme
+    cleaned = re.sub(r"[\x00-\x20]", "", unescape(value or ""))
+    match = _SCHEME.match(cleaned)
+    if match and match.group(1).lower() not in URL_SCHEMES:
+        return None
+    return value.strip()
+
+
+def _safe_style(value):
+    declarations = []
+    for declaration in value.split(";"):
+        name, _, css_value = declaration.partition(":")
+        name, css_value = name.strip().lower(), css_value.strip()
+        if name in ALLOWED_STYLES and css_value and not _UNSAFE_STYLE_VALUE.search(css_value):
+            declarations.append(f"{name}:{css_value}")
+    return ";".join(declarations)
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.text = []
+        self.first_image = ""
+        self.open_tags = []
+        self.dropping = 0  # depth inside a DROP_CONTENT_TAGS element
+
+    def _attributes(self, tag, attrs):
+        allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = {}
+        for name, value in attrs:
+            name = name.lower()
+            if name not in allowed:
+                continue
+            value = value or ""
+            if name in URL_ATTRIBUTES:
+                value = _safe_url(value)
+                if value is None:
+                    continue
+            elif name == "style":
+                value = _safe_style(value)
+                if not value:
+                    continue
+            elif name == "type" and tag == "input" and value.lower() != "checkbox":
+                return None
+            cleaned[name] = value
+
+        if tag == "img" and not cleaned.get("src"):
+            return None
+        if tag == "input":
+            cleaned.setdefault("type", "checkbox")
+            cleaned["disabled"] = ""
+        if tag == "a" and cleaned.get("target") == "_blank":
+            cleaned["rel"] = "noopener noreferrer"
+        return cleaned
+
+    def _write_tag(self, tag, attrs, self_closing=False):
+        attributes = self._attributes(tag, attrs)
+        if attributes is None:
+            return
+        rendered = "".join(
+            f' {name}="{escape(value)}"' if value else f" {name}"
+            for name, value in attributes.items()
+        )
+        self.out.append(f"<{tag}{rendered}>")
+        if tag == "img" and not self.first_image and attributes.get("src"):
+            self.first_image = attributes["src"]
+        if tag not in VOID_TAGS and not self_closing:
+            self.open_tags.append(tag)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+        elif not self.dropping and tag in ALLOWED_TAGS:
+            self._write_tag(tag, attrs)
+        if tag in ("p", "br", "li", "div", "tr") or tag.startswith("h"):
+            self.text.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.dropping and tag in ALLOWED_TAGS:
+            self._write_tag(tag, attrs, self_closing=True)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close anything left open inside it, so the output stays balanced
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+        self.text.append(" ")
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+            self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.out.append(f"</{self.open_tags.pop()}>")
+
+
+def sanitize_html(html):
+    """
+    (clean HTML, plain text, first image URL) for a fragment of HTML.
+    """
+    parser = _Sanitizer()
+    parser.feed(html or "")
+    parser.close()
+    text = _WHITESPACE.sub(" ", "".join(parser.text)).strip()
+    return "".join(parser.out), text, parser.first_image
+
+
+def plain_text(html):
+    return _WHITESPACE.sub(" ", unescape(strip_tags(html or ""))).strip()
+
+
+def excerpt(text, length=EXCERPT_LENGTH):
+    return Truncator(text).chars(length)
+
+
+def reading_minutes(text, words_per_minute=WORDS_PER_MINUTE):
+    words = len(text.split())
+    return max(1, math.ceil(words / words_per_minute)) if words else 0
+
+
+def render_existing_stories(apps, schema_editor):
+    # Same as NewsStory.render_content(), which historical models don't have
+    NewsStory = apps.get_model("news", "NewsStory")
+    fields = ["body_html", "excerpt", "reading_minutes", "first_image_url"]
+
+    batch = []
+    for story in NewsStory.objects.only("synopsis", "body").order_by("pk").iterator(chunk_size=200):
+        story.body_html, text, first_image_url = sanitize_html(story.body)
+        story.first_image_url = first_image_url[:500]
+        story.excerpt = excerpt(plain_text(story.synopsis) or text)
+        story.reading_minutes = reading_minutes(text)
+        batch.append(story)
+        if len(batch) >= 200:
+            NewsStory.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        NewsStory.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_newsstory_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsstory',
+            name='body_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='newsstory',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='newsstory',
+            name='first_image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='newsstory',
+            name='reading_minutes',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(render_existing_stories, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,16 @@
 from django.db import models
 from django.db import transaction
-from django.utils.text import slugify
+from django.utils import timezone
+
+from iota.slugs import save_with_unique_slug
+from jobs.queue import enqueue
+
+from .caching import bump_news_cache_version
+from .images import picture, variant_files
+from .sanitize import excerpt, plain_text, reading_minutes, sanitize_html
+
+
+RENDERED_FIELDS = ("body_html", "excerpt", "reading_minutes", "first_image_url")
 
 
 class NewsStory(models.Model):
@@ -9,7 +19,14 @@ class NewsStory(models.Model):
 
     synopsis = models.TextField(max_length=500, help_text="Short summary shown on the list page.")
     body = models.TextField(help_text="Full story content.")
+    # Worked out from synopsis/body on save (see news/sanitize.py)
+    body_html = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=500, blank=True, editable=False)
+    reading_minutes = models.PositiveSmallIntegerField(default=0, editable=False)
+    first_image_url = models.CharField(max_length=500, blank=True, editable=False)
     image = models.ImageField(upload_to="news/", blank=True, null=True)
+    # Resized WebP/JPEG copies of image, made in the background (see news/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     is_breaking = models.BooleanField(default=False, help_text="Only one story can be Breaking at a time.")
     is_archived = models.BooleanField(default=False, help_text="Archived stories are hidden from the main list.")
@@ -19,22 +36,57 @@ class NewsStory(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # The list is paged newest first on (created_at, id)
+            models.Index(fields=["-created_at", "-id"], name="news_story_created_idx"),
+            models.Index(fields=["is_archived", "-created_at", "-id"], name="news_story_visible_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def render_content(self):
+        """
+        Fill body_html, excerpt, reading_minutes and first_image_url from
+        synopsis and body.
+        """
+        self.body_html, text, self.first_image_url = sanitize_html(self.body)
+        self.first_image_url = self.first_image_url[:500]
+        self.excerpt = excerpt(plain_text(self.synopsis) or text)
+        self.reading_minutes = reading_minutes(text)
+
     def save(self, *args, **kwargs):
-        # Slug generation
-        if not self.slug:
-            base = slugify(self.title)[:240] or "story"
-            candidate = base
-            i = 2
-            while NewsStory.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{i}"
-                i += 1
-            self.slug = candidate
-
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"body", "synopsis"} & set(update_fields):
+            self.render_content()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *RENDERED_FIELDS}
+
+        image_changed = (self.image.name or "") != self.image_variants.get("source", "")
+        stale_files = []
+        if image_changed and self.image_variants:
+            # Old copies would show the previous image until the job runs;
+            # the job deletes their files
+            stale_files = variant_files(self.image_variants)
+            self.image_variants = {}
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "image_variants"}
+
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            # One query for the slug, retried if a concurrent save takes it
+            save_with_unique_slug(
+                self, self.title, fallback="story",
+                save=lambda: super(NewsStory, self).save(*args, **kwargs),
+            )
+
+        if image_changed and (self.image or stale_files):
+            enqueue("news.image_variants", {
+                "story_id": self.pk,
+                "image": self.image.name or "",
+                "stale_files": stale_files,
+            })
 
         # Enforce one breaking story (and don't allow archived to stay breaking)
         if self.is_archived and self.is_breaking:
@@ -42,10 +94,39 @@ class NewsStory(models.Model):
             self.is_breaking = False
 
         if self.is_breaking:
-            NewsStory.objects.exclude(pk=self.pk).filter(is_breaking=True).update(is_breaking=False)
+            # updated_at moves too: the feeds list it as the story's update time
+            NewsStory.objects.exclude(pk=self.pk).filter(is_breaking=True).update(
+                is_breaking=False, updated_at=timezone.now()
+            )
+
+        transaction.on_commit(bump_news_cache_version)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(bump_news_cache_version)
+        return result
+
+    def picture(self, size):
+        # Stories without their own image fall back to the first one in the body
+        fallback = self.image.url if self.image else self.first_image_url or None
+        return picture(self.image_variants, size, fallback)
+
+    @property
+    def card_picture(self):
+        return self.picture("card")
+
+    @property
+    def feature_picture(self):
+        return self.picture("feature")
+
+    @property
+    def full_picture(self):
+        return self.picture("full")
 
     @classmethod
     def set_breaking(cls, story_id: int):
+        now = timezone.now()
         with transaction.atomic():
-            cls.objects.filter(is_breaking=True).update(is_breaking=False)
-            cls.objects.filter(pk=story_id, is_archived=False).update(is_breaking=True)
\ No newline at end of file
+            cls.objects.filter(is_breaking=True).update(is_breaking=False, updated_at=now)
+            cls.objects.filter(pk=story_id, is_archived=False).update(is_breaking=True, updated_at=now)
+            transaction.on_commit(bump_news_cache_version)
\ No newline at end of file
@@ -0,0 +1,44 @@
+# news/tasks.py
+#
+# Background job handlers for news (run by `manage.py run_jobs`).
+
+import logging
+
+from jobs.queue import handler
+
+from .caching import bump_news_cache_version
+from .images import build_variants, delete_files, variant_files
+from .models import NewsStory
+
+logger = logging.getLogger(__name__)
+
+
+@handler("news.image_variants")
+def make_image_variants(payload, context):
+    """
+    Resize a story's newly uploaded image into its card/feature/full WebP
+    and JPEG copies, and remove the copies of the image it replaced.
+    """
+    story = NewsStory.objects.filter(pk=payload["story_id"]).only("image", "image_variants").first()
+
+    in_use = set(variant_files(story.image_variants)) if story else set()
+    delete_files(name for name in payload.get("stale_files", []) if name not in in_use)
+
+    if story is None or not payload.get("image") or story.image.name != payload["image"]:
+        # Deleted, cleared, or replaced again (a newer job has that image)
+        return
+
+    try:
+        variants = build_variants(story.image.name)
+    except ValueError:
+        # Not worth retrying; templates keep using the original
+        logger.warning("Story %s image could not be resized", story.pk, exc_info=True)
+        return
+
+    # update() so the story's save() logic (and this job) isn't re-run; only
+    # record the copies if the image wasn't replaced while they were made
+    updated = NewsStory.objects.filter(pk=story.pk, image=payload["image"]).update(image_variants=variants)
+    if updated:
+        bump_news_cache_version()
+    else:
+        delete_files(variant_files(variants))
@@ -1,3 +1,470 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from PIL import Image
+
+from iota.slugs import MAX_ATTEMPTS, next_free_slug
+from jobs.models import Job
+from jobs.queue import run_batch
+
+from .caching import bump_news_cache_version
+from .context_processors import breaking_news
+from .images import SIZES, variant_files
+from .models import NewsStory
+from .sanitize import excerpt, reading_minutes, sanitize_html
+from .views import _list_context
+
+
+class SanitizeHtmlTests(SimpleTestCase):
+    def assertClean(self, html, expected):
+        self.assertEqual(sanitize_html(html)[0], expected)
+
+    def test_allowed_markup_is_kept(self):
+        self.assertClean(
+            '<h2>Title</h2><p>Some <strong>bold</strong> &amp; <a href="https://example.com">a link</a></p>',
+            '<h2>Title</h2><p>Some <strong>bold</strong> &amp; <a href="https://example.com">a link</a></p>',
+        )
+
+    def test_scripts_and_frames_are_dropped_with_their_content(self):
+        self.assertClean(
+            "<p>a</p><script>alert(1)</script><iframe src='https://x'><p>inside</p></iframe><p>b</p>",
+            "<p>a</p><p>b</p>",
+        )
+
+    def test_void_tags_do_not_swallow_what_follows(self):
+        self.assertClean(
+            "<p>a<embed src=x>b</p><p>more text</p>",
+            "<p>ab</p><p>more text</p>",
+        )
+        self.assertClean("<p>a</embed>b</p>", "<p>ab</p>")
+
+    def test_event_handlers_and_unknown_attributes_are_removed(self):
+        self.assertClean(
+            '<p onclick="steal()" data-x="1" class="lead">Hi</p><img src="/media/a.png" onerror="steal()">',
+            '<p class="lead">Hi</p><img src="/media/a.png">',
+        )
+
+    def test_unsafe_urls_are_removed(self):
+        self.assertClean(
+            '<a href=" jav&#x09;ascript:alert(1)">x</a><a href="data:text/html,hi">y</a>'
+            '<img src="javascript:alert(1)"><a href="/news/">z</a>',
+            '<a>x</a><a>y</a><a href="/news/">z</a>',
+        )
+
+    def test_new_tab_links_get_noopener(self):
+        self.assertClean(
+            '<a href="https://example.com" target="_blank" rel="opener">x</a>',
+            '<a href="https://example.com" target="_blank" rel="noopener noreferrer">x</a>',
+        )
+
+    def test_styles_keep_only_safe_properties(self):
+        self.assertClean(
+            '<p style="color: red; background: url(javascript:x); position: fixed; font-size: expression(1)">x</p>'
+            '<span style="position:absolute">y</span>',
+            '<p style="color:red">x</p><span>y</span>',
+        )
+
+    def test_malformed_markup_is_balanced(self):
+        self.assertClean("<div><em>open <strong>x</div></p>tail", "<div><em>open <strong>x</strong></em></div>tail")
+        self.assertClean("<ul><li>one<li>two", "<ul><li>one<li>two</li></li></ul>")
+        self.assertClean("<p>1 < 2 & <b>3 > 2", "<p>1 &lt; 2 &amp; <b>3 &gt; 2</b></p>")
+
+    def test_text_inputs_are_removed_but_todo_checkboxes_kept(self):
+        self.assertClean(
+            '<input type="text" value="x"><label><input type="checkbox" checked>Done</label>',
+            "<label><input type=\"checkbox\" checked disabled>Done</label>",
+        )
+
+    def test_plain_text_and_first_image(self):
+        html, text, first_image = sanitize_html(
+            '<p>Hello <b>world</b></p><script>nope()</script><img src="javascript:x">'
+            '<img src="/media/first.jpg"><img src="/media/second.jpg">'
+        )
+        self.assertEqual(text, "Hello world")
+        self.assertEqual(first_image, "/media/first.jpg")
+
+    def test_excerpt_and_reading_time(self):
+        self.assertEqual(reading_minutes(""), 0)
+        self.assertEqual(reading_minutes("word " * 10), 1)
+        self.assertEqual(reading_minutes("word " * 401), 3)
+        self.assertEqual(len(excerpt("x" * 1000, 100)), 100)
+
+
+class BreakingNewsBannerTests(TestCase):
+    def setUp(self):
+        caches["local"].clear()
+        self.request = RequestFactory().get("/")
+
+    def banner(self):
+        return breaking_news(self.request)["breaking_news"]
+
+    def create(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return NewsStory.objects.create(synopsis="s", body="b", **fields)
+
+    def test_cached_banner_costs_no_queries(self):
+        story = self.create(title="Depot closed", is_breaking=True)
+        self.assertEqual(self.banner(), {"id": story.pk, "title": "Depot closed", "slug": story.slug})
+        with self.assertNumQueries(0):
+            self.banner()
+
+    def test_no_breaking_story_is_cached_too(self):
+        self.assertIsNone(self.banner())
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.banner())
+
+    def test_story_changes_invalidate_the_banner(self):
+        first = self.create(title="First", is_breaking=True)
+        second = self.create(title="Second")
+        self.assertEqual(self.banner()["id"], first.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NewsStory.set_breaking(second.pk)
+        self.assertEqual(self.banner()["id"], second.pk)
+
+        second.is_archived = True
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        self.assertIsNone(self.banner())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NewsStory.set_breaking(first.pk)
+        self.assertEqual(self.banner()["id"], first.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertIsNone(self.banner())
+
+
+class NewsListTests(TestCase):
+    STORIES = 30
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stories = [
+                NewsStory.objects.create(title=f"Story {n}", synopsis=f"Synopsis {n}", body=f"<p>Body {n}</p>")
+                for n in range(self.STORIES)
+            ]
+        # Pairs of stories share a created_at, so pages have to split on the id
+        start = timezone.now() - timedelta(days=1)
+        for n, story in enumerate(stories):
+            NewsStory.objects.filter(pk=story.pk).update(created_at=start + timedelta(minutes=n // 2))
+        self.newest_first = [story.pk for story in reversed(stories)]
+        self.breaking = stories[10]
+        NewsStory.objects.filter(pk=self.breaking.pk).update(is_breaking=True)
+
+    def ids(self, page):
+        return [story.pk for story in page["items"]]
+
+    def test_pages_walk_every_story_once(self):
+        first = _list_context(False, "", "")
+        self.assertEqual(first["breaking"].pk, self.breaking.pk)
+        rest = [pk for pk in self.newest_first if pk != self.breaking.pk]
+
+        seen, page = self.ids(first["page"]), first["page"]
+        pages = [page]
+        while page["has_next"]:
+            page = _list_context(False, page["next_cursor"], "")["page"]
+            self.assertIsNone(_list_context(False, pages[-1]["next_cursor"], "")["breaking"])
+            pages.append(page)
+            seen += self.ids(page)
+        self.assertEqual(seen, rest)
+        self.assertEqual([len(page["items"]) for page in pages], [12, 12, 5])
+
+        # Walking back from the last page gives the middle page again
+        back = _list_context(False, "", page["previous_cursor"])["page"]
+        self.assertEqual(self.ids(back), self.ids(pages[1]))
+        self.assertTrue(back["has_previous"])
+
+        # ...and back from there, the real first page with the breaking story
+        top = _list_context(False, "", back["previous_cursor"])
+        self.assertEqual(top["breaking"].pk, self.breaking.pk)
+        self.assertEqual(self.ids(top["page"]), self.ids(first["page"]))
+
+    def test_archived_stories_are_left_out_for_drivers(self):
+        archived = self.newest_first[0]
+        NewsStory.objects.filter(pk=archived).update(is_archived=True)
+        self.assertNotIn(archived, self.ids(_list_context(False, "", "")["page"]))
+        self.assertIn(archived, self.ids(_list_context(True, "", "")["page"]))
+
+    def test_bodies_are_never_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            page = _list_context(False, "", "")["page"]
+            [story.excerpt for story in page["items"]]
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"body"', queries[0]["sql"])
+        self.assertNotIn('"body_html"', queries[0]["sql"])
+
+    def test_malformed_cursors_show_the_first_page(self):
+        response = self.client.get(reverse("news_list"), {"after": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Story 29")
+
+    def test_rendered_pages_are_cached_until_a_story_changes(self):
+        url = reverse("news_list")
+        self.assertContains(self.client.get(url), "Story 29")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if "news_newsstory" in query["sql"]])
+
+        story = NewsStory.objects.get(pk=self.newest_first[0])
+        story.title = "Depot reopened"
+        with self.captureOnCommitCallbacks(execute=True):
+            story.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Depot reopened")
+        self.assertNotContains(response, "Story 29")
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, name, size, mode="RGB"):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, format="PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def create(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return NewsStory.objects.create(title="Depot", synopsis="s", body="b", image=image)
+
+    def test_job_writes_every_size_and_format(self):
+        story = self.create(self.upload("depot.png", (2000, 1000), mode="RGBA"))
+        self.assertEqual(story.image_variants, {})
+        self.assertEqual(story.card_picture, {"src": story.image.url})
+
+        self.assertEqual(run_batch(), {"done": 1, "retried": 0, "dead": 0})
+        story.refresh_from_db()
+        variants = story.image_variants
+        self.assertEqual(variants["source"], story.image.name)
+        self.assertEqual(
+            {size: (variants[size]["width"], variants[size]["height"]) for size in SIZES},
+            {"card": (480, 240), "feature": (1200, 600), "full": (1920, 960)},
+        )
+        with default_storage.open(variants["card"]["webp"]["name"]) as webp:
+            self.assertEqual((Image.open(webp).format, Image.open(webp).mode), ("WEBP", "RGBA"))
+        with default_storage.open(variants["card"]["jpeg"]["name"]) as jpeg:
+            self.assertEqual((Image.open(jpeg).format, Image.open(jpeg).mode), ("JPEG", "RGB"))
+
+        picture = story.card_picture
+        self.assertEqual(picture["src"], variants["card"]["jpeg"]["url"])
+        self.assertEqual(
+            picture["webp_srcset"],
+            f"{variants['card']['webp']['url']} 480w, {variants['feature']['webp']['url']} 1200w",
+        )
+        self.assertEqual(story.full_picture["jpeg_srcset"], f"{variants['full']['jpeg']['url']} 1920w")
+
+    def test_small_images_are_not_scaled_up(self):
+        story = self.create(self.upload("small.png", (300, 200)))
+        run_batch()
+        story.refresh_from_db()
+        self.assertEqual({(story.image_variants[size]["width"]) for size in SIZES}, {300})
+        # The larger copies are no larger, so they aren't offered
+        self.assertEqual(story.card_picture["webp_srcset"], f"{story.image_variants['card']['webp']['url']} 300w")
+
+    def test_replacing_the_image_retires_the_old_copies(self):
+        story = self.create(self.upload("first.png", (800, 600)))
+        run_batch()
+        story.refresh_from_db()
+        old_files = variant_files(story.image_variants)
+
+        story.image = self.upload("second.png", (800, 600))
+        with self.captureOnCommitCallbacks(execute=True):
+            story.save()
+        # The old copies are dropped straight away; the page shows the upload
+        self.assertEqual(story.image_variants, {})
+        self.assertEqual(story.feature_picture, {"src": story.image.url})
+
+        run_batch()
+        story.refresh_from_db()
+        self.assertEqual(story.image_variants["source"], story.image.name)
+        self.assertFalse([name for name in old_files if default_storage.exists(name)])
+        self.assertTrue(all(default_storage.exists(name) for name in variant_files(story.image_variants)))
+
+    def test_job_for_an_image_replaced_again_does_nothing(self):
+        story = self.create(self.upload("first.png", (800, 600)))
+        story.image = self.upload("second.png", (800, 600))
+        with self.captureOnCommitCallbacks(execute=True):
+            story.save()
+
+        self.assertEqual(run_batch(), {"done": 2, "retried": 0, "dead": 0})
+        story.refresh_from_db()
+        self.assertEqual(story.image_variants["source"], story.image.name)
+        # No copies were made of the first image
+        self.assertFalse([name for name in default_storage.listdir("news")[1] if name.startswith("first_")])
+
+    def test_unreadable_images_fall_back_to_the_original(self):
+        story = self.create(SimpleUploadedFile("broken.png", b"not an image", content_type="image/png"))
+        self.assertEqual(run_batch(), {"done": 1, "retried": 0, "dead": 0})
+        story.refresh_from_db()
+        self.assertEqual(story.image_variants, {})
+        self.assertEqual(story.card_picture, {"src": story.image.url})
+
+    def test_command_builds_missing_copies(self):
+        story = self.create(self.upload("depot.png", (800, 600)))
+        Job.objects.all().delete()
+        broken = self.create(SimpleUploadedFile("broken.png", b"not an image", content_type="image/png"))
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("build_news_image_variants", stdout=out, stderr=err)
+        self.assertIn("1 stories (1 failed)", out.getvalue())
+        self.assertIn(f"Story {broken.pk}", err.getvalue())
+        story.refresh_from_db()
+        self.assertEqual(story.image_variants["source"], story.image.name)
+
+        out = io.StringIO()
+        call_command("build_news_image_variants", stdout=out, stderr=io.StringIO())
+        self.assertIn("0 stories (1 failed)", out.getvalue())
+
+
+class SlugTests(TestCase):
+    def create(self, title):
+        return NewsStory.objects.create(title=title, synopsis="s", body="b")
+
+    def test_duplicates_get_the_lowest_free_suffix(self):
+        slugs = [self.create("Depot closed").slug for _ in range(3)]
+        self.assertEqual(slugs, ["depot-closed", "depot-closed-2", "depot-closed-3"])
+
+        # Longer slugs sharing the prefix aren't mistaken for suffixes
+        self.assertEqual(self.create("Depot closed today").slug, "depot-closed-today")
+        NewsStory.objects.get(slug="depot-closed-2").delete()
+        self.assertEqual(self.create("Depot closed").slug, "depot-closed-2")
+        self.assertEqual(self.create("Depot closed").slug, "depot-closed-4")
+
+    def test_query_count_does_not_grow_with_duplicates(self):
+        def queries_for_one_more():
+            with CaptureQueriesContext(connection) as queries:
+                self.create("Shift change")
+            return len(queries)
+
+        self.create("Shift change")
+        second = queries_for_one_more()
+        for _ in range(10):
+            self.create("Shift change")
+        self.assertEqual(queries_for_one_more(), second)
+
+    def test_long_and_empty_titles(self):
+        title = "Route " * 60
+        first, second = self.create(title), self.create(title)
+        self.assertEqual(len(first.slug), 260)
+        self.assertLessEqual(len(second.slug), 260)
+        # No room for "-2": the base is shortened instead
+        self.assertNotEqual(second.slug, first.slug)
+        self.assertTrue(first.slug.startswith(second.slug))
+        self.assertEqual([self.create("!!!").slug, self.create("???").slug], ["story", "story-2"])
+
+    def test_saving_again_keeps_the_slug(self):
+        story = self.create("Depot closed")
+        story.title = "Depot reopened"
+        story.save()
+        self.assertEqual(story.slug, "depot-closed")
+
+    def test_a_slug_taken_by_a_concurrent_save_is_allocated_again(self):
+        self.create("Depot closed")
+        calls = []
+
+        def stale(queryset, base, **kwargs):
+            # The first lookup ran before the other save committed
+            calls.append(base)
+            return base if len(calls) == 1 else next_free_slug(queryset, base, **kwargs)
+
+        with mock.patch("iota.slugs.next_free_slug", side_effect=stale):
+            story = self.create("Depot closed")
+        self.assertEqual((story.slug, len(calls)), ("depot-closed-2", 2))
+        self.assertEqual(NewsStory.objects.count(), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        self.create("Depot closed")
+        with mock.patch("iota.slugs.next_free_slug", return_value="depot-closed") as lookup:
+            with self.assertRaises(IntegrityError):
+                self.create("Depot closed")
+        self.assertEqual(lookup.call_count, MAX_ATTEMPTS)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.story = NewsStory.objects.create(title="Depot closed", synopsis="Use the north gate.", body="b")
+            self.breaking = NewsStory.objects.create(
+                title="Snow on the A9", synopsis="Expect delays.", body="b", is_breaking=True
+            )
+
+    def get(self, feed_format="rss", **headers):
+        return self.client.get(reverse("news_feed", args=[feed_format]), headers=headers)
+
+    def test_formats(self):
+        for feed_format, content_type in (
+            ("rss", "application/rss+xml"),
+            ("atom", "application/atom+xml"),
+            ("json", "application/feed+json"),
+        ):
+            response = self.get(feed_format)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response["Content-Type"].startswith(content_type))
+            self.assertContains(response, "Snow on the A9")
+            self.assertContains(response, "http://testserver/news/")
+
+        items = json.loads(self.get("json").content)["items"]
+        self.assertEqual([item["title"] for item in items], ["Snow on the A9", "Depot closed"])
+        self.assertEqual(items[0]["tags"], ["Breaking"])
+        self.assertEqual(self.get("xml").status_code, 404)
+
+    def test_conditional_requests_get_304(self):
+        response = self.get()
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        with self.assertNumQueries(2):  # the cache version and the cached feed
+            self.assertEqual(self.get(If_None_Match=etag).status_code, 304)
+        self.assertEqual(self.get(If_Modified_Since=last_modified).status_code, 304)
+        self.assertEqual(self.get(If_None_Match='"something-else"').status_code, 200)
+
+    def test_version_bump_without_a_feed_change_keeps_the_validators(self):
+        response = self.get()
+        NewsStory.objects.filter(pk=self.story.pk).update(body="<p>Only on the detail page</p>")
+        bump_news_cache_version()
+
+        again = self.get(If_None_Match=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.get()["Last-Modified"], response["Last-Modified"])
+
+    def test_updates_that_bypass_save_change_the_etag(self):
+        response = self.get()
+        # update()/bulk_update() don't move updated_at; the ETag follows the body
+        NewsStory.objects.filter(pk=self.story.pk).update(title="Depot reopened")
+        bump_news_cache_version()
+
+        changed = self.get(If_None_Match=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertContains(changed, "Depot reopened")
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+        self.assertEqual(self.get(If_Modified_Since=response["Last-Modified"]).status_code, 200)
+
+    def test_deleted_stories_move_last_modified_forward(self):
+        response = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.story.delete()
+
+        changed = self.get(If_Modified_Since=response["Last-Modified"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotContains(changed, "Depot closed")
+        self.assertGreater(parse_http_date(changed["Last-Modified"]), parse_http_date(response["Last-Modified"]))
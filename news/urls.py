@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path("", views.news_list, name="news_list"),
     path("create/", views.news_create, name="news_create"),
+    path("feed/<str:feed_format>/", views.news_feed, name="news_feed"),
     path("<slug:slug>/", views.news_detail, name="news_detail"),
     path("<slug:slug>/edit/", views.news_edit, name="news_edit"),
     path("<slug:slug>/delete/", views.news_delete, name="news_delete"),
@@ -1,39 +1,155 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import Http404
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Value, When
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.decorators.http import require_POST
 
+from iota.pagination import decode_cursor, encode_cursor, keyset_page
+
+from .caching import news_cache_key
+from .feeds import FORMATS as FEED_FORMATS, feed_etag, feed_last_modified, feed_stories, render_feed
 from .forms import NewsStoryForm
 from .models import NewsStory
 
 
+NEWS_PER_PAGE = 12
+
+# How long a rendered list page or feed is kept; any story change retires it sooner
+LIST_CACHE_TIMEOUT = 60 * 15
+FEED_CACHE_TIMEOUT = 60 * 60
+
+
 def _is_superuser(user):
     return user.is_authenticated and user.is_superuser
 
 
-def news_list(request):
-    is_admin = _is_superuser(request.user)
-
-    # Breaking should only ever come from non-archived stories
-    breaking = NewsStory.objects.filter(is_breaking=True, is_archived=False).first()
+def _visible_stories(is_admin):
+    # Superusers see all stories, everyone else only non-archived.
+    # The body is only needed on the detail page.
+    stories = NewsStory.objects.defer("body", "body_html")
+    return stories if is_admin else stories.filter(is_archived=False)
+
+
+def _first_page(stories):
+    """
+    The breaking story and the first page of the rest, in one query: the
+    breaking story (which is never archived) sorts ahead of everything.
+    """
+    rows = list(
+        stories
+        .annotate(
+            featured=Case(
+                When(is_breaking=True, is_archived=False, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("-featured", "-created_at", "-pk")[:NEWS_PER_PAGE + 2]
+    )
+    breaking = rows.pop(0) if rows and rows[0].featured else None
+    rows = rows[:NEWS_PER_PAGE + 1]
+    items = rows[:NEWS_PER_PAGE]
+
+    return breaking, {
+        "items": items,
+        "has_next": len(rows) > NEWS_PER_PAGE,
+        "has_previous": False,
+        "next_cursor": encode_cursor(items[-1].created_at, items[-1].pk) if items else None,
+        "previous_cursor": None,
+    }
 
-    # Superusers see all stories, everyone else only non-archived
-    stories_qs = NewsStory.objects.all() if is_admin else NewsStory.objects.filter(is_archived=False)
-    stories = stories_qs.order_by("-created_at")
 
-    # Keep breaking out of the main list (it appears in the feature block)
-    if breaking:
-        stories = stories.exclude(pk=breaking.pk)
+def _cursors(request):
+    """
+    (after, before) from the query string, with malformed cursors dropped.
+    """
+    after = request.GET.get("after", "")
+    before = request.GET.get("before", "")
+    if not decode_cursor(NewsStory, "created_at", after):
+        after = ""
+    if after or not decode_cursor(NewsStory, "created_at", before):
+        before = ""
+    return after, before
+
+
+def _list_context(is_admin, after, before):
+    """
+    "breaking" and "page" for one page of the list.
+    """
+    stories = _visible_stories(is_admin)
+
+    if after or before:
+        # Later pages leave the breaking story out (it's in the feature block)
+        page = keyset_page(
+            stories.exclude(is_breaking=True, is_archived=False),
+            "created_at",
+            after=after,
+            before=before,
+            per_page=NEWS_PER_PAGE,
+        )
+        if after or page["has_previous"]:
+            return {"breaking": None, "page": page}
+        # A "newer" link has walked back to the top: show the real first page
+
+    breaking, page = _first_page(stories)
+    return {"breaking": breaking, "page": page}
 
-    create_form = NewsStoryForm() if is_admin else None
 
-    context = {
-        "breaking": breaking,
-        "stories": stories,
-        "create_form": create_form,
-    }
-    return render(request, "news/news_list.html", context)
+def news_list(request):
+    is_admin = _is_superuser(request.user)
+    after, before = _cursors(request)
+
+    if is_admin:
+        feed = _list_context(is_admin, after, before)
+        return render(request, "news/news_list.html", {**feed, "create_form": NewsStoryForm()})
+
+    # Without the manage controls the feed is the same for everyone, so the
+    # rendered fragment is cached per page
+    key = news_cache_key("list", after, before)
+    feed_html = cache.get(key)
+    if feed_html is None:
+        feed_html = render_to_string("news/_feed.html", _list_context(is_admin, after, before), request=request)
+        cache.set(key, feed_html, LIST_CACHE_TIMEOUT)
+
+    return render(request, "news/news_list.html", {"feed_html": feed_html})
+
+
+def news_feed(request, feed_format):
+    """
+    RSS, Atom or JSON Feed of the latest stories. The rendered body and its
+    ETag/Last-Modified are cached until a story changes, so most polls are
+    answered from the cache, and with 304 Not Modified if nothing changed.
+    """
+    if feed_format not in FEED_FORMATS:
+        raise Http404("Unknown feed format.")
+
+    # Links in the feed are absolute, so each host gets its own copy
+    key = news_cache_key("feed", feed_format, request.get_host())
+    cached = cache.get(key)
+    if cached is None:
+        content_type, body = render_feed(feed_format, feed_stories(), request.build_absolute_uri)
+        etag = feed_etag(body)
+        last_modified = feed_last_modified(f"news:feed-stamp:{feed_format}:{request.get_host()}", etag)
+        cached = (etag, last_modified, content_type, body)
+        cache.set(key, cached, FEED_CACHE_TIMEOUT)
+
+    etag, last_modified, content_type, body = cached
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(body, content_type=content_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # Pollers revalidate every time; the answer is usually a 304
+    response["Cache-Control"] = "public, no-cache"
+    return response
 
 
 @login_required
@@ -48,16 +164,13 @@ def news_create(request):
         messages.success(request, "Story created.")
         return redirect("news_detail", slug=story.slug)
 
-    # If invalid, re-render the list with the same visibility rules as admins:
-    breaking = NewsStory.objects.filter(is_breaking=True, is_archived=False).first()
-    stories = NewsStory.objects.all().order_by("-created_at")
-    if breaking:
-        stories = stories.exclude(pk=breaking.pk)
+    # If invalid, re-render the first page with the same visibility rules as admins:
+    breaking, page = _first_page(_visible_stories(is_admin=True))
 
     return render(
         request,
         "news/news_list.html",
-        {"breaking": breaking, "stories": stories, "create_form": form},
+        {"breaking": breaking, "page": page, "create_form": form},
         status=400,
     )
 